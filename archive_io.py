@@ -0,0 +1,127 @@
+# archive_io.py
+#
+# File formats for /export_db and /import_db. Exports are streamed straight from a
+# database cursor through gzip into spooled temp files, split into parts that each fit in
+# a Discord upload. These functions block, so callers run them in a worker thread.
+
+import gzip
+import json
+import tempfile
+import zlib
+
+import database
+from config import EXPORT_PART_SIZE
+
+EXPORT_FORMATS = ("json", "ndjson")
+EXPORT_BASENAME = "daily_johans_export"
+IMPORT_EXTENSIONS = (".json", ".ndjson", ".json.gz", ".ndjson.gz")
+
+# Spill a part to disk once it passes this many compressed bytes.
+_SPOOL_MEMORY_LIMIT = 1024 * 1024
+# Headroom for compressed bytes still buffered inside zlib when a part's size is checked.
+_GZIP_BUFFER_HEADROOM = 64 * 1024
+
+
+class _ExportPart:
+    def __init__(self, fmt):
+        self.fmt = fmt
+        self.raw = tempfile.SpooledTemporaryFile(max_size=_SPOOL_MEMORY_LIMIT)
+        self.gzip = gzip.GzipFile(fileobj=self.raw, mode="wb", mtime=0)
+        self.records = 0
+        if fmt == "json":
+            self.gzip.write(b"[")
+
+    @property
+    def compressed_size(self):
+        return self.raw.tell()
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":")).encode()
+        if self.fmt == "json":
+            self.gzip.write(b"," + line if self.records else line)
+        else:
+            self.gzip.write(line + b"\n")
+        self.records += 1
+
+    def finish(self):
+        if self.fmt == "json":
+            self.gzip.write(b"]")
+        self.gzip.close()  # Flushes the gzip trailer; leaves the spooled file open.
+        self.raw.seek(0)
+        return self.raw
+
+
+def write_export(conn, fmt="json", part_size=EXPORT_PART_SIZE, chunk_size=1000):
+    """
+    Stream the whole archive into gzip-compressed export files.
+
+    Records are read from iter_daily_johans() and written as compact JSON (one array per
+    part) or NDJSON (one record per line). A new part is started whenever the current
+    one gets close to part_size compressed bytes, so every part is a complete file that
+    can be imported on its own.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        fmt (str): "json" or "ndjson".
+        part_size (int): Maximum compressed size of one part, in bytes.
+        chunk_size (int): Rows fetched from the cursor at a time.
+
+    Returns:
+        list of tuple: (filename, file object positioned at 0) per part. The caller closes them.
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown export format '{fmt}'.")
+
+    limit = max(part_size - _GZIP_BUFFER_HEADROOM, 1)
+    parts = []
+    part = _ExportPart(fmt)
+    for record in database.iter_daily_johans(conn, chunk_size=chunk_size):
+        if part.records and part.compressed_size >= limit:
+            parts.append(part.finish())
+            part = _ExportPart(fmt)
+        part.write(record)
+    parts.append(part.finish())
+
+    if len(parts) == 1:
+        return [(f"{EXPORT_BASENAME}.{fmt}.gz", parts[0])]
+    return [(f"{EXPORT_BASENAME}.part{i}.{fmt}.gz", fp) for i, fp in enumerate(parts, start=1)]
+
+
+def parse_import_file(filename, payload):
+    """
+    Decode an uploaded export file into a list of records.
+
+    Accepts .json and .ndjson files, optionally gzip-compressed (.gz).
+
+    Args:
+        filename (str): The uploaded file's name; selects the format.
+        payload (bytes): The file contents.
+
+    Returns:
+        list: The decoded records.
+
+    Raises:
+        ValueError: If the file type is unsupported or the contents don't parse.
+    """
+    name = filename.lower()
+    if not name.endswith(IMPORT_EXTENSIONS):
+        raise ValueError(f"Unsupported file type for '{filename}'.")
+
+    if name.endswith(".gz"):
+        try:
+            payload = gzip.decompress(payload)
+        except (OSError, EOFError, zlib.error) as e:
+            # BadGzipFile is an OSError; a corrupt deflate stream raises zlib.error.
+            raise ValueError(f"'{filename}' is not a valid gzip file: {e}")
+        name = name[:-3]
+
+    text = payload.decode()
+    try:
+        if name.endswith(".ndjson"):
+            return [json.loads(line) for line in text.splitlines() if line.strip()]
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Failed to parse '{filename}': {e}")
+    if not isinstance(data, list):
+        raise ValueError("JSON must be a list of records.")
+    return data
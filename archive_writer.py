@@ -0,0 +1,179 @@
+# archive_writer.py
+#
+# Buffered archive writes for bulk paths such as /scrape_backup. Instead of a transaction
+# per message, archive operations (and messages deferred to the review queue) collect in
+# memory and are written with repo.archive_daily_johans_batch() every N entries or T seconds.
+
+import asyncio
+import logging
+import time
+
+from database import ARCHIVED, ALREADY_ARCHIVED
+from day_parser import parse_days
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveBatchWriter:
+    """
+    Accumulates (day, message, media) entries and flushes them in transactional batches.
+
+    Days already in repo.days, or already queued, are dropped on add() without touching
+    the database. Use it as an async context manager so the periodic flush task is
+    started and the last batch is written on exit:
+
+        async with ArchiveBatchWriter(repo) as writer:
+            writer.add(day, message, media_urls)
+    """
+
+    def __init__(self, repo, batch_size=200, flush_seconds=5.0):
+        self.repo = repo
+        self.batch_size = max(1, batch_size)
+        self.flush_seconds = flush_seconds
+        self._buffer = []
+        self._queued_days = set()
+        self._reviews = []
+        self._lock = asyncio.Lock()
+        self._task = None
+        self._flush_tasks = set()
+
+        self.archived = 0
+        self.already_archived = 0
+        self.queued_for_review = 0
+        self.skipped = 0
+        self.failed_flushes = 0
+        self.flushes = 0
+        self.db_seconds = 0.0
+        self._started = None
+
+    async def __aenter__(self):
+        self._started = time.perf_counter()
+        if self.flush_seconds and self.flush_seconds > 0:
+            self._task = asyncio.create_task(self._flush_periodically(), name="archive-writer")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+        await self.flush()
+
+    @property
+    def pending(self):
+        return len(self._buffer) + len(self._reviews)
+
+    def add(self, day, message, media_urls):
+        """
+        Queue one day for archiving.
+
+        Returns:
+            bool: False if the day is already archived or queued, else True.
+        """
+        if day in self.repo.days or day in self._queued_days:
+            self.skipped += 1
+            return False
+        self._buffer.append((day, message, list(media_urls)))
+        self._queued_days.add(day)
+        self._flush_if_full()
+        return True
+
+    def add_message(self, message, media_urls):
+        """
+        Queue a post with the same day parsing as the live auto-archiver: one attachment per
+        day for a series, every attachment for a single explicit day, and the review queue
+        when no day can be inferred.
+
+        Returns:
+            list of int or None: Days newly queued for archiving, or None if the post went to
+            the review queue.
+        """
+        parsed = parse_days(message.content)
+        series_days = parsed.series_days(len(media_urls))
+        if series_days:
+            return [day for day, media_url in zip(series_days, media_urls) if self.add(day, message, [media_url])]
+        if parsed.single_day is not None:
+            return [parsed.single_day] if self.add(parsed.single_day, message, media_urls) else []
+        self.defer_review(message, len(media_urls))
+        return None
+
+    def defer_review(self, message, media_count):
+        """
+        Queue a message whose day couldn't be inferred for /review_backup.
+        """
+        self._reviews.append((message.id, message.channel.id, message.content, media_count))
+        self._flush_if_full()
+
+    def _flush_if_full(self):
+        if self.pending >= self.batch_size:
+            task = asyncio.create_task(self.flush(), name="archive-writer-flush")
+            self._flush_tasks.add(task)
+            task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        """
+        Write everything queued in one transaction.
+
+        Returns:
+            bool: True if everything queued before the call has been written. On a database
+            error the entries stay queued and False is returned, so callers don't record
+            progress past them.
+        """
+        async with self._lock:
+            if not self._buffer and not self._reviews:
+                return True
+            batch, reviews = self._buffer, self._reviews
+            self._buffer, self._reviews = [], []
+            started = time.perf_counter()
+            try:
+                outcomes = await self.repo.archive_daily_johans_batch(batch) if batch else {}
+            except Exception as e:
+                self.failed_flushes += 1
+                self._buffer = batch + self._buffer
+                self._reviews = reviews + self._reviews
+                logger.error(f"Failed to write a batch of {len(batch)} archive entries: {e}")
+                return False
+            finally:
+                self.db_seconds += time.perf_counter() - started
+
+            self.flushes += 1
+            self._queued_days.difference_update(day for day, _, _ in batch)
+            written = sum(1 for outcome in outcomes.values() if outcome == ARCHIVED)
+            self.archived += written
+            self.already_archived += sum(1 for outcome in outcomes.values() if outcome == ALREADY_ARCHIVED)
+
+            if reviews:
+                try:
+                    self.queued_for_review += await self.repo.enqueue_review_messages(reviews)
+                except Exception as e:
+                    self.failed_flushes += 1
+                    self._reviews = reviews + self._reviews
+                    logger.error(f"Failed to queue {len(reviews)} message(s) for review: {e}")
+                    return False
+            logger.debug(f"Flushed {len(batch)} archive entries ({written} archived) "
+                         f"and {len(reviews)} review(s).")
+            return True
+
+    async def _flush_periodically(self):
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            await self.flush()
+
+    def stats(self):
+        """
+        Totals so far, with rows/sec over database time and over wall-clock time.
+        """
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        return {
+            "archived": self.archived,
+            "already_archived": self.already_archived,
+            "queued_for_review": self.queued_for_review,
+            "skipped": self.skipped,
+            "flushes": self.flushes,
+            "failed_flushes": self.failed_flushes,
+            "db_seconds": round(self.db_seconds, 3),
+            "rows_per_db_second": round(self.archived / self.db_seconds, 1) if self.db_seconds else 0.0,
+            "rows_per_second": round(self.archived / elapsed, 1) if elapsed else 0.0,
+        }
@@ -0,0 +1,272 @@
+# benchmarks/bench_database.py
+#
+# Standalone benchmark for the database layer at synthetic archive sizes. Builds a
+# daily_johans database per size with the real migrations, times every public helper in
+# database.py plus the lookups the cogs make (status range, search, max day,
+# delete-by-message, export, import) and prints the results as JSON so schema, index or
+# caching changes can be compared run against run.
+#
+#   python benchmarks/bench_database.py --sizes 1000,100000 --output bench_output.txt
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+import types
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import archive_io  # noqa: E402
+import database  # noqa: E402
+from day_index import ArchivedDayIndex  # noqa: E402
+from migrations import apply_migrations, apply_pragmas  # noqa: E402
+
+DEFAULT_SIZES = (1_000, 100_000, 1_000_000)
+# Every GAP_EVERY-th day is left unarchived so range/gap queries have something to find.
+GAP_EVERY = 50
+# Every SERIES_EVERY-th message carries two days, like a catch-up series post.
+SERIES_EVERY = 20
+BASE_MESSAGE_ID = 1_100_000_000_000_000_000
+CHANNEL_IDS = (797666899558268971, 797666899558268972, 797666899558268973)
+USER_ID = 474030685577936916
+IMPORT_BATCH = 1_000
+RANGE_WIDTH = 100
+
+
+# ---------------------------
+# DATASET
+# ---------------------------
+def _message_id(day):
+    # Series posts share the message of the day before them.
+    if day % SERIES_EVERY == 0:
+        day -= 1
+    return BASE_MESSAGE_ID + day * 1_000
+
+
+def _day_rows(size):
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    for day in range(1, size + 1):
+        if day % GAP_EVERY == 0:
+            continue
+        yield (day, _message_id(day), CHANNEL_IDS[day % len(CHANNEL_IDS)],
+               (start + timedelta(days=day)).isoformat(), USER_ID, f"<@{USER_ID}>", True)
+
+
+def _media_rows(size):
+    for day, message_id, *_ in _day_rows(size):
+        for position in range(1, day % database.MAX_MEDIA_PER_DAY + 2):
+            yield day, position, f"https://cdn.discordapp.com/attachments/{day}/{position}/johan.png", message_id
+
+
+def build_dataset(path, size):
+    """
+    Create a migrated database at path holding `size` synthetic days.
+
+    Returns:
+        float: Seconds spent building it.
+    """
+    started = time.perf_counter()
+    conn = sqlite3.connect(path)
+    apply_pragmas(conn)
+    apply_migrations(conn)
+    with conn:
+        conn.executemany("""
+            INSERT INTO daily_johans (day, message_id, channel_id, timestamp, user_id, user_mention, confirmed)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, _day_rows(size))
+        conn.executemany("INSERT INTO daily_johan_media (day, position, url, message_id) VALUES (?, ?, ?, ?)",
+                         _media_rows(size))
+    conn.execute("ANALYZE")
+    conn.close()
+    return time.perf_counter() - started
+
+
+def _fake_message(message_id, day):
+    author = types.SimpleNamespace(id=USER_ID, mention=f"<@{USER_ID}>")
+    return types.SimpleNamespace(id=message_id, channel=types.SimpleNamespace(id=CHANNEL_IDS[day % 3]),
+                                 author=author)
+
+
+def _import_records(size):
+    # Half of the batch collides with archived days, half is new.
+    records = []
+    for i in range(IMPORT_BATCH):
+        day = size // 2 + i if i % 2 else size + 1 + i
+        records.append({
+            "day": day, "message_id": _message_id(day), "channel_id": CHANNEL_IDS[0],
+            "timestamp": "2024-01-01T00:00:00+00:00", "user_id": USER_ID, "user_mention": f"<@{USER_ID}>",
+            "confirmed": True, "media": [f"https://cdn.discordapp.com/attachments/{day}/1/johan.png"],
+        })
+    return records
+
+
+# ---------------------------
+# BENCHMARKS
+# ---------------------------
+def _benchmarks(size):
+    """
+    Return (name, function(conn), kind) for every case. kind is "read", "write" (run in a
+    transaction that is rolled back, so every run sees the same data), "heavy" (a
+    full-archive pass, run fewer times) or "heavy-write" (both).
+    """
+    mid = max(size // 2, 1)
+    present = mid if mid % GAP_EVERY else mid + 1
+    message_id = _message_id(present)
+    range_start, range_end = max(mid - RANGE_WIDTH // 2, 1), mid + RANGE_WIDTH // 2
+    new_day = size + 10
+    index = ArchivedDayIndex(day for day, *_ in _day_rows(size))
+    records = _import_records(size)
+    ndjson_payload = "\n".join(json.dumps(record) for record in records).encode()
+
+    def archive_new(conn):
+        database.archive_daily_johan_db(conn, new_day, _fake_message(BASE_MESSAGE_ID - 1, new_day), ["u1", "u2"])
+
+    def archive_series(conn):
+        message = _fake_message(BASE_MESSAGE_ID - 2, new_day)
+        database.archive_daily_johans_batch(conn, [(new_day + i, message, [f"u{i}"]) for i in range(10)])
+
+    def export(fmt):
+        def run(conn):
+            for _, fp in archive_io.write_export(conn, fmt):
+                fp.close()
+        return run
+
+    def status_range(conn):
+        # What /daily_johan_status and /missing_days do: counts and gaps from the index,
+        # then the archived days of one page.
+        index.missing_ranges(1, size)
+        index.count_in_range(1, size)
+        database.get_archived_days(conn, range_start, range_end)
+
+    return [
+        # Cog-level paths
+        ("cog.status_range", status_range, "read"),
+        ("cog.search_day", lambda conn: database.search_daily_johan(conn, present), "read"),
+        ("cog.search_range", lambda conn: database.search_daily_johans(conn, range_start, range_end), "read"),
+        ("cog.max_day_query", database.get_latest_day, "read"),
+        ("cog.max_day_index", lambda conn: index.max_day, "read"),
+        ("cog.delete_by_message", lambda conn: database.delete_daily_johan_by_message_id(conn, message_id), "write"),
+        ("cog.export_json", export("json"), "heavy"),
+        ("cog.export_ndjson", export("ndjson"), "heavy"),
+        ("cog.import_ndjson", lambda conn: database.insert_bulk_daily_johans(
+            conn, archive_io.parse_import_file("import.ndjson", ndjson_payload)), "write"),
+        ("cog.startup_index_load", lambda conn: ArchivedDayIndex(database.get_all_days(conn)), "heavy"),
+
+        # database.py helpers
+        ("db.find_table_scans", database.find_table_scans, "read"),
+        ("db.archive_daily_johan_db", archive_new, "write"),
+        ("db.archive_daily_johans_batch", archive_series, "write"),
+        ("db.get_existing_day_for_message", lambda conn: database.get_existing_day_for_message(conn, message_id), "read"),
+        ("db.get_days_for_message", lambda conn: database.get_days_for_message(conn, message_id), "read"),
+        ("db.get_existing_message_for_day", lambda conn: database.get_existing_message_for_day(conn, present), "read"),
+        ("db.get_entry_for_day", lambda conn: database.get_entry_for_day(conn, present), "read"),
+        ("db.get_entry_for_message", lambda conn: database.get_entry_for_message(conn, message_id), "read"),
+        ("db.get_media_for_day", lambda conn: database.get_media_for_day(conn, present), "read"),
+        ("db.get_media_for_days", lambda conn: database.get_media_for_days(conn, range_start, range_end), "read"),
+        ("db.get_latest_day", database.get_latest_day, "read"),
+        ("db.get_all_days", database.get_all_days, "heavy"),
+        ("db.get_archived_days", lambda conn: database.get_archived_days(conn, range_start, range_end), "read"),
+        ("db.get_last_archive_timestamp", database.get_last_archive_timestamp, "read"),
+        ("db.delete_daily_johan_by_message_id",
+         lambda conn: database.delete_daily_johan_by_message_id(conn, message_id), "write"),
+        ("db.delete_daily_johan_by_day", lambda conn: database.delete_daily_johan_by_day(conn, present), "write"),
+        ("db.search_daily_johans", lambda conn: database.search_daily_johans(conn, range_start, range_end), "read"),
+        ("db.search_daily_johan", lambda conn: database.search_daily_johan(conn, present), "read"),
+        ("db.iter_daily_johans", lambda conn: sum(1 for _ in database.iter_daily_johans(conn)), "heavy"),
+        ("db.export_daily_johans", database.export_daily_johans, "heavy"),
+        ("db.insert_bulk_daily_johans", lambda conn: database.insert_bulk_daily_johans(conn, records), "write"),
+        ("db.clear_daily_johans_table", database.clear_daily_johans_table, "heavy-write"),
+    ]
+
+
+def _time_case(conn, func, kind, repeat):
+    runs = max(1, repeat // 10) if kind.startswith("heavy") else repeat
+    rollback = kind.endswith("write")
+    timings = []
+    for _ in range(runs + 1):  # the first run warms the page cache and is discarded
+        if rollback:
+            conn.execute("BEGIN")
+        started = time.perf_counter()
+        try:
+            func(conn)
+        finally:
+            elapsed = time.perf_counter() - started
+            if rollback:
+                conn.rollback()
+        timings.append(elapsed * 1000)
+    timings = timings[1:]
+    return {
+        "runs": len(timings),
+        "min_ms": round(min(timings), 4),
+        "median_ms": round(statistics.median(timings), 4),
+        "mean_ms": round(statistics.fmean(timings), 4),
+        "max_ms": round(max(timings), 4),
+    }
+
+
+def run_size(size, repeat, data_dir, only=None):
+    path = os.path.join(data_dir, f"daily_johans_{size}.db")
+    if os.path.exists(path):
+        os.remove(path)
+    print(f"Building {size:,} day dataset...", file=sys.stderr)
+    build_seconds = build_dataset(path, size)
+
+    conn = sqlite3.connect(path)
+    apply_pragmas(conn)
+    results = {}
+    for name, func, kind in _benchmarks(size):
+        if only and not any(pattern in name for pattern in only):
+            continue
+        results[name] = _time_case(conn, func, kind, repeat)
+        print(f"  {name:<40} {results[name]['median_ms']:>12.3f} ms", file=sys.stderr)
+    table_scans = [{"query": name, "plan": detail} for name, detail in database.find_table_scans(conn)]
+    conn.close()
+    return {
+        "size": size,
+        "build_seconds": round(build_seconds, 3),
+        "db_bytes": os.path.getsize(path),
+        "table_scans": table_scans,
+        "results": results,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark database.py at synthetic archive sizes.")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)),
+                        help="Comma-separated archive sizes in days (default: %(default)s).")
+    parser.add_argument("--repeat", type=int, default=50, help="Timed runs per case; full-archive cases run a tenth.")
+    parser.add_argument("--only", default="", help="Comma-separated substrings selecting which cases to run.")
+    parser.add_argument("--data-dir", help="Where to build the datasets (default: a temporary directory).")
+    parser.add_argument("--output", help="Write the JSON report here instead of stdout.")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    only = [pattern for pattern in args.only.split(",") if pattern]
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        report = {
+            "generated_at": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "datasets": [run_size(size, args.repeat, data_dir, only) for size in sizes],
+        }
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,14 +3,22 @@
 import asyncio
 import logging
 import os
-import re
 
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
 
-from config import DB_FILE  # <--- We'll use this for context menu DB calls
-from database import archive_daily_johan_db, get_existing_message_for_day
+from config import MAX_MEDIA_PER_DAY
+from conversations import conversations
+from database import CONFLICT, MEDIA_FULL, ON_EXISTING_APPEND, ON_EXISTING_REJECT
+from day_parser import parse_days, parse_day_list
+from gallery import gallery
+from link_refresher import link_refresher
+from media_mirror import mirror
+from phash_index import phash_index
+from message_router import router
+from repository import repo
+from scheduler import scheduler
 
 # ---------------------------
 # LOAD ENV
@@ -36,6 +44,8 @@ intents.message_content = True
 
 bot = commands.Bot(command_prefix="!", intents=intents)
 
+PROMPT_PENDING_MESSAGE = "You already have an open prompt. Please answer it first."
+
 
 @bot.event
 async def on_ready():
@@ -47,12 +57,39 @@ async def on_ready():
         logger.error(f"Failed to sync commands: {e}")
 
 
+@bot.event
+async def on_message(message: discord.Message):
+    # The only on_message in the bot: prefix commands are processed once here, then the
+    # router answers open prompts and fans out to the cogs' registered handlers.
+    await bot.process_commands(message)
+    await router.route(message, own_user_id=bot.user.id if bot.user else None)
+
+
+async def _archive_one_per_day(message, day_numbers, media_urls):
+    """
+    Archive one attachment per day as a single all-or-nothing batch.
+
+    Returns:
+        str or None: An error to show the user, or None if every day was archived.
+    """
+    outcomes = await repo.archive_daily_johans_batch(
+        [(day, message, [media_url]) for day, media_url in zip(day_numbers, media_urls)],
+        on_existing=ON_EXISTING_REJECT
+    )
+    for day, outcome in outcomes.items():
+        if outcome == CONFLICT:
+            return f"Day {day} already has a different Daily Johan. Please resolve duplicates manually."
+        if outcome == MEDIA_FULL:
+            return f"Day {day} already has the maximum number of media attachments."
+    return None
+
+
 # ---------------------------
 # CONTEXT MENU: Manual Archive
 # ---------------------------
 @bot.tree.context_menu(name="Manual Archive Daily Johan")
 async def archive_daily_johan_context_menu(interaction: discord.Interaction, message: discord.Message):
-    numbers_found = re.findall(r"\d+", message.content)
+    parsed = parse_days(message.content)
     media_attachments = message.attachments
     media_urls = [attachment.url for attachment in media_attachments]
 
@@ -60,24 +97,15 @@ async def archive_daily_johan_context_menu(interaction: discord.Interaction, mes
         await interaction.response.send_message("No media found in the selected message.", ephemeral=True)
         return
 
-    if numbers_found:
-        day_numbers = [int(num) for num in numbers_found]
+    if parsed.numbers:
+        day_numbers = list(parsed.numbers)
 
         # One-to-one scenario
         if len(day_numbers) == len(media_urls):
-            for day, media_url in zip(day_numbers, media_urls):
-                existing_message = get_existing_message_for_day(day)
-                if existing_message and str(existing_message[0]) != str(message.id):
-                    await interaction.response.send_message(
-                        f"Day {day} already has a different Daily Johan. Please resolve duplicates manually.",
-                        ephemeral=True
-                    )
-                    return
-                try:
-                    archive_daily_johan_db(day, message, [media_url], confirmed=True)
-                except ValueError as ve:
-                    await interaction.response.send_message(str(ve), ephemeral=True)
-                    return
+            error = await _archive_one_per_day(message, day_numbers, media_urls)
+            if error:
+                await interaction.response.send_message(error, ephemeral=True)
+                return
             await interaction.response.send_message(
                 f"Automatically archived message {message.id} for days: {', '.join(map(str, day_numbers))} with one media per day.",
                 ephemeral=True
@@ -85,16 +113,18 @@ async def archive_daily_johan_context_menu(interaction: discord.Interaction, mes
             return
 
         # Multiple-to-one scenario
-        elif len(day_numbers) == 1 and len(media_urls) <= 3:
+        elif len(day_numbers) == 1 and len(media_urls) <= MAX_MEDIA_PER_DAY:
             day = day_numbers[0]
-            try:
-                archive_daily_johan_db(day, message, media_urls, confirmed=True)
+            outcomes = await repo.archive_daily_johans_batch([(day, message, media_urls)],
+                                                             on_existing=ON_EXISTING_APPEND)
+            if outcomes[day] == MEDIA_FULL:
                 await interaction.response.send_message(
-                    f"Automatically archived message {message.id} for day {day} with {len(media_urls)} media attachments.",
-                    ephemeral=True
-                )
-            except ValueError as ve:
-                await interaction.response.send_message(str(ve), ephemeral=True)
+                    f"Day {day} doesn't have room for {len(media_urls)} more media attachment(s).", ephemeral=True)
+                return
+            await interaction.response.send_message(
+                f"Automatically archived message {message.id} for day {day} with {len(media_urls)} media attachments.",
+                ephemeral=True
+            )
             return
 
         else:
@@ -104,19 +134,20 @@ async def archive_daily_johan_context_menu(interaction: discord.Interaction, mes
                 ephemeral=True
             )
     else:
+        if conversations.is_pending(interaction.user.id):
+            await interaction.response.send_message(PROMPT_PENDING_MESSAGE, ephemeral=True)
+            return
+
         # Prompt user for manual input
         await interaction.response.send_message(
             "Automatic scanning was inconclusive. Please enter the day number(s) (space/comma-separated).",
             ephemeral=True
         )
 
-        def check(m):
-            return m.author == interaction.user and m.channel == interaction.channel
-
         try:
-            response = await bot.wait_for("message", timeout=30.0, check=check)
+            response = await conversations.ask(interaction.user.id, interaction.channel.id, timeout=30.0)
             user_input = response.content.strip()
-            numbers_list = [int(x) for x in re.split(r'[\s,]+', user_input) if x.isdigit()]
+            numbers_list = parse_day_list(user_input)
 
             if not numbers_list:
                 await interaction.followup.send("No valid day numbers provided.", ephemeral=True)
@@ -137,21 +168,11 @@ async def archive_daily_johan_context_menu(interaction: discord.Interaction, mes
                 return
 
             # One-to-one assignment
-            for day, media_url in zip(numbers_list, media_urls):
-                existing_message = get_existing_message_for_day(day)
-                if existing_message and str(existing_message[0]) != str(message.id):
-                    await interaction.followup.send(
-                        f"Day {day} already has a different Daily Johan. Please resolve duplicates manually.",
-                        ephemeral=True
-                    )
-                    await response.delete()
-                    return
-                try:
-                    archive_daily_johan_db(day, message, [media_url], confirmed=True)
-                except ValueError as ve:
-                    await interaction.followup.send(str(ve), ephemeral=True)
-                    await response.delete()
-                    return
+            error = await _archive_one_per_day(message, numbers_list, media_urls)
+            if error:
+                await interaction.followup.send(error, ephemeral=True)
+                await response.delete()
+                return
             await interaction.followup.send(
                 f"Archived message {message.id} for days: {', '.join(map(str, numbers_list))} with one media per day.",
                 ephemeral=True
@@ -169,37 +190,32 @@ async def archive_daily_johan_context_menu(interaction: discord.Interaction, mes
 # ---------------------------
 @bot.tree.context_menu(name="Delete Daily Johan")
 async def delete_daily_johan_context_menu(interaction: discord.Interaction, message: discord.Message):
-    import sqlite3
-    from database import delete_daily_johan_by_message_id
-
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT day FROM daily_johans WHERE message_id = ?", (str(message.id),))
-        days = cursor.fetchall()
+    days = await repo.get_days_for_message(message.id)
 
     if not days:
         await interaction.response.send_message("This message is not archived as any Daily Johan.", ephemeral=True)
         return
 
-    day_list = [str(day[0]) for day in days]
+    day_list = [str(day) for day in days]
     days_str = ", ".join(day_list)
 
+    if conversations.is_pending(interaction.user.id):
+        await interaction.response.send_message(PROMPT_PENDING_MESSAGE, ephemeral=True)
+        return
+
     await interaction.response.send_message(
         f"This will delete the archived Daily Johan(s) for day(s): {days_str}. Are you sure? (yes/no)",
         ephemeral=True
     )
 
-    def check(m):
-        return m.author == interaction.user and m.channel == interaction.channel
-
     try:
-        confirmation = await bot.wait_for("message", timeout=30.0, check=check)
+        confirmation = await conversations.ask(interaction.user.id, interaction.channel.id, timeout=30.0)
         if confirmation.content.strip().lower() not in ("yes", "y"):
             await interaction.followup.send("Deletion cancelled.", ephemeral=True)
             await confirmation.delete()
             return
 
-        delete_daily_johan_by_message_id(message.id)
+        await repo.delete_daily_johan_by_message_id(message.id)
         await interaction.followup.send(
             f"Archived Daily Johan entries for day(s): {days_str} have been deleted.",
             ephemeral=True
@@ -227,15 +243,31 @@ async def load_cogs():
         await bot.load_extension("cogs.backup_cog")
         await bot.load_extension("cogs.db_manage_cog")
         await bot.load_extension("cogs.debug_cog")
+        await bot.load_extension("cogs.duplicates_cog")
+        await bot.load_extension("cogs.gallery_cog")
         logger.info("All cogs loaded successfully.")
     except Exception as e:
         logger.error(f"Failed to load cogs: {e}")
 
 
 async def main():
-    async with bot:
-        await load_cogs()
-        await bot.start(TOKEN)
+    await repo.open()
+    scheduler.start()
+    await mirror.start()
+    await phash_index.start()
+    await gallery.start()
+    link_refresher.start(bot)
+    try:
+        async with bot:
+            await load_cogs()
+            await bot.start(TOKEN)
+    finally:
+        link_refresher.stop()
+        await gallery.stop()
+        await phash_index.stop()
+        await mirror.stop()
+        await scheduler.stop()
+        await repo.close()
 
 
 if __name__ == "__main__":
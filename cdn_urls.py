@@ -0,0 +1,69 @@
+# cdn_urls.py
+#
+# Helpers for Discord CDN attachment URLs. Attachment links are signed: the `ex` query
+# parameter is the expiry as hex Unix seconds, after which the CDN answers 404 until the
+# message is fetched again for a freshly signed link.
+
+import mimetypes
+from urllib.parse import parse_qs, unquote, urlsplit
+
+
+def url_expiry(url):
+    """
+    Return when a signed CDN URL expires, in Unix seconds.
+
+    Returns:
+        int or None: None for unsigned (legacy) or unparsable URLs.
+    """
+    try:
+        values = parse_qs(urlsplit(url).query).get("ex")
+        return int(values[0], 16) if values else None
+    except (ValueError, TypeError):
+        return None
+
+
+def attachment_key(url):
+    """
+    Identify the attachment behind a URL regardless of its signature.
+
+    The path (/attachments/<channel>/<attachment>/<filename>) stays the same when Discord
+    re-signs a link, so it matches a stored URL against a freshly fetched one.
+    """
+    return urlsplit(url).path
+
+
+def attachment_info(url):
+    """
+    Read the attachment ID and filename out of a CDN attachment URL.
+
+    Returns:
+        tuple: (attachment_id, filename), or (None, None) if the URL isn't an attachment link.
+    """
+    parts = urlsplit(url).path.strip("/").split("/")
+    if len(parts) == 4 and parts[0] == "attachments" and parts[2].isdigit():
+        return int(parts[2]), unquote(parts[3])
+    return None, None
+
+
+def media_metadata(url, attachment=None):
+    """
+    Describe one archived attachment for storage.
+
+    The discord.Attachment, when available, supplies everything. Without one (imports,
+    rows archived before metadata was kept) the ID and filename come from the URL and
+    the content type is guessed from the filename.
+
+    Returns:
+        list: [url, url_expires_at, attachment_id, filename, content_type, size, width, height].
+    """
+    attachment_id, filename = attachment_info(url)
+    content_type = size = width = height = None
+    if attachment is not None:
+        attachment_id, filename = attachment.id, attachment.filename
+        content_type, size = attachment.content_type, attachment.size
+        width, height = attachment.width, attachment.height
+    if content_type:
+        content_type = content_type.split(";")[0].strip().lower()
+    elif filename:
+        content_type = mimetypes.guess_type(filename)[0]
+    return [url, url_expiry(url), attachment_id, filename, content_type, size, width, height]
@@ -2,20 +2,31 @@
 
 import asyncio
 import logging
-import re
-import sqlite3
 from datetime import datetime, timezone, timedelta
 
 import discord
 import pytz
-from discord.ext import commands, tasks
-
-from config import JOHAN_USER_ID, DEFAULT_CHANNEL_ID, TIMEZONE, DB_FILE
-from database import init_db, archive_daily_johan_db, get_existing_message_for_day
+from discord.ext import commands
+
+from archive_writer import ArchiveBatchWriter
+from config import (JOHAN_USER_ID, DEFAULT_CHANNEL_ID, TIMEZONE, MAX_MEDIA_PER_DAY, CATCHUP_MAX_MESSAGES,
+                    SCRAPE_BATCH_SIZE)
+from conversations import ConversationBusy, conversations
+from database import ARCHIVED, ALREADY_ARCHIVED
+from day_index import format_day_ranges
+from day_parser import parse_days
 from dialogues import get_dialogue
+from message_router import router
+from repository import repo
+from scheduler import scheduler
 
 logger = logging.getLogger(__name__)
 
+# Keep reminders short; /missing_days lists every gap.
+MAX_REMINDER_RANGES = 10
+REMINDER_JOB = "daily_reminder"
+ROUTER_HANDLER = "auto_archive"
+
 
 class ArchiveDailyCog(commands.Cog):
     def __init__(self, bot):
@@ -30,39 +41,120 @@ class ArchiveDailyCog(commands.Cog):
         # We'll keep track of the next scheduled reminder time in memory
         self.next_reminder_time = None
 
-        init_db()
-        self._load_last_archive_time()
+        self._catch_up_lock = asyncio.Lock()
+
+    async def cog_load(self):
+        await self._load_last_archive_time()
 
         # Recalculate the first reminder schedule
         self._schedule_initial_reminder()
+        self._arm_reminder()
 
-        # Start a loop that checks every ~15 minutes
-        # (You can do every hour if you prefer)
-        self.daily_reminder_loop.start()
+        # Archive writes tell us when to reschedule; nothing polls the DB.
+        repo.add_archive_listener(self._on_days_archived)
+
+        # Only Johan's posts with attachments ever reach the auto-archiver.
+        router.register(ROUTER_HANDLER, self.on_johan_post, authors=[self.JOHAN_USER_ID], attachments=True)
 
     def cog_unload(self):
-        self.daily_reminder_loop.cancel()
+        router.unregister(ROUTER_HANDLER)
+        repo.remove_archive_listener(self._on_days_archived)
+        scheduler.cancel(REMINDER_JOB)
+
+    @commands.Cog.listener()
+    async def on_ready(self):
+        # on_ready fires again after a full reconnect, which is exactly when posts get missed.
+        if self._catch_up_lock.locked():
+            return
+        async with self._catch_up_lock:
+            try:
+                await self.catch_up()
+            except Exception as e:
+                logger.error(f"Startup catch-up failed: {e}")
+
+    async def catch_up(self):
+        """
+        Archive Johan's posts in DEFAULT_CHANNEL_ID made since the newest archived message.
+
+        Reads at most CATCHUP_MAX_MESSAGES messages (one history request per 100) and stops
+        at the moment it started, since the live handler sees everything newer. Posts are
+        parsed as the auto-archiver parses them; posts without a day number go to the
+        /review_backup queue instead of prompting.
+
+        Returns:
+            list of int: The days archived.
+        """
+        channel = self.bot.get_channel(self.DEFAULT_CHANNEL_ID)
+        if channel is None:
+            logger.error(f"Channel {self.DEFAULT_CHANNEL_ID} not found. Skipping catch-up.")
+            return []
+
+        last_message_id = await repo.get_latest_message_id(channel.id)
+        if last_message_id is None:
+            logger.info(f"Nothing archived from channel {channel.id} yet; use /scrape_backup instead of catch-up.")
+            return []
+
+        started = datetime.now(timezone.utc)
+        queued_days = []
+        scanned = deferred = 0
+        async with ArchiveBatchWriter(repo, SCRAPE_BATCH_SIZE, flush_seconds=0) as writer:
+            async for message in channel.history(limit=CATCHUP_MAX_MESSAGES, after=discord.Object(id=last_message_id),
+                                                 before=started, oldest_first=True):
+                scanned += 1
+                if message.author.id != self.JOHAN_USER_ID:
+                    continue
+                media_urls = [att.url for att in message.attachments][:MAX_MEDIA_PER_DAY]
+                if not media_urls:
+                    continue
+                days = writer.add_message(message, media_urls)
+                if days is None:
+                    deferred += 1
+                else:
+                    queued_days.extend(days)
+
+        archived_days = [day for day in queued_days if day in repo.days]
+        logger.info(f"Catch-up read {scanned} message(s) after {last_message_id} in channel {channel.id}: "
+                    f"archived {len(archived_days)} day(s), queued {deferred} for review.")
+        if scanned >= CATCHUP_MAX_MESSAGES:
+            logger.warning(f"Catch-up stopped at {CATCHUP_MAX_MESSAGES} messages; run /scrape_backup for the rest.")
 
-    def _load_last_archive_time(self):
+        if archived_days:
+            await channel.send(get_dialogue("catchup_archived", days=", ".join(map(str, sorted(archived_days)))))
+        return archived_days
+
+    def _arm_reminder(self):
+        """
+        Put self.next_reminder_time on the shared scheduler (or clear it).
+        """
+        if self.next_reminder_time:
+            scheduler.schedule(REMINDER_JOB, self.next_reminder_time, self._reminder_due)
+        else:
+            scheduler.cancel(REMINDER_JOB)
+
+    async def _on_days_archived(self, days):
+        """
+        Called by the repository after days are archived (auto, manual, backup or import).
+        If that moved the latest archive time, the reminder schedule restarts from it.
+        """
+        old_time = self.last_archive_time
+        await self._load_last_archive_time()
+
+        if self.last_archive_time and self.last_archive_time != old_time:
+            logger.info("New last_archive_time after archive => Rescheduling first reminder.")
+            self.next_reminder_time = None
+            self._schedule_initial_reminder()
+            self._arm_reminder()
+
+    async def _load_last_archive_time(self):
         """
         Pull the latest archived timestamp from the DB and set self.last_archive_time.
         """
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT timestamp 
-                FROM daily_johans
-                WHERE timestamp IS NOT NULL
-                ORDER BY day DESC
-                LIMIT 1
-            """)
-            row = cursor.fetchone()
-
-        if not row or not row[0]:
+        timestamp_str = await repo.get_last_archive_timestamp()
+
+        if not timestamp_str:
             logger.info("No archived timestamp found. Starting with last_archive_time = None.")
             return
 
-        timestamp_str = row[0]
         try:
             loaded_dt = datetime.fromisoformat(timestamp_str)
             if loaded_dt.tzinfo is None:
@@ -116,74 +208,45 @@ class ArchiveDailyCog(commands.Cog):
             self.next_reminder_time = next_day_4pm
             logger.info(f"Initial reminder scheduled for {self.next_reminder_time} (tomorrow 4 PM).")
 
-    @tasks.loop(minutes=15)
-    async def daily_reminder_loop(self):
+    async def _reminder_due(self):
         """
-        Every 15 minutes, we check if:
-         - There's a new last_archive_time (meaning user posted a new day).
-           => Re-schedule from scratch.
-         - The current time >= self.next_reminder_time => send reminder + schedule next iteration
+        Runs on the scheduler exactly at self.next_reminder_time.
         """
-        # 1) Check if last_archive_time changed in DB (user might have done manual archive)
-        old_time = self.last_archive_time
-        self._load_last_archive_time()
-
-        # If last_archive_time changed (new day archived),
-        # we recalc the FIRST reminder from that new time
-        if self.last_archive_time and self.last_archive_time != old_time:
-            logger.info("Detected new last_archive_time in DB => Rescheduling first reminder.")
-            self.next_reminder_time = None
-            self._schedule_initial_reminder()
-
-        if not self.next_reminder_time:
-            # If we still don't have a next_reminder_time, do nothing
-            return
-
-        now_utc = datetime.now(timezone.utc)
-        if now_utc >= self.next_reminder_time:
-            # Time to send the reminder
-            await self._send_reminder()
+        await self.bot.wait_until_ready()
+        await self._send_reminder()
 
-            # Now we must schedule the subsequent reminder
-            # If the last day was archived before 3 PM => the FIRST reminder was +25h,
-            # subsequent reminders are every +24h from that moment
-            # If the last day was archived after 4 PM => we do a daily 4 PM approach
-            await self._schedule_subsequent_reminder()
+        # Now we must schedule the subsequent reminder
+        # If the last day was archived before 3 PM => the FIRST reminder was +25h,
+        # subsequent reminders are every +24h from that moment
+        # If the last day was archived after 4 PM => we do a daily 4 PM approach
+        self.next_reminder_time = None
+        await self._schedule_subsequent_reminder()
+        self._arm_reminder()
 
     async def _send_reminder(self):
         """
         Send the reminder message: how many days are missing?
         """
         # Check how many days are missing
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT MAX(day) FROM daily_johans")
-            result = cursor.fetchone()
-            latest_day = result[0] if result and result[0] else 0
+        latest_day = repo.days.max_day
 
         expected_day = latest_day + 1
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT day FROM daily_johans WHERE day <= ?", (latest_day,))
-            archived_days = {row[0] for row in cursor.fetchall()}
-
-        missing_days = set(range(1, latest_day + 1)) - archived_days
-        missed_days = len(missing_days)
+        missing_ranges = repo.days.missing_ranges(1, latest_day)
+        missed_days = sum(hi - lo + 1 for lo, hi in missing_ranges)
 
         channel = self.bot.get_channel(self.DEFAULT_CHANNEL_ID)
         if not channel:
             logger.error(f"Channel {self.DEFAULT_CHANNEL_ID} not found. Can't send reminder.")
             return
 
+        reminder_msg = get_dialogue("daily_reminder",
+                                    user=self.JOHAN_USER_ID,
+                                    day=expected_day)
         if missed_days > 0:
-            reminder_msg = get_dialogue("daily_reminder_with_missed",
-                                        user=self.JOHAN_USER_ID,
-                                        day=expected_day,
-                                        missed=missed_days)
-        else:
-            reminder_msg = get_dialogue("daily_reminder",
-                                        user=self.JOHAN_USER_ID,
-                                        day=expected_day)
+            reminder_msg += "\n" + get_dialogue("gap_alert",
+                                                latest_day=latest_day,
+                                                missed=missed_days,
+                                                ranges=format_day_ranges(missing_ranges, limit=MAX_REMINDER_RANGES))
 
         try:
             await channel.send(reminder_msg)
@@ -249,33 +312,44 @@ class ArchiveDailyCog(commands.Cog):
             self.next_reminder_time = next_4pm_local.astimezone(timezone.utc)
             logger.info(f"Scheduled subsequent reminder for daily 4 PM => {self.next_reminder_time}")
 
-    @daily_reminder_loop.before_loop
-    async def before_daily_reminder_loop(self):
-        await self.bot.wait_until_ready()
+    async def _archive_series(self, message, day_numbers, media_urls, now):
+        """
+        Archive one attachment per day in a single batch, skipping days already archived.
+        """
+        entries = [(day, message, [media_url]) for day, media_url in zip(day_numbers, media_urls)]
+        outcomes = await repo.archive_daily_johans_batch(entries)
+
+        archived_days = []
+        media_by_day = {}
+        for day, _, day_urls in entries:
+            media_by_day[day] = media_by_day.get(day, 0) + len(day_urls)
+        for day, outcome in outcomes.items():
+            if outcome == ALREADY_ARCHIVED:
+                await message.channel.send(get_dialogue("day_already_archived", day=day))
+                logger.info(f"Day {day} already archived. Skipping.")
+            elif outcome == ARCHIVED:
+                archived_days.append(day)
+                logger.info(f"Auto-archived day {day} from msg {message.id}")
+            else:
+                # MEDIA_FULL: the only other outcome when archived days are skipped.
+                await message.channel.send(get_dialogue("day_media_full", day=day, media_count=media_by_day[day]))
+                logger.warning(f"Day {day} from msg {message.id} not archived: {outcome}")
 
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
+        if archived_days:
+            await message.channel.send(
+                get_dialogue("auto_archived_series", days=", ".join(map(str, archived_days))))
+            self.last_archive_time = now  # Update cooldown
+
+    async def on_johan_post(self, message: discord.Message, info):
         """
         Automatic archiving logic:
-          - Only triggers on messages from Johan.
+          - Only triggers on messages from Johan with attachments (router filters).
           - Enforces a 12-hour cooldown since last successful archive.
           - Supports multi-day detection if multiple numbers + attachments.
           - Fallback to user reply if day number isn't auto-detected.
         """
-        # Let other commands/cogs see the message
-        await self.bot.process_commands(message)
-
-        # Only handle messages from Johan
-        if message.author.id != self.JOHAN_USER_ID:
-            logger.debug(f"Ignored message from user ID {message.author.id}")
-            return
-
-        if not message.attachments:
-            logger.debug(f"No attachments in message ID {message.id}")
-            return
-
-        # Up to 3 attachments
-        media_urls = [att.url for att in message.attachments][:3]
+        # Up to MAX_MEDIA_PER_DAY attachments
+        media_urls = [att.url for att in message.attachments][:MAX_MEDIA_PER_DAY]
         if not media_urls:
             logger.debug(f"No valid media in message ID {message.id}")
             return
@@ -301,59 +375,36 @@ class ArchiveDailyCog(commands.Cog):
                 return
 
         # Retrieve the highest archived day
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT MAX(day) FROM daily_johans")
-            result = cursor.fetchone()
-            latest_day = result[0] if result and result[0] else 0
+        latest_day = repo.days.max_day
 
         expected_next = latest_day + 1
         logger.debug(f"Latest archived day: {latest_day}, expected next day: {expected_next}")
 
         # Attempt to find day numbers automatically
-        numbers_found = re.findall(r"\d+", message.content)
-        match = re.search(r"(?:Day\s*#?|\#|daily\s+johan\s+|johan\s+)(\d+)|(^\d+$)",
-                          message.content, re.IGNORECASE)
+        parsed = parse_days(message.content)
 
         # Multi-day scenario if multiple numbers + multiple attachments
-        if len(numbers_found) >= 2 and len(media_urls) >= 2:
-            day_numbers = [int(num) for num in numbers_found[:len(media_urls)]]
-            archived_days = []
-
-            for day, media_url in zip(day_numbers, media_urls):
-                if get_existing_message_for_day(day):
-                    await message.channel.send(get_dialogue("day_already_archived", day=day))
-                    logger.info(f"Day {day} already archived. Skipping.")
-                    continue
-                try:
-                    archive_daily_johan_db(day, message, [media_url], confirmed=True)
-                    archived_days.append(day)
-                    logger.info(f"Auto-archived day {day} from msg {message.id}")
-                except ValueError as ve:
-                    await message.channel.send(str(ve))
-                    logger.error(f"Error archiving day {day}: {ve}")
-                    continue
-
-            if archived_days:
-                await message.channel.send(
-                    get_dialogue("auto_archived_series", days=", ".join(map(str, archived_days))))
-                self.last_archive_time = now  # Update cooldown
+        series_days = parsed.series_days(len(media_urls))
+        if series_days:
+            await self._archive_series(message, series_days, media_urls, now)
             return
 
         # Single-day scenario
         day_number = None
         bypass_verification = False
 
-        if not match:
+        if parsed.explicit_day is None:
+            if conversations.is_pending(self.JOHAN_USER_ID):
+                await message.channel.send(get_dialogue("prompt_already_pending", user=self.JOHAN_USER_ID))
+                logger.info(f"Johan already has an open prompt; not prompting for msg {message.id}.")
+                return
+
             # Prompt user to confirm if it’s a Daily Johan
             await message.channel.send(get_dialogue("ask_if_daily_johan", user=self.JOHAN_USER_ID, msg_id=message.id))
             logger.debug(f"Prompted if msg {message.id} is a daily johan.")
 
-            def check_n(m):
-                return m.author.id == self.JOHAN_USER_ID and m.channel == message.channel
-
             try:
-                reply = await self.bot.wait_for("message", timeout=60.0, check=check_n)
+                reply = await conversations.ask(self.JOHAN_USER_ID, message.channel.id, timeout=60.0)
                 reply_content = reply.content.strip().lower()
 
                 if reply_content in ["no", "n"]:
@@ -361,36 +412,16 @@ class ArchiveDailyCog(commands.Cog):
                     return
 
                 # Maybe user typed a day number?
-                numbers_in_reply = re.findall(r"\d+", reply.content)
-                if numbers_in_reply:
-                    if len(numbers_in_reply) >= 2 and len(media_urls) >= 2:
+                reply_days = parse_days(reply.content)
+                if reply_days.numbers:
+                    series_days = reply_days.series_days(len(media_urls))
+                    if series_days:
                         # Another multi-day from user
-                        day_numbers = [int(num) for num in numbers_in_reply[:len(media_urls)]]
-                        archived_days = []
-
-                        for day, media_url in zip(day_numbers, media_urls):
-                            if get_existing_message_for_day(day):
-                                await message.channel.send(get_dialogue("day_already_archived", day=day))
-                                logger.info(f"Day {day} archived. Skipping.")
-                                continue
-                            try:
-                                archive_daily_johan_db(day, message, [media_url], confirmed=True)
-                                archived_days.append(day)
-                                logger.info(f"Archived day {day} from msg {message.id}")
-                            except ValueError as ve:
-                                await message.channel.send(str(ve))
-                                logger.error(f"Error archiving day {day}: {ve}")
-                                continue
-
-                        if archived_days:
-                            await message.channel.send(
-                                get_dialogue("auto_archived_series", days=", ".join(map(str, archived_days)))
-                            )
-                            self.last_archive_time = now
+                        await self._archive_series(message, series_days, media_urls, now)
                         return
                     else:
                         # Single day
-                        day_number = int(numbers_in_reply[0])
+                        day_number = reply_days.numbers[0]
                         bypass_verification = True
                 else:
                     await message.channel.send(get_dialogue("couldnt_parse_reply"))
@@ -401,17 +432,15 @@ class ArchiveDailyCog(commands.Cog):
                 await message.channel.send("No response from Johan. Aborting auto-archive.")
                 logger.warning(f"Timeout waiting for reply for msg {message.id}.")
                 return
+            except ConversationBusy:
+                await message.channel.send(get_dialogue("prompt_already_pending", user=self.JOHAN_USER_ID))
+                return
         else:
             # We found a direct match
-            try:
-                day_number = int(match.group(1) or match.group(2))
-            except ValueError:
-                await message.channel.send(get_dialogue("parse_error", msg_id=message.id))
-                logger.error(f"Error parsing day for msg {message.id}.")
-                return
+            day_number = parsed.explicit_day
 
         # If multiple numbers but not enough attachments => ask manual submission
-        if len(numbers_found) > 1:
+        if len(parsed.numbers) > 1:
             await message.channel.send(get_dialogue("multiple_numbers"))
             logger.info(f"Multiple day nums in msg {message.id}; requested manual.")
             return
@@ -421,12 +450,12 @@ class ArchiveDailyCog(commands.Cog):
             await message.channel.send(get_dialogue("verification_prompt", provided=day_number))
             logger.info(f"Day {day_number} != expected {expected_next}; verifying with user.")
 
-            def check_verification(m):
-                return m.author.id == self.JOHAN_USER_ID and m.channel == message.channel and \
-                    m.content.lower() in ["yes", "no", "y", "n"]
+            def is_yes_no(m):
+                return m.content.lower() in ["yes", "no", "y", "n"]
 
             try:
-                verification_reply = await self.bot.wait_for("message", timeout=60.0, check=check_verification)
+                verification_reply = await conversations.ask(self.JOHAN_USER_ID, message.channel.id,
+                                                             timeout=60.0, accept=is_yes_no)
                 if verification_reply.content.strip().lower() in ["yes", "y"]:
                     await message.channel.send(get_dialogue("verification_accepted", provided=day_number))
                 else:
@@ -436,25 +465,29 @@ class ArchiveDailyCog(commands.Cog):
                 await message.channel.send("No verification response. Aborting auto-archive.")
                 logger.warning(f"Timeout verifying day {day_number} for msg {message.id}.")
                 return
+            except ConversationBusy:
+                await message.channel.send(get_dialogue("prompt_already_pending", user=self.JOHAN_USER_ID))
+                return
 
-        # Check if day is already archived
-        if get_existing_message_for_day(day_number):
-            await message.channel.send(get_dialogue("day_already_archived", day=day_number))
-            logger.info(f"Day {day_number} already archived.")
-            return
-
-        # Archive single day
+        # Archive single day; the existence check happens in the same transaction as the write
         try:
-            archive_daily_johan_db(day_number, message, media_urls, confirmed=True)
+            outcomes = await repo.archive_daily_johans_batch([(day_number, message, media_urls)])
+            if outcomes[day_number] == ALREADY_ARCHIVED:
+                await message.channel.send(get_dialogue("day_already_archived", day=day_number))
+                logger.info(f"Day {day_number} already archived.")
+                return
+            if outcomes[day_number] != ARCHIVED:  # MEDIA_FULL
+                await message.channel.send(get_dialogue("day_media_full", day=day_number,
+                                                        media_count=len(media_urls)))
+                logger.warning(f"Day {day_number} from msg {message.id} not archived: {outcomes[day_number]}")
+                return
+
             await message.channel.send(get_dialogue("auto_archived", day=day_number))
 
             # Update cooldown
             self.last_archive_time = now
             logger.info(f"Archived day {day_number} from msg {message.id} (auto).")
 
-        except ValueError as ve:
-            await message.channel.send(str(ve))
-            logger.error(f"ValueError archiving day {day_number}: {ve}")
         except Exception as e:
             await message.channel.send(get_dialogue("deletion_error", error=e))
             logger.error(f"Exception archiving day {day_number}: {e}")
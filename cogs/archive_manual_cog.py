@@ -1,16 +1,16 @@
 # cogs/archive_manual_cog.py
 
 import logging
-import re
-import sqlite3
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from config import DB_FILE
-from database import archive_daily_johan_db, get_existing_message_for_day
+from config import MAX_MEDIA_PER_DAY
+from database import CONFLICT, MEDIA_FULL, ON_EXISTING_APPEND, ON_EXISTING_REJECT
+from day_parser import parse_day_list
 from dialogues import get_dialogue
+from repository import repo
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +29,7 @@ class ArchiveManualCog(commands.Cog):
         logger.info(f"Received manual_archive command from {interaction.user} for message {message_id}, days={days}")
         await interaction.response.defer(ephemeral=True)
         try:
-            day_list = [int(d.strip()) for d in re.split(r'[ ,]+', days) if d.strip().isdigit()]
+            day_list = parse_day_list(days)
             if not day_list:
                 await interaction.followup.send(get_dialogue("no_valid_day_numbers"), ephemeral=True)
                 return
@@ -56,19 +56,23 @@ class ArchiveManualCog(commands.Cog):
             media_urls = [attachment.url for attachment in attachments]
 
             if len(day_list) == len(media_urls):
-                # One media per day
-                for day, media_url in zip(day_list, media_urls):
-                    existing_message = get_existing_message_for_day(day)
-                    if existing_message and str(existing_message[0]) != str(message.id):
+                # One media per day; nothing is written if any day belongs to another message
+                outcomes = await repo.archive_daily_johans_batch(
+                    [(day, message, [media_url]) for day, media_url in zip(day_list, media_urls)],
+                    on_existing=ON_EXISTING_REJECT
+                )
+                for day, outcome in outcomes.items():
+                    if outcome == CONFLICT:
                         await interaction.followup.send(
                             get_dialogue("day_taken_resolve_dupes", day=day),
                             ephemeral=True
                         )
                         return
-                    try:
-                        archive_daily_johan_db(day, message, [media_url], confirmed=True)
-                    except ValueError as ve:
-                        await interaction.followup.send(str(ve), ephemeral=True)
+                    if outcome == MEDIA_FULL:
+                        await interaction.followup.send(
+                            get_dialogue("not_enough_slots", media_count=1, day=day, slots=0),
+                            ephemeral=True
+                        )
                         return
 
                 await interaction.followup.send(
@@ -77,37 +81,28 @@ class ArchiveManualCog(commands.Cog):
                                  day_list=", ".join(map(str, day_list))),
                     ephemeral=True
                 )
-            elif len(day_list) == 1 and len(media_urls) <= 3:
+            elif len(day_list) == 1 and len(media_urls) <= MAX_MEDIA_PER_DAY:
                 # Multiple attachments for a single day
                 day = day_list[0]
-                with sqlite3.connect(DB_FILE) as conn:
-                    cursor = conn.cursor()
-                    cursor.execute(
-                        "SELECT media_url1, media_url2, media_url3 FROM daily_johans WHERE day = ?",
-                        (day,)
-                    )
-                    result = cursor.fetchone()
-                    if result:
-                        existing_media = list(result)
-                        available_slots = [i for i, url in enumerate(existing_media) if url is None]
-                        if len(available_slots) < len(media_urls):
-                            await interaction.followup.send(
-                                get_dialogue("not_enough_slots",
-                                             media_count=len(media_urls),
-                                             day=day,
-                                             slots=len(available_slots)
-                                             ),
-                                ephemeral=True
-                            )
-                            return
-                try:
-                    archive_daily_johan_db(day, message, media_urls, confirmed=True)
+                # Free slots are checked inside the write transaction, so a concurrent append can't
+                # squeeze these out; MEDIA_FULL means nothing was added.
+                outcomes = await repo.archive_daily_johans_batch([(day, message, media_urls)],
+                                                                 on_existing=ON_EXISTING_APPEND)
+                if outcomes[day] == MEDIA_FULL:
+                    existing_media = await repo.get_media_for_day(day)
                     await interaction.followup.send(
-                        get_dialogue("auto_archived", day=day),
+                        get_dialogue("not_enough_slots",
+                                     media_count=len(media_urls),
+                                     day=day,
+                                     slots=max(0, MAX_MEDIA_PER_DAY - len(existing_media))
+                                     ),
                         ephemeral=True
                     )
-                except ValueError as ve:
-                    await interaction.followup.send(str(ve), ephemeral=True)
+                    return
+                await interaction.followup.send(
+                    get_dialogue("auto_archived", day=day),
+                    ephemeral=True
+                )
             else:
                 await interaction.followup.send(
                     get_dialogue("mismatch_days_attachments"),
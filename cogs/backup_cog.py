@@ -2,19 +2,125 @@
 
 import asyncio
 import logging
-import re
+import time
 
 import discord
 from discord import app_commands
 from discord.ext import commands
+from discord.ui import View, Button, Modal, TextInput
 
-from config import JOHAN_USER_ID
-from database import archive_daily_johan_db, get_existing_message_for_day
+from archive_writer import ArchiveBatchWriter
+from config import (JOHAN_USER_ID, MAX_MEDIA_PER_DAY, SCRAPE_CONCURRENCY, SCRAPE_CHECKPOINT_EVERY,
+                    SCRAPE_BATCH_SIZE, SCRAPE_FLUSH_SECONDS, SCRAPE_PROGRESS_SECONDS)
+from database import ALREADY_ARCHIVED, ARCHIVED, CONFLICT, MEDIA_FULL, ON_EXISTING_REJECT
+from day_parser import parse_days
+from repository import repo
+from scrape_progress import ScrapeProgress
 
 logger = logging.getLogger(__name__)
 
 PASSWORD = "jecslide"  # Example password for demonstration
 
+REVIEW_PAGE_SIZE = 5  # a modal holds at most five text inputs
+SKIP_ANSWERS = ("no", "n", "skip")
+
+
+class ReviewDaysModal(Modal, title="Enter Day Numbers"):
+    """
+    One text input per queued message on the current review page.
+    """
+
+    def __init__(self, view: "ReviewQueueView"):
+        super().__init__()
+        self.view = view
+        self.inputs = []
+        for index, item in enumerate(view.items, start=1):
+            _, _, content, media_count = item
+            caption = " ".join(content.split()) or "no caption"
+            text_input = TextInput(
+                label=f"#{index} ({media_count} media): {caption}"[:45],
+                placeholder="Day(s), 'no' to discard, blank to decide later",
+                required=False,
+                max_length=100,
+            )
+            self.add_item(text_input)
+            self.inputs.append((item, text_input))
+
+    async def on_submit(self, interaction: discord.Interaction):
+        await interaction.response.defer()
+        answers = [(item, text_input.value.strip()) for item, text_input in self.inputs]
+        results = await self.view.cog.resolve_reviews([(item, answer) for item, answer in answers if answer])
+        await self.view.reload()
+        await interaction.edit_original_response(content=self.view.render(), view=self.view)
+        if results:
+            await interaction.followup.send("\n".join(results), ephemeral=True)
+
+
+class ReviewQueueView(View):
+    """
+    Pages through the persisted review queue, REVIEW_PAGE_SIZE messages at a time.
+    """
+
+    def __init__(self, cog: "BackupCog"):
+        super().__init__(timeout=600)
+        self.cog = cog
+        self.items = []
+        self.total = 0
+        # Keyset pagination: the message ID each visited page started after.
+        self.page_starts = [0]
+
+    async def reload(self):
+        self.total = await repo.count_review_queue()
+        self.items = await repo.get_review_queue(self.page_starts[-1], REVIEW_PAGE_SIZE)
+        if not self.items and len(self.page_starts) > 1:
+            # Everything on this page was resolved; step back to the previous page.
+            self.page_starts.pop()
+            self.items = await repo.get_review_queue(self.page_starts[-1], REVIEW_PAGE_SIZE)
+        for item in self.children:
+            if isinstance(item, Button):
+                if item.custom_id == "review_prev":
+                    item.disabled = len(self.page_starts) <= 1
+                elif item.custom_id == "review_next":
+                    item.disabled = len(self.items) < REVIEW_PAGE_SIZE
+                elif item.custom_id == "review_enter":
+                    item.disabled = not self.items
+
+    def render(self):
+        if not self.items:
+            return "The backup review queue is empty."
+        lines = [f"Backup review queue ({self.total} message(s) waiting):"]
+        for index, (message_id, channel_id, content, media_count) in enumerate(self.items, start=1):
+            caption = " ".join(content.split())[:80] or "*no caption*"
+            lines.append(f"**#{index}** {self.cog.jump_url(channel_id, message_id)} "
+                         f"({media_count} media): {caption}")
+        lines.append("Press **Enter days** to answer this page; several days archive a series.")
+        return "\n".join(lines)
+
+    @discord.ui.button(label="◀", style=discord.ButtonStyle.primary, custom_id="review_prev")
+    async def prev_button(self, interaction: discord.Interaction, button: Button):
+        if len(self.page_starts) > 1:
+            self.page_starts.pop()
+        await self.reload()
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+    @discord.ui.button(label="▶", style=discord.ButtonStyle.primary, custom_id="review_next")
+    async def next_button(self, interaction: discord.Interaction, button: Button):
+        if self.items:
+            self.page_starts.append(self.items[-1][0])
+        await self.reload()
+        await interaction.response.edit_message(content=self.render(), view=self)
+
+    @discord.ui.button(label="Enter days", style=discord.ButtonStyle.success, custom_id="review_enter")
+    async def enter_button(self, interaction: discord.Interaction, button: Button):
+        await interaction.response.send_modal(ReviewDaysModal(self))
+
+    @discord.ui.button(label="Discard page", style=discord.ButtonStyle.danger, custom_id="review_discard")
+    async def discard_button(self, interaction: discord.Interaction, button: Button):
+        removed = await repo.remove_review_messages([item[0] for item in self.items])
+        await self.reload()
+        await interaction.response.edit_message(content=self.render(), view=self)
+        await interaction.followup.send(f"Discarded {removed} message(s) from the review queue.", ephemeral=True)
+
 
 class BackupCog(commands.Cog):
     def __init__(self, bot):
@@ -26,9 +132,11 @@ class BackupCog(commands.Cog):
                           description="Run a one-time automatic scraping backup (requires password).")
     @app_commands.describe(
         password="The required password to run this command.",
-        channels="Comma separated list of channel IDs to scan."
+        channels="Comma separated list of channel IDs to scan.",
+        full_rescan="Ignore saved progress and scan every channel from the beginning."
     )
-    async def scrape_backup(self, interaction: discord.Interaction, password: str, channels: str):
+    async def scrape_backup(self, interaction: discord.Interaction, password: str, channels: str,
+                            full_rescan: bool = False):
         if self.backup_active:
             await interaction.response.send_message(
                 "A backup is already running. Please wait for it to finish or use /panic_stop.",
@@ -66,9 +174,10 @@ class BackupCog(commands.Cog):
         self.stop_requested = False
         self.backup_active = True
 
-        await self.process_backup(interaction, scan_channels)
-
-        self.backup_active = False
+        try:
+            await self.process_backup(interaction, scan_channels, full_rescan)
+        finally:
+            self.backup_active = False
 
     @app_commands.command(name="panic_stop", description="Stop the ongoing backup process immediately.")
     async def panic_stop(self, interaction: discord.Interaction):
@@ -79,112 +188,204 @@ class BackupCog(commands.Cog):
         await interaction.response.send_message("Panic stop initiated. The backup process will halt soon.",
                                                 ephemeral=True)
 
-    async def process_backup(self, interaction: discord.Interaction, channels):
-        await interaction.followup.send("Starting backup process...", ephemeral=True)
+    async def process_backup(self, interaction: discord.Interaction, channels, full_rescan=False):
+        channel_ids = [channel.id for channel in channels]
+        if full_rescan:
+            await repo.clear_scrape_checkpoints(channel_ids)
+        checkpoints = await repo.get_scrape_checkpoints(channel_ids)
+
+        # Up to SCRAPE_CONCURRENCY channel histories are read at once. Archive writes from all
+        # of them share one buffered writer and land in batches, not one transaction per message.
+        semaphore = asyncio.Semaphore(max(1, SCRAPE_CONCURRENCY))
+
+        # Progress goes into the original (ephemeral) response instead of a stream of followups.
+        async def edit_progress(content):
+            await interaction.edit_original_response(content=content)
+
+        async with ArchiveBatchWriter(repo, SCRAPE_BATCH_SIZE, SCRAPE_FLUSH_SECONDS) as writer:
+            async with ScrapeProgress(writer, edit_progress, SCRAPE_PROGRESS_SECONDS) as progress:
+                trackers = {channel.id: progress.add_channel(channel, checkpoints.get(channel.id))
+                            for channel in channels}
+
+                async def scan(channel):
+                    async with semaphore:
+                        return await self._scan_channel(interaction, channel, checkpoints.get(channel.id),
+                                                        writer, trackers[channel.id])
+
+                results = await asyncio.gather(*(scan(channel) for channel in channels))
+
+        await progress.publish(final=True)
+        stats = writer.stats()
+        logger.info(f"Backup wrote {stats['archived']} day(s) in {stats['flushes']} batch(es): "
+                    f"{stats['rows_per_second']} rows/sec overall, {stats['rows_per_db_second']} rows/sec "
+                    f"of database time ({stats['db_seconds']}s).")
+
+        if self.stop_requested:
+            await interaction.followup.send("Backup process was stopped by panic button. "
+                                            "Progress is saved; run it again to resume.", ephemeral=True)
+            return
 
-        for channel in channels:
-            if self.stop_requested:
-                await interaction.followup.send("Backup process was stopped by panic button.", ephemeral=True)
-                return
+        lines = []
+        for channel, (scanned, resumed) in zip(channels, results):
+            start = "resumed from checkpoint" if resumed else "from the beginning"
+            lines.append(f"- {channel.mention}: {scanned} new message(s) scanned ({start})")
+        lines.append(f"Archived {stats['archived']} day(s) in {stats['flushes']} batch(es) "
+                     f"({stats['rows_per_second']} rows/sec).")
+        if stats["queued_for_review"]:
+            lines.append(f"{stats['queued_for_review']} message(s) without a day number were queued; "
+                         "use /review_backup to assign them.")
+        if writer.pending:
+            lines.append(f"⚠️ {writer.pending} entries could not be written; see the logs and run the backup again.")
+        await interaction.followup.send("Backup process completed.\n" + "\n".join(lines), ephemeral=True)
+
+    async def _scan_channel(self, interaction, channel, checkpoint, writer, tracker):
+        """
+        Scan one channel's history oldest-first, starting after its checkpoint.
+
+        The checkpoint is saved every SCRAPE_CHECKPOINT_EVERY messages and whenever the scan
+        ends (finished, panic stop or error), so a re-run only reads newer messages. The
+        writer is flushed first, so a checkpoint never gets ahead of the archived data.
+
+        Time spent waiting for history pages (API latency and rate limits) is added to the
+        tracker's api_wait_seconds.
+
+        Returns:
+            tuple: (messages scanned, whether the scan resumed from a checkpoint).
+        """
+        after = discord.Object(id=checkpoint[0]) if checkpoint else None
+        last_message_id = None
+        scanned = unsaved = 0
+        tracker.start()
+        try:
+            fetch_started = time.perf_counter()
+            async for message in channel.history(limit=None, oldest_first=True, after=after):
+                tracker.api_wait_seconds += time.perf_counter() - fetch_started
+                if self.stop_requested:
+                    break
+
+                await self._process_message(message, writer, tracker)
+                last_message_id = message.id
+                tracker.advance(message.id)
+                scanned += 1
+                unsaved += 1
+                if unsaved >= SCRAPE_CHECKPOINT_EVERY and await writer.flush():
+                    await repo.save_scrape_checkpoint(channel.id, last_message_id, unsaved)
+                    unsaved = 0
+                fetch_started = time.perf_counter()
+        except discord.Forbidden:
+            await interaction.followup.send(f"Missing permissions to read history in {channel.mention}.",
+                                            ephemeral=True)
+        except Exception as e:
+            logger.error(f"Unexpected error in channel {channel.id}: {e}")
+            await interaction.followup.send(f"An error occurred in channel {channel.mention}: {e}", ephemeral=True)
+        finally:
+            if last_message_id is not None and unsaved and await writer.flush():
+                await repo.save_scrape_checkpoint(channel.id, last_message_id, unsaved)
+            tracker.finish()
+        logger.info(f"Scanned {scanned} message(s) in channel {channel.id}"
+                    f"{f' after checkpoint {checkpoint[0]}' if checkpoint else ''}.")
+        return scanned, checkpoint is not None
+
+    async def _process_message(self, message, writer, tracker):
+        if message.author.id != JOHAN_USER_ID or not message.attachments:
+            return
 
+        media_urls = [att.url for att in message.attachments][:MAX_MEDIA_PER_DAY]
+        if not media_urls:
+            return
+        tracker.matched += 1
+
+        # Parsed exactly as the live auto-archive path parses it; no day means the review queue
+        if writer.add_message(message, media_urls) is None:
+            tracker.queued += 1
+
+    @app_commands.command(name="review_backup",
+                          description="Assign day numbers to backup messages the scrape couldn't label.")
+    async def review_backup(self, interaction: discord.Interaction):
+        view = ReviewQueueView(self)
+        await view.reload()
+        await interaction.response.send_message(content=view.render(), view=view, ephemeral=True)
+
+    def jump_url(self, channel_id, message_id):
+        channel = self.bot.get_channel(channel_id)
+        guild = channel.guild.id if channel is not None and getattr(channel, "guild", None) else "@me"
+        return f"https://discord.com/channels/{guild}/{channel_id}/{message_id}"
+
+    async def resolve_reviews(self, answers):
+        """
+        Archive or discard queued review messages.
+
+        Each message is fetched again so the archived attachment URLs are current. Messages
+        are removed from the queue once archived or discarded; anything that fails stays
+        queued.
+
+        Args:
+            answers (list of tuple): ((message_id, channel_id, content, media_count), answer) pairs.
+
+        Returns:
+            list of str: One result line per answered message.
+        """
+        results = []
+        resolved = []
+        for (message_id, channel_id, _, _), answer in answers:
+            link = self.jump_url(channel_id, message_id)
+            if answer.lower() in SKIP_ANSWERS:
+                resolved.append(message_id)
+                results.append(f"Discarded {link}.")
+                continue
+
+            parsed = parse_days(answer)
+            if not parsed.numbers:
+                results.append(f"No valid day numbers for {link}; left in the queue.")
+                continue
+
+            channel = self.bot.get_channel(channel_id)
+            if channel is None:
+                results.append(f"Channel of {link} is not accessible; left in the queue.")
+                continue
             try:
-                async for message in channel.history(limit=None, oldest_first=True):
-                    if self.stop_requested:
-                        await interaction.followup.send("Backup process was stopped by panic button.", ephemeral=True)
-                        return
-
-                    if message.author.id != JOHAN_USER_ID or not message.attachments:
-                        continue
-
-                    media_urls = [att.url for att in message.attachments][:3]
-                    if not media_urls:
-                        continue
-
-                    numbers_found = re.findall(r"\d+", message.content)
-                    explicit_pattern = re.search(
-                        r"(?:Day\s*#?\s*|\#|\b(?:daily\s+johan|johan)\s+)(\d+)",
-                        message.content,
-                        re.IGNORECASE
-                    )
-
-                    day_numbers = []
-                    if explicit_pattern:
-                        day_numbers = [int(explicit_pattern.group(1))]
-                    else:
-                        day_numbers = [int(num) for num in numbers_found] if numbers_found else []
-
-                    # Multi-day scenario
-                    if len(media_urls) >= 2 and len(day_numbers) >= 2:
-                        for day, media_url in zip(day_numbers[:len(media_urls)], media_urls):
-                            if get_existing_message_for_day(day):
-                                continue
-                            try:
-                                archive_daily_johan_db(day, message, [media_url], confirmed=True)
-                            except Exception as e:
-                                logger.error(f"Error archiving day {day} in backup: {e}")
-                        continue
-
-                    # Single-day scenario
-                    if day_numbers and len(day_numbers) == 1:
-                        day = day_numbers[0]
-                        if not get_existing_message_for_day(day):
-                            try:
-                                archive_daily_johan_db(day, message, media_urls, confirmed=True)
-                            except Exception as e:
-                                logger.error(f"Error archiving day {day} in backup: {e}")
-                        continue
-
-                    # Prompt user
-                    prompt = (
-                        f"Review message {message.jump_url} in {channel.mention}. "
-                        "Reply with a day number to archive, or 'no' to skip. "
-                        "If series, reply with multiple days separated by commas/spaces."
-                    )
-                    await interaction.followup.send(prompt, ephemeral=True)
-
-                    def check(m):
-                        return m.author == interaction.user and m.channel == interaction.channel
-
-                    try:
-                        response = await self.bot.wait_for("message", timeout=60.0, check=check)
-                        content = response.content.strip().lower()
-                        if content in ["no", "n"]:
-                            continue
-
-                        user_numbers = re.findall(r"\d+", content)
-                        if not user_numbers:
-                            await interaction.followup.send("No valid day numbers provided. Skipping.", ephemeral=True)
-                        else:
-                            # Possibly multi-day
-                            if len(user_numbers) >= 2 and len(media_urls) >= 2:
-                                days = [int(num) for num in user_numbers][:len(media_urls)]
-                                for day, media_url in zip(days, media_urls):
-                                    if get_existing_message_for_day(day):
-                                        continue
-                                    try:
-                                        archive_daily_johan_db(day, message, [media_url], confirmed=True)
-                                    except Exception as e:
-                                        logger.error(f"Error archiving day {day} in user-confirmed backup: {e}")
-                            else:
-                                day = int(user_numbers[0])
-                                if not get_existing_message_for_day(day):
-                                    try:
-                                        archive_daily_johan_db(day, message, media_urls, confirmed=True)
-                                    except Exception as e:
-                                        logger.error(f"Error archiving day {day} in user-confirmed backup: {e}")
-                    except asyncio.TimeoutError:
-                        await interaction.followup.send("Timed out waiting for response. Skipping message.",
-                                                        ephemeral=True)
-                        continue
-
-            except discord.Forbidden:
-                await interaction.followup.send(f"Missing permissions to read history in {channel.mention}.",
-                                                ephemeral=True)
+                message = await channel.fetch_message(message_id)
+            except discord.NotFound:
+                resolved.append(message_id)
+                results.append(f"{link} no longer exists; removed from the queue.")
+                continue
+            except discord.HTTPException as e:
+                logger.error(f"HTTPException while fetching queued message {message_id}: {e}")
+                results.append(f"Could not fetch {link}; left in the queue.")
+                continue
+
+            media_urls = [att.url for att in message.attachments][:MAX_MEDIA_PER_DAY]
+            days = parsed.series_days(len(media_urls))
+            if days:
+                entries = [(day, message, [media_url]) for day, media_url in zip(days, media_urls)]
+            else:
+                entries = [(parsed.numbers[0], message, media_urls)]
+            try:
+                # All or nothing: a day held by another message leaves the whole answer unapplied
+                outcomes = await repo.archive_daily_johans_batch(entries, on_existing=ON_EXISTING_REJECT)
             except Exception as e:
-                logger.error(f"Unexpected error in channel {channel.id}: {e}")
-                await interaction.followup.send(f"An error occurred in channel {channel.mention}: {e}", ephemeral=True)
-
-        await interaction.followup.send("Backup process completed.", ephemeral=True)
+                logger.error(f"Error archiving reviewed message {message_id}: {e}")
+                results.append(f"Could not archive {link}; left in the queue.")
+                continue
+
+            if all(outcome in (ARCHIVED, ALREADY_ARCHIVED) for outcome in outcomes.values()):
+                resolved.append(message_id)
+                results.append(f"Archived {link} as day(s) {', '.join(map(str, outcomes))}.")
+                continue
+            reasons = []
+            taken = [day for day, outcome in outcomes.items() if outcome == CONFLICT]
+            if taken:
+                reasons.append(f"day(s) {', '.join(map(str, taken))} already belong to another message")
+            full = [day for day, outcome in outcomes.items() if outcome == MEDIA_FULL]
+            if full:
+                reasons.append(f"day(s) {', '.join(map(str, full))} have no room for more media")
+            if not reasons:
+                reasons.append("nothing was written")
+            results.append(f"Could not archive {link}: {'; '.join(reasons)}; left in the queue.")
+
+        if resolved:
+            await repo.remove_review_messages(resolved)
+        return results
 
 
 async def setup(bot):
@@ -1,60 +1,53 @@
 # cogs/db_manage_cog.py
 
 import asyncio
-import json
 import logging
-import sqlite3
-from io import BytesIO
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from config import DB_FILE
-from database import init_db, insert_bulk_daily_johans
+from archive_io import IMPORT_EXTENSIONS, parse_import_file
+from conversations import ConversationBusy, conversations
+from repository import repo
 
 logger = logging.getLogger(__name__)
 
+# Discord rejects messages with more than 10 attachments.
+MAX_FILES_PER_MESSAGE = 10
+
 
 class DBManageCog(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
-        self.awaiting_import = {}
-        init_db()
-
-    async def cog_load(self):
-        # Listen for DMs with attachments to handle import files
-        self.bot.add_listener(self.on_dm_message, "on_message")
 
-    @app_commands.command(name="export_db", description="Export the Daily Johans database as a JSON file.")
+    @app_commands.command(name="export_db", description="Export the Daily Johans database as a compressed JSON file.")
+    @app_commands.describe(format="json: one JSON array per file. ndjson: one record per line.")
+    @app_commands.choices(format=[
+        app_commands.Choice(name="json", value="json"),
+        app_commands.Choice(name="ndjson", value="ndjson"),
+    ])
     @commands.has_permissions(administrator=True)
-    async def export_db(self, interaction: discord.Interaction):
+    async def export_db(self, interaction: discord.Interaction, format: str = "json"):
         await interaction.response.defer(ephemeral=True)
         user = interaction.user
 
         try:
-            with sqlite3.connect(DB_FILE) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT * FROM daily_johans")
-                rows = cursor.fetchall()
-                columns = [desc[0] for desc in cursor.description]
-                data = [dict(zip(columns, row)) for row in rows]
+            # Streams from the cursor into gzip'd temp files on a reader thread.
+            parts = await repo.write_export(format)
         except Exception as e:
             logger.error(f"Failed to export database: {e}")
             await interaction.followup.send(f"Failed to export database: {e}", ephemeral=True)
             return
 
         try:
-            json_data = json.dumps(data, indent=4)
-        except Exception as e:
-            logger.error(f"Failed to serialize data to JSON: {e}")
-            await interaction.followup.send(f"Failed to serialize data: {e}", ephemeral=True)
-            return
-
-        file = discord.File(fp=BytesIO(json_data.encode()), filename="daily_johans_export.json")
-
-        try:
-            await user.send("Here is your exported Daily Johans database:", file=file)
+            intro = "Here is your exported Daily Johans database:"
+            if len(parts) > 1:
+                intro = f"Here is your exported Daily Johans database, split into {len(parts)} files:"
+            for i in range(0, len(parts), MAX_FILES_PER_MESSAGE):
+                batch = parts[i:i + MAX_FILES_PER_MESSAGE]
+                files = [discord.File(fp=fp, filename=filename) for filename, fp in batch]
+                await user.send(intro if i == 0 else None, files=files)
             await interaction.followup.send("Database exported successfully! Check your DMs.", ephemeral=True)
         except discord.Forbidden:
             await interaction.followup.send(
@@ -64,19 +57,24 @@ class DBManageCog(commands.Cog):
         except Exception as e:
             logger.error(f"Failed to send the file: {e}")
             await interaction.followup.send(f"Failed to send the file: {e}", ephemeral=True)
+        finally:
+            for _, fp in parts:
+                fp.close()
 
-    @app_commands.command(name="import_db", description="Import the Daily Johans database from a JSON file.")
+    @app_commands.command(name="import_db", description="Import the Daily Johans database from export file(s).")
     @commands.has_permissions(administrator=True)
     async def import_db(self, interaction: discord.Interaction):
         await interaction.response.defer(ephemeral=True)
         user = interaction.user
 
-        if user.id in self.awaiting_import:
-            await interaction.followup.send("You are already in the process of importing a database.", ephemeral=True)
+        if conversations.is_pending(user.id):
+            await interaction.followup.send("You already have an open prompt (or import). Please finish it first.",
+                                            ephemeral=True)
             return
 
         try:
-            await user.send("Please upload the `daily_johans_export.json` file within the next 60 seconds.")
+            await user.send("Please upload your `daily_johans_export` file(s) (`.json`, `.ndjson`, optionally `.gz`) "
+                            "within the next 60 seconds. Multi-part exports can be attached to one message.")
             await interaction.followup.send("Check your DMs for import instructions.", ephemeral=True)
         except discord.Forbidden:
             await interaction.followup.send(
@@ -89,69 +87,76 @@ class DBManageCog(commands.Cog):
             await interaction.followup.send(f"Failed to send DM: {e}", ephemeral=True)
             return
 
-        event = asyncio.Event()
-        self.awaiting_import[user.id] = {"event": event, "data": None}
-
         try:
-            await asyncio.wait_for(event.wait(), timeout=60.0)
-        except asyncio.TimeoutError:
-            del self.awaiting_import[user.id]
+            uploaded_files = await self._receive_import_files(user)
+        except (asyncio.TimeoutError, ConversationBusy):
             try:
                 await user.send("You took too long. Please run /import_db again.")
             except:
                 pass
             return
 
-        file_content = self.awaiting_import[user.id]["data"]
-        del self.awaiting_import[user.id]
-
-        if not file_content:
+        if not uploaded_files:
             await user.send("No valid file was uploaded. Import aborted.")
             return
 
         try:
-            data = json.loads(file_content)
-            if not isinstance(data, list):
-                raise ValueError("JSON must be a list of records.")
-        except json.JSONDecodeError as e:
-            await user.send(f"Failed to parse JSON: {e}")
-            return
+            data = []
+            for filename, payload in uploaded_files:
+                data.extend(await asyncio.to_thread(parse_import_file, filename, payload))
         except ValueError as e:
             await user.send(f"Invalid data format: {e}")
             return
 
         try:
-            insert_bulk_daily_johans(data)
-            await user.send("Database imported successfully!")
+            report = await repo.insert_bulk_daily_johans(data)
+            summary = (
+                f"Database import finished: {len(report['inserted'])} day(s) imported, "
+                f"{len(report['skipped'])} skipped (already archived), "
+                f"{len(report['invalid'])} invalid record(s)."
+            )
+            if report["invalid"]:
+                details = "\n".join(f"- Record {index}: {reason}" for index, reason in report["invalid"][:10])
+                if len(report["invalid"]) > 10:
+                    details += f"\n- ...and {len(report['invalid']) - 10} more"
+                summary += f"\n{details}"
+            await user.send(summary)
         except Exception as e:
             logger.error(f"Failed to import data: {e}")
             await user.send(f"Failed to import data: {e}")
 
-    async def on_dm_message(self, message: discord.Message):
-        if message.author.bot:
-            return
-
-        user_id = message.author.id
-        if user_id not in self.awaiting_import:
-            return
-
-        if not message.attachments:
-            await message.author.send("Please attach the `.json` file.")
-            return
+    async def _receive_import_files(self, user, timeout=60.0):
+        """
+        Wait for the user to DM export file(s), re-prompting on messages without valid files.
+
+        Returns:
+            list of tuple or None: (filename, bytes) per attachment, or None if reading failed.
+
+        Raises:
+            asyncio.TimeoutError: If no valid upload arrives within the timeout.
+        """
+        dm_channel = user.dm_channel or await user.create_dm()
+        deadline = asyncio.get_running_loop().time() + timeout
+        while True:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError
+            message = await conversations.ask(user.id, dm_channel.id, timeout=remaining)
+
+            if not message.attachments:
+                await message.author.send("Please attach the export file(s).")
+                continue
+
+            if not all(att.filename.lower().endswith(IMPORT_EXTENSIONS) for att in message.attachments):
+                await message.author.send(
+                    "Invalid file type. Please upload `.json` or `.ndjson` files (optionally `.gz`).")
+                continue
 
-        attachment = message.attachments[0]
-        if not attachment.filename.endswith(".json"):
-            await message.author.send("Invalid file type. Please upload a `.json` file.")
-            return
-
-        try:
-            file_bytes = await attachment.read()
-            file_content = file_bytes.decode()
-            self.awaiting_import[user_id]["data"] = file_content
-            self.awaiting_import[user_id]["event"].set()
-        except Exception as e:
-            logger.error(f"Failed to read uploaded file: {e}")
-            self.awaiting_import[user_id]["event"].set()
+            try:
+                return [(att.filename, await att.read()) for att in message.attachments]
+            except Exception as e:
+                logger.error(f"Failed to read uploaded file: {e}")
+                return None
 
     @export_db.error
     async def export_db_error(self, interaction: discord.Interaction, error):
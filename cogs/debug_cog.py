@@ -1,14 +1,19 @@
 # cogs/debug_cog.py
 
 import logging
-import sqlite3
 from datetime import datetime, timezone, timedelta
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from config import DB_FILE
+from conversations import conversations
+from gallery import gallery
+from link_refresher import link_refresher
+from media_mirror import mirror
+from phash_index import phash_index
+from message_router import router
+from repository import repo
 
 logger = logging.getLogger(__name__)
 
@@ -30,6 +35,12 @@ class DebugCog(commands.Cog):
           - Time since previous Daily Johan was archived
           - Time until next auto-archive is possible (cooldown)
           - Whether the 'recent_post' check is currently active
+          - Open prompt and prompt-timeout counts
+          - Message router handler counters
+          - Media mirror counters
+          - Perceptual index size and lookup latency
+          - Gallery render and cache counters
+          - CDN link refresh counters
         """
         # Attempt to retrieve the ArchiveDailyCog instance
         archive_cog = self.bot.get_cog("ArchiveDailyCog")
@@ -41,12 +52,8 @@ class DebugCog(commands.Cog):
             return
 
         # 1) Find the next day number from DB
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT MAX(day) FROM daily_johans")
-            result = cursor.fetchone()
-            latest_day = result[0] if result and result[0] else 0
-            next_day_number = latest_day + 1
+        latest_day = repo.days.max_day
+        next_day_number = latest_day + 1
 
         # 2) Time since last archive
         last_archive_time = archive_cog.last_archive_time
@@ -67,6 +74,9 @@ class DebugCog(commands.Cog):
             else:
                 time_until_next_archive_str = "Cooldown expired"
 
+        # 3) Open prompts (conversations.py)
+        prompt_stats = conversations.stats()
+
         # Format the debug message
         debug_message = (
             f"**Walpurgis Bot Debug Info**\n\n"
@@ -74,7 +84,31 @@ class DebugCog(commands.Cog):
             f"**Time Since Previous Archive:** {time_since_last_str}\n"
             f"**Time Until Next Archive:** {time_until_next_archive_str}\n"
             f"**recent_post Check Active?:** {recent_post_check_active}\n"
+            f"**Open Prompts:** {prompt_stats['pending']} "
+            f"(answered {prompt_stats['answered']}, timed out {prompt_stats['timed_out']}, "
+            f"refused while busy {prompt_stats['rejected_busy']})\n"
+            f"**Messages Routed:** {router.routed} ({router.prompt_replies} prompt replies)\n"
         )
+        for name, handler_stats in router.stats().items():
+            debug_message += (f"- `{name}`: {handler_stats['calls']} call(s), avg {handler_stats['avg_ms']} ms, "
+                              f"max {handler_stats['max_ms']} ms, {handler_stats['errors']} error(s)\n")
+        mirror_stats = mirror.stats()
+        debug_message += (f"**Media Mirror:** {mirror_stats['downloaded']} downloaded "
+                          f"({mirror_stats['bytes_written'] / (1024 * 1024):.1f} MiB), "
+                          f"{mirror_stats['already_stored']} already stored, "
+                          f"{mirror_stats['deduplicated']} deduplicated, {mirror_stats['failed']} failed, "
+                          f"{mirror_stats['in_flight']} in flight\n")
+        phash_stats = phash_index.stats()
+        debug_message += (f"**Perceptual Index:** {phash_stats['images']} images, "
+                          f"{phash_stats['lookups']} lookups, {phash_stats['avg_lookup_us']} µs avg\n")
+        gallery_stats = gallery.stats()
+        debug_message += (f"**Gallery:** {gallery_stats['renders']} rendered "
+                          f"({gallery_stats['avg_render_ms']} ms avg), {gallery_stats['cache_hits']} cache hits, "
+                          f"{gallery_stats['thumbnails']} thumbnails made\n")
+        link_stats = link_refresher.stats()
+        debug_message += (f"**Link Refresh:** {link_stats['refreshed']} re-signed, "
+                          f"{link_stats['unresolvable']} unresolvable, {link_stats['history_requests']} history "
+                          f"requests, {link_stats['cache_hits']} cache hits\n")
 
         # Send ephemeral debug info
         await interaction.response.send_message(debug_message, ephemeral=True)
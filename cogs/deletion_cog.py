@@ -2,15 +2,15 @@
 
 import logging
 import re
-import sqlite3
 from typing import Optional
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from config import DB_FILE
+from conversations import conversations
 from dialogues import get_dialogue
+from repository import repo
 
 logger = logging.getLogger(__name__)
 
@@ -45,14 +45,10 @@ class DeletionCog(commands.Cog):
             target_day = day
 
         entry = None
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            if target_day:
-                cursor.execute("SELECT day, message_id FROM daily_johans WHERE day = ?", (target_day,))
-                entry = cursor.fetchone()
-            elif message_id:
-                cursor.execute("SELECT day, message_id FROM daily_johans WHERE message_id = ?", (str(message_id),))
-                entry = cursor.fetchone()
+        if target_day:
+            entry = await repo.get_entry_for_day(target_day)
+        elif message_id:
+            entry = await repo.get_entry_for_message(message_id)
 
         if not entry:
             await interaction.followup.send(get_dialogue("no_entry_found"), ephemeral=True)
@@ -60,25 +56,24 @@ class DeletionCog(commands.Cog):
 
         archived_day, archived_message_id = entry
 
+        if conversations.is_pending(interaction.user.id):
+            await interaction.followup.send(get_dialogue("prompt_already_pending", user=interaction.user.id),
+                                            ephemeral=True)
+            return
+
         await interaction.followup.send(
             get_dialogue("confirm_deletion", day=archived_day),
             ephemeral=True
         )
 
-        def check(m):
-            return m.author == interaction.user and m.channel == interaction.channel
-
         try:
-            confirmation = await self.bot.wait_for("message", timeout=30.0, check=check)
+            confirmation = await conversations.ask(interaction.user.id, interaction.channel.id, timeout=30.0)
             if confirmation.content.strip().lower() not in ("yes", "y"):
                 await interaction.followup.send(get_dialogue("deletion_cancelled"), ephemeral=True)
                 await confirmation.delete()
                 return
 
-            with sqlite3.connect(DB_FILE) as conn:
-                cursor = conn.cursor()
-                cursor.execute("DELETE FROM daily_johans WHERE day = ?", (archived_day,))
-                conn.commit()
+            await repo.delete_daily_johan_by_day(archived_day)
 
             await interaction.followup.send(get_dialogue("deletion_success", day=archived_day), ephemeral=True)
             await confirmation.delete()
@@ -0,0 +1,67 @@
+# cogs/duplicates_cog.py
+
+import logging
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from config import DEFAULT_CHANNEL_ID
+from dialogues import get_dialogue
+from phash_index import phash_index
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 2000
+
+
+class DuplicatesCog(commands.Cog):
+    """
+    Flags media that look like media already archived under another day.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+
+    async def cog_load(self):
+        phash_index.add_duplicate_listener(self._on_duplicates)
+
+    def cog_unload(self):
+        phash_index.remove_duplicate_listener(self._on_duplicates)
+
+    async def _on_duplicates(self, duplicates):
+        channel = self.bot.get_channel(DEFAULT_CHANNEL_ID)
+        for duplicate in duplicates:
+            logger.warning(f"Day(s) {duplicate.days} look like day(s) {duplicate.other_days} "
+                           f"(distance {duplicate.distance}).")
+            if channel is not None:
+                await channel.send(get_dialogue("possible_duplicate",
+                                                day=", ".join(map(str, duplicate.days)),
+                                                other_days=", ".join(map(str, duplicate.other_days))))
+
+    @app_commands.command(name="find_duplicates",
+                          description="Scan the whole archive for images archived under more than one day.")
+    async def find_duplicates(self, interaction: discord.Interaction):
+        logger.info(f"find_duplicates invoked by {interaction.user}")
+        await interaction.response.defer(ephemeral=True)
+        duplicates = await phash_index.find_duplicates()
+        stats = phash_index.stats()
+        header = (f"Checked {stats['images']} mirrored image(s) "
+                  f"(max distance {phash_index.max_distance} of 64 bits).")
+        if not duplicates:
+            await interaction.followup.send(f"{header}\nNo duplicates found.", ephemeral=True)
+            return
+
+        lines = [f"{header}\nFound {len(duplicates)} possible duplicate(s):"]
+        for duplicate in duplicates:
+            kind = "identical file" if duplicate.distance == 0 else f"distance {duplicate.distance}"
+            lines.append(f"- Day(s) {', '.join(map(str, duplicate.days))} ↔ "
+                         f"{', '.join(map(str, duplicate.other_days))} ({kind})")
+        content = "\n".join(lines)
+        if len(content) > MAX_MESSAGE_LENGTH:
+            content = content[:MAX_MESSAGE_LENGTH - 2].rsplit("\n", 1)[0] + "\n…"
+        await interaction.followup.send(content, ephemeral=True)
+
+
+async def setup(bot):
+    await bot.add_cog(DuplicatesCog(bot))
@@ -1,22 +1,29 @@
 # cogs/fun_cog.py
 
 import logging
-import re
 from datetime import datetime, timezone
 
 import discord
-from discord.ext import commands, tasks
+from discord.ext import commands
 
-from config import DEFAULT_CHANNEL_ID
+from config import DEFAULT_CHANNEL_ID, TRIGGERS_FILE, FUN_CHANNEL_BURST, FUN_CHANNEL_REFILL_SECONDS
+from message_router import router
+from ratelimit import KeyedRateLimiter
+from scheduler import scheduler
+from triggers import TriggerEngine, load_triggers
 
 logger = logging.getLogger(__name__)
 
+WALPURGISNACHT_JOB = "walpurgisnacht"
+ROUTER_HANDLER = "meme_triggers"
+
 
 class FunCog(commands.Cog):
     """
     A collection of fun or whimsical features:
-    1) A daily task announcing Walpurgisnacht on April 30
-    2) Responding to certain words/phrases in chat with memes
+    1) A scheduled job announcing Walpurgisnacht on April 30
+    2) Responding to configured trigger words/phrases in chat with memes, rate limited
+       per channel and per trigger
     """
 
     def __init__(self, bot):
@@ -26,86 +33,77 @@ class FunCog(commands.Cog):
         if self.default_channel_id == 0:
             logger.warning("DEFAULT_CHANNEL_ID is not set. Walpurgisnacht announcements will not be sent.")
 
-        # Start the daily check task
-        self.walpurgisnacht_announcer.start()
+        # Sleep on the shared scheduler until the next April 30
+        self._schedule_walpurgisnacht()
+
+        # Chat triggers: one compiled pass per message, with outbound rate limiting
+        try:
+            self.triggers = load_triggers(TRIGGERS_FILE)
+        except ValueError as e:
+            logger.error(f"{e}. Chat triggers are disabled.")
+            self.triggers = TriggerEngine([])
+        # One bucket per (trigger, channel) enforces each trigger's cooldown; the channel
+        # bucket caps all trigger replies in a channel.
+        self.trigger_cooldowns = {
+            trigger.name: KeyedRateLimiter(rate=1 / trigger.cooldown_seconds, capacity=1)
+            for trigger in self.triggers.triggers if trigger.cooldown_seconds > 0
+        }
+        self.channel_limiter = KeyedRateLimiter(rate=1 / FUN_CHANNEL_REFILL_SECONDS, capacity=FUN_CHANNEL_BURST)
+        logger.info(f"Loaded {len(self.triggers)} chat trigger(s) from {TRIGGERS_FILE}.")
+
+        router.register(ROUTER_HANDLER, self.on_chat_message, bots=True)
 
     def cog_unload(self):
-        self.walpurgisnacht_announcer.cancel()
+        router.unregister(ROUTER_HANDLER)
+        scheduler.cancel(WALPURGISNACHT_JOB)
+
+    def _schedule_walpurgisnacht(self, after=None):
+        now = after or datetime.now(timezone.utc)
+        # Customize your desired date here
+        if now.month == 4 and now.day == 30 and after is None:
+            when = now  # Started on the day itself: announce right away
+        else:
+            when = datetime(now.year, 4, 30, tzinfo=timezone.utc)
+            if when <= now:
+                when = when.replace(year=now.year + 1)
+        scheduler.schedule(WALPURGISNACHT_JOB, when, self.walpurgisnacht_announcer)
+        logger.info(f"Walpurgisnacht announcement scheduled for {when}.")
 
-    @tasks.loop(hours=24)
     async def walpurgisnacht_announcer(self):
         """
-        Announce Walpurgisnacht in the default channel on April 30.
-        Runs every 24 hours.
+        Announce Walpurgisnacht in the default channel on April 30, then schedule next year's.
         """
-        today = datetime.now(timezone.utc)
-        # Customize your desired date here
-        if today.month == 4 and today.day == 30:
+        logger.debug("Waiting for bot to be ready before announcing Walpurgisnacht.")
+        await self.bot.wait_until_ready()
+        try:
             channel = self.bot.get_channel(self.default_channel_id)
             if channel:
                 logger.info("Sending Walpurgisnacht message.")
                 await channel.send("TONIGHT IS WALPURGIS!!!")
             else:
                 logger.warning(f"Channel with ID {self.default_channel_id} not found. Cannot send announcement.")
+        finally:
+            self._schedule_walpurgisnacht(after=datetime.now(timezone.utc))
 
-    @walpurgisnacht_announcer.before_loop
-    async def before_walpurgisnacht_announcer(self):
-        logger.debug("Waiting for bot to be ready before starting Walpurgisnacht announcer.")
-        await self.bot.wait_until_ready()
-
-    @commands.Cog.listener()
-    async def on_message(self, message: discord.Message):
+    async def on_chat_message(self, message: discord.Message, info):
         """
-        Respond to certain trigger words/phrases in chat:
-          - "cringe"
-          - "massive"
-          - "erm" with variable e/r/m
-          - "ripbozo" or "rip bozo"
-          - "lebron"
+        Respond to the trigger words/phrases configured in TRIGGERS_FILE
+        ("cringe", "massive", "erm", "rip bozo", "lebron", ...).
+        The router never passes the bot's own messages here.
         """
-        # Prevent the bot from responding to its own messages
-        if message.author == self.bot.user:
-            return
-
-        # 1) Respond to "cringe"
-        if re.search(r'\bcringe\b', message.content, re.IGNORECASE):
-            logger.debug("Detected 'cringe'. Sending meme.")
-            await message.channel.send(
-                "https://tenor.com/view/cringe-comp-cringe-shrek-shrek-cringe-compilation-snap-gif-11981937")
-
-        # 2) Respond to "massive"
-        if re.search(r'\bmassive\b', message.content, re.IGNORECASE):
-            logger.debug("Detected 'massive'. Sending meme.")
-            await message.channel.send(
-                "https://tenor.com/view/ninja-any-haircut-recommendations-low-taper-fade-you-know-what-else-is-massive-gif-3708438262570242561")
-
-        # 3) Respond to "erm" with any length of e's, r's, or m's (case-insensitive)
-        if re.search(r'\b[eE]+[rR]+[mM]+\b', message.content):
-            logger.debug("Detected 'erm'. Sending meme.")
-            await message.channel.send(
-                "https://tenor.com/view/jungwon-jungwon-glasses-jungwon-um-ackshually-jungwon-um-actually-gif-16607372845996584568")
-
-        # 4) Respond to "ripbozo" or "rip bozo"
-        if re.search(r'\brip\s*bozo\b', message.content, re.IGNORECASE):
-            logger.debug("Detected 'rip bozo'. Sending meme.")
-            await message.channel.send("https://tenor.com/view/rip-bozo-gif-22294771")
-
-        # 5) Respond to "lebron"
-        if re.search(r'\blebron\b', message.content, re.IGNORECASE):
-            logger.debug("Detected 'lebron'. Sending heartfelt message.")
-            response = (
-                "Boy oh boy where do I even begin. Lebron... honey, my pookie bear. "
-                "I have loved you ever since I first laid eyes on you. The way you drive into the paint and strike fear into your enemies' eyes. "
-                "Your silky smooth touch around the rim, and that gorgeous jumpshot. I would do anything for you. I wish it were possible to freeze time "
-                "so I would never have to watch you retire. You had a rough childhood, but you never gave up hope. You are even amazing off the court, you're a great husband and father, sometimes I even call you dad. "
-                "I forever dread and weep, thinking of the day you will one day retire. I would sacrifice my own life if it were the only thing that could put a smile on your beautiful face. "
-                "You have given me so much joy, and heartbreak over the years. I remember when you first left Cleveland and it's like my heart got broken into a million pieces. "
-                "But a tear still fell from my right eye when I watched you win your first ring in Miami, because deep down, my glorious king deserved it. I just wanted you to return home. "
-                "Then alas, you did, my sweet baby boy came home and I rejoiced. 2015 was a hard year for us baby, but in 2016 you made history happen. You came back from 3-1 and I couldn't believe it. "
-                "I was crying, bawling even, and I heard my glorious king exclaim these words, \"CLEVELAND, THIS IS FOR YOU!\" Not only have you changed the game of basketball and the world forever, but you've eternally changed my world. "
-                "And now you're getting older, but still the goat, my goat. I love you pookie bear, my glorious king, LeBron James.☺️♥️🫶🏻"
-            )
-            await message.channel.send(response)
+        for trigger in self.triggers.match(message.content):
+            channel_id = message.channel.id
+            cooldown = self.trigger_cooldowns.get(trigger.name)
+            if cooldown is not None and not cooldown.ready(channel_id):
+                logger.debug(f"Trigger '{trigger.name}' cooling down in channel {channel_id}.")
+                continue
+            if not self.channel_limiter.try_acquire(channel_id):
+                logger.debug(f"Trigger replies rate-limited in channel {channel_id}.")
+                return
+            if cooldown is not None:
+                cooldown.try_acquire(channel_id)
+            logger.debug(f"Detected '{trigger.name}'. Sending response.")
+            await message.channel.send(trigger.response)
 
 
 async def setup(bot):
@@ -0,0 +1,68 @@
+# cogs/gallery_cog.py
+
+import logging
+import os
+from typing import Optional
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from config import EXPORT_PART_SIZE, GALLERY_MAX_DAYS
+from gallery import gallery
+from repository import repo
+
+logger = logging.getLogger(__name__)
+
+
+class GalleryCog(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @app_commands.command(name="gallery", description="Show a thumbnail grid of the Daily Johans in a range of days.")
+    async def gallery(self, interaction: discord.Interaction, start: int, end: Optional[int] = None):
+        logger.info(f"gallery invoked by {interaction.user}, range={start}-{end}")
+        if end is None:
+            max_day = repo.days.max_day or start
+            end = max(start, min(max_day, start + GALLERY_MAX_DAYS - 1))
+
+        if end < start:
+            await interaction.response.send_message(
+                "End day must be greater than or equal to start day.",
+                ephemeral=True
+            )
+            return
+        if end - start + 1 > GALLERY_MAX_DAYS:
+            await interaction.response.send_message(
+                f"A gallery can show at most {GALLERY_MAX_DAYS} days at once.",
+                ephemeral=True
+            )
+            return
+
+        await interaction.response.defer()
+        try:
+            path, archived, with_images = await gallery.render(start, end)
+        except Exception as e:
+            logger.error(f"Failed to render gallery for days {start}-{end}: {e}")
+            await interaction.followup.send(f"Could not render the gallery: {e}", ephemeral=True)
+            return
+
+        days = end - start + 1
+        summary = f"**Days {start}–{end}:** {archived}/{days} archived, {with_images} with an image."
+        try:
+            too_large = os.path.getsize(path) > EXPORT_PART_SIZE
+            file = None if too_large else discord.File(path, filename=f"gallery_{start}-{end}.jpg")
+        except OSError as e:
+            # The sheet can be pruned from the cache between rendering and upload.
+            logger.error(f"Gallery sheet {path} disappeared before upload: {e}")
+            await interaction.followup.send("The gallery expired before it could be uploaded; try again.",
+                                            ephemeral=True)
+            return
+        if file is None:
+            await interaction.followup.send(f"{summary}\nThe gallery is too large to upload; try a smaller range.")
+            return
+        await interaction.followup.send(summary, file=file)
+
+
+async def setup(bot):
+    await bot.add_cog(GalleryCog(bot))
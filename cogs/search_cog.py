@@ -1,14 +1,18 @@
 # cogs/search_cog.py
 
 import logging
-import sqlite3
+import mimetypes
+import os
 
 import discord
 from discord import app_commands
 from discord.ext import commands
 
-from config import DB_FILE
+from config import EXPORT_PART_SIZE
 from dialogues import get_dialogue
+from link_refresher import link_refresher
+from media_mirror import blob_path
+from repository import repo
 
 logger = logging.getLogger(__name__)
 
@@ -20,35 +24,73 @@ class SearchCog(commands.Cog):
     @app_commands.command(name="search_daily_johan", description="Search for a Daily Johan by day number.")
     async def search_daily_johan(self, interaction: discord.Interaction, day: int):
         logger.info(f"Received search_daily_johan command: searching day {day}")
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT message_id, channel_id, media_url1, media_url2, media_url3 
-                FROM daily_johans 
-                WHERE day = ?
-            """, (day,))
-            results = cursor.fetchall()
+        # Re-signing expired links may take a Discord request or two.
+        await interaction.response.defer()
+        results = await repo.search_daily_johan(day)
 
         if results:
-            messages_info = []
-            for row in results:
-                message_id, channel_id, media_url1, media_url2, media_url3 = row
-                guild_id = interaction.guild.id if interaction.guild else "@me"
-                jump_url = f"https://discord.com/channels/{guild_id}/{channel_id}/{message_id}"
-
-                media_urls = [url for url in [media_url1, media_url2, media_url3] if url]
-                media_links = "\n".join(
-                    [f"Media {i + 1}: {url}" for i, url in enumerate(media_urls)]
-                )
-
-                messages_info.append(
-                    f"**Day {day}:**\n{media_links}\n[Jump to Message]({jump_url})"
-                )
-
-            response = "\n\n".join(messages_info)
-            await interaction.response.send_message(response)
+            # Mirrored media are uploaded from the local store instead of linking the CDN URL,
+            # which may have expired.
+            media = await repo.get_media_blobs_for_day(day)
+            files = []
+            media_links = []
+            # Everything attached to one message must fit in one upload; the rest are linked.
+            budget = EXPORT_PART_SIZE
+            try:
+                unattached = {}
+                for i, (position, url, sha256, content_type) in enumerate(media):
+                    local_file, size = self._local_file(day, i + 1, sha256, content_type, budget)
+                    if local_file is not None:
+                        files.append(local_file)
+                        budget -= size
+                        media_links.append(f"Media {i + 1}: attached")
+                    else:
+                        unattached[i] = (position, url)
+                        media_links.append(None)
+                if unattached:
+                    # Links without a local copy are re-signed if stale. The refresh reads the
+                    # rows again, so its URLs are matched up by position.
+                    urls = await link_refresher.fresh_urls(day)
+                    for i, (position, url) in unattached.items():
+                        media_links[i] = f"Media {i + 1}: {urls.get(position, url)}"
+
+                messages_info = []
+                for row in results:
+                    message_id, channel_id, _ = row
+                    guild_id = interaction.guild.id if interaction.guild else "@me"
+                    jump_url = f"https://discord.com/channels/{guild_id}/{channel_id}/{message_id}"
+
+                    messages_info.append(
+                        f"**Day {day}:**\n" + "\n".join(media_links) + f"\n[Jump to Message]({jump_url})"
+                    )
+
+                response = "\n\n".join(messages_info)
+                await interaction.followup.send(response, files=files)
+            finally:
+                for file in files:
+                    file.close()
         else:
-            await interaction.response.send_message(get_dialogue("no_daily_johan_found", day=day))
+            await interaction.followup.send(get_dialogue("no_daily_johan_found", day=day))
+
+    @staticmethod
+    def _local_file(day, position, sha256, content_type, max_size):
+        """
+        Open a mirrored blob for upload if it exists and is at most max_size bytes.
+
+        Returns:
+            tuple: (discord.File, size in bytes), or (None, 0).
+        """
+        if sha256 is None:
+            return None, 0
+        path = blob_path(sha256)
+        try:
+            size = os.path.getsize(path)
+            if size > max_size:
+                return None, 0
+            extension = mimetypes.guess_extension(content_type or "") or ""
+            return discord.File(path, filename=f"day_{day}_{position}{extension}"), size
+        except OSError:
+            return None, 0
 
 
 async def setup(bot):
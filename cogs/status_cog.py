@@ -2,7 +2,6 @@
 
 import logging
 import math
-import sqlite3
 from typing import Optional
 
 import discord
@@ -10,10 +9,40 @@ from discord import app_commands
 from discord.ext import commands
 from discord.ui import View, Button, Modal, TextInput
 
-from config import DB_FILE
+from database import MEDIA_KINDS
+from day_index import format_day_ranges
+from dialogues import get_dialogue
+from repository import repo
 
 logger = logging.getLogger(__name__)
 
+MAX_MESSAGE_LENGTH = 2000
+MAX_SUMMARY_RANGES = 5
+KIND_LABELS = {"image": "Images", "video": "Videos", "audio": "Audio", "other": "Other files",
+               "unknown": "Unknown type"}
+
+
+def format_size(num_bytes):
+    """
+    Render a byte count with a binary unit, e.g. "3.2 MiB".
+    """
+    size = float(num_bytes)
+    for unit in ("B", "KiB", "MiB", "GiB"):
+        if size < 1024 or unit == "GiB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+def _day_ranges(days):
+    # Collapse ascending day numbers into inclusive (start, end) ranges.
+    ranges = []
+    for day in days:
+        if ranges and ranges[-1][1] == day - 1:
+            ranges[-1][1] = day
+        else:
+            ranges.append([day, day])
+    return [tuple(day_range) for day_range in ranges]
+
 
 class JumpModal(Modal, title="Jump to Page"):
     page_input = TextInput(label="Enter page number", style=discord.TextStyle.short)
@@ -35,9 +64,10 @@ class JumpModal(Modal, title="Jump to Page"):
 
 
 class StatusPaginator(View):
-    def __init__(self, results, start, end, per_page):
+    def __init__(self, results, start, end, per_page, summary=""):
         super().__init__(timeout=180)
         self.results = results
+        self.summary = summary
         self.start = start
         self.end = end
         self.per_page = per_page
@@ -54,8 +84,14 @@ class StatusPaginator(View):
             lines.append(f"Day {day}: {status}")
         return "\n".join(lines)
 
+    def render(self):
+        header = f"Daily Johan Status (Page {self.current_page + 1}/{self.max_pages}):"
+        if self.summary:
+            header += f"\n{self.summary}"
+        return f"{header}\n{self.get_page_content()}"
+
     async def update_message(self, interaction: discord.Interaction):
-        content = f"Daily Johan Status (Page {self.current_page + 1}/{self.max_pages}):\n{self.get_page_content()}"
+        content = self.render()
         for item in self.children:
             if isinstance(item, Button):
                 if item.custom_id == "first":
@@ -106,11 +142,33 @@ class StatusCog(commands.Cog):
                                  start: int = 1, end: Optional[int] = None):
         logger.info(f"daily_johan_status invoked by {interaction.user}, range={start}-{end}")
         if end is None:
-            with sqlite3.connect(DB_FILE) as conn:
-                cursor = conn.cursor()
-                cursor.execute("SELECT MAX(day) FROM daily_johans")
-                max_day = cursor.fetchone()[0]
-                end = max_day if max_day else start
+            max_day = repo.days.max_day
+            end = max_day if max_day else start
+
+        if end < start:
+            await interaction.response.send_message(
+                "End day must be greater than or equal to start day.",
+                ephemeral=True
+            )
+            return
+
+        missing_ranges = repo.days.missing_ranges(start, end)
+        missed = sum(hi - lo + 1 for lo, hi in missing_ranges)
+        summary = f"Missing: {missed}"
+        if missing_ranges:
+            summary += f" ({format_day_ranges(missing_ranges, limit=MAX_SUMMARY_RANGES)})"
+
+        # The day index answers membership in O(1), so pages are rendered without a query.
+        paginator = StatusPaginator(results=repo.days, start=start, end=end, per_page=20, summary=summary)
+        await interaction.response.send_message(content=paginator.render(), view=paginator, ephemeral=True)
+
+    @app_commands.command(name="missing_days", description="List the missing Daily Johans as compact day ranges.")
+    async def missing_days(self, interaction: discord.Interaction,
+                           start: int = 1, end: Optional[int] = None):
+        logger.info(f"missing_days invoked by {interaction.user}, range={start}-{end}")
+        latest_day = repo.days.max_day
+        if end is None:
+            end = latest_day if latest_day else start
 
         if end < start:
             await interaction.response.send_message(
@@ -119,14 +177,84 @@ class StatusCog(commands.Cog):
             )
             return
 
-        with sqlite3.connect(DB_FILE) as conn:
-            cursor = conn.cursor()
-            cursor.execute("SELECT day FROM daily_johans WHERE day BETWEEN ? AND ?", (start, end))
-            results = {row[0] for row in cursor.fetchall()}
+        missing_ranges = repo.days.missing_ranges(start, end)
+        if not missing_ranges:
+            await interaction.response.send_message(
+                get_dialogue("no_missing_days", start=start, end=end),
+                ephemeral=True
+            )
+            return
+
+        missed = sum(hi - lo + 1 for lo, hi in missing_ranges)
+        # Show as many ranges as fit in one Discord message.
+        limit = len(missing_ranges)
+        while True:
+            content = get_dialogue("gap_alert",
+                                   latest_day=latest_day,
+                                   missed=missed,
+                                   ranges=format_day_ranges(missing_ranges, limit=limit))
+            if len(content) <= MAX_MESSAGE_LENGTH or limit <= 1:
+                break
+            limit = max(1, limit * 3 // 4)
+        await interaction.response.send_message(content[:MAX_MESSAGE_LENGTH], ephemeral=True)
+
+    @app_commands.command(name="archive_stats", description="Show how much media the archive holds, by type.")
+    async def archive_stats(self, interaction: discord.Interaction):
+        logger.info(f"archive_stats invoked by {interaction.user}")
+        stats = await repo.get_media_stats()
+        kinds = stats["kinds"]
+        total = sum(count for count, _, _, _ in kinds.values())
+        total_size = sum(size for _, _, size, _ in kinds.values())
+        lines = [f"**Archive:** {len(repo.days)} days, {total} media, {format_size(total_size)}"]
+        for kind in (*MEDIA_KINDS, "other", "unknown"):
+            if kind not in kinds:
+                continue
+            count, days, size, unknown_size = kinds[kind]
+            line = f"- {KIND_LABELS[kind]}: {count} on {days} day(s), {format_size(size)}"
+            if unknown_size:
+                line += f" ({unknown_size} of unknown size)"
+            lines.append(line)
+        lines.append(f"**Local copies:** {stats['mirrored']}/{total} media mirrored as {stats['blobs']} file(s), "
+                     f"{format_size(stats['blob_bytes'])} on disk")
+        if stats["unmirrored"]:
+            lines.append(f"{stats['unmirrored']} media not mirrored yet, {stats['expired_unmirrored']} of them "
+                         f"with an expired link.")
+        await interaction.response.send_message("\n".join(lines)[:MAX_MESSAGE_LENGTH], ephemeral=True)
+
+    @app_commands.command(name="find_media", description="List the days whose media include a given type.")
+    @app_commands.describe(kind="Type of media to look for.")
+    @app_commands.choices(kind=[app_commands.Choice(name=kind, value=kind) for kind in MEDIA_KINDS])
+    async def find_media(self, interaction: discord.Interaction, kind: str,
+                         start: int = 1, end: Optional[int] = None):
+        logger.info(f"find_media invoked by {interaction.user}, kind={kind}, range={start}-{end}")
+        if end is None:
+            end = repo.days.max_day or start
+
+        if end < start:
+            await interaction.response.send_message(
+                "End day must be greater than or equal to start day.",
+                ephemeral=True
+            )
+            return
+
+        rows = await repo.get_days_with_media_kind(kind, start, end)
+        label = KIND_LABELS[kind]
+        if not rows:
+            await interaction.response.send_message(f"No {label.lower()} in days {start}–{end}.", ephemeral=True)
+            return
 
-        paginator = StatusPaginator(results=results, start=start, end=end, per_page=20)
-        content = f"Daily Johan Status (Page 1/{paginator.max_pages}):\n{paginator.get_page_content()}"
-        await interaction.response.send_message(content=content, view=paginator, ephemeral=True)
+        count = sum(row[1] for row in rows)
+        size = sum(row[2] for row in rows)
+        ranges = _day_ranges([row[0] for row in rows])
+        header = f"**{label} in days {start}–{end}:** {count} on {len(rows)} day(s), {format_size(size)}\n"
+        # Show as many ranges as fit in one Discord message.
+        limit = len(ranges)
+        while True:
+            content = header + format_day_ranges(ranges, limit=limit)
+            if len(content) <= MAX_MESSAGE_LENGTH or limit <= 1:
+                break
+            limit = max(1, limit * 3 // 4)
+        await interaction.response.send_message(content[:MAX_MESSAGE_LENGTH], ephemeral=True)
 
 
 async def setup(bot):
@@ -7,7 +7,8 @@ import pathlib
 # CENTRALIZED DATABASE PATH
 # ---------------------------
 BASE_DIR = pathlib.Path(__file__).parent.resolve()
-DB_FILE = str(BASE_DIR / "daily_johans.db")
+# Always an absolute path, so the bot opens the same file regardless of the working directory.
+DB_FILE = str(pathlib.Path(os.getenv("DB_FILE", BASE_DIR / "daily_johans.db")).resolve())
 
 # ---------------------------
 # ENVIRONMENT VARIABLES
@@ -15,3 +16,77 @@ DB_FILE = str(BASE_DIR / "daily_johans.db")
 JOHAN_USER_ID = int(os.getenv("JOHAN_USER_ID", "474030685577936916"))
 DEFAULT_CHANNEL_ID = int(os.getenv("DEFAULT_CHANNEL_ID", "797666899558268971"))
 TIMEZONE = os.getenv("TIMEZONE", "America/Chicago")
+
+# ---------------------------
+# DATABASE TUNING
+# ---------------------------
+DB_READER_POOL_SIZE = int(os.getenv("DB_READER_POOL_SIZE", "3"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+
+# ---------------------------
+# ARCHIVE LIMITS
+# ---------------------------
+MAX_MEDIA_PER_DAY = int(os.getenv("MAX_MEDIA_PER_DAY", "3"))
+# Largest export attachment in bytes; keep below the smallest Discord upload limit.
+EXPORT_PART_SIZE = int(os.getenv("EXPORT_PART_SIZE", str(8 * 1024 * 1024)))
+
+# ---------------------------
+# BACKUP SCRAPE
+# ---------------------------
+# Channels whose history /scrape_backup reads at the same time.
+SCRAPE_CONCURRENCY = int(os.getenv("SCRAPE_CONCURRENCY", "3"))
+# Persist a channel's scrape checkpoint after this many messages.
+SCRAPE_CHECKPOINT_EVERY = int(os.getenv("SCRAPE_CHECKPOINT_EVERY", "500"))
+# Archive writes found by a scrape are written in one transaction per SCRAPE_BATCH_SIZE entries,
+# or after SCRAPE_FLUSH_SECONDS, whichever comes first.
+SCRAPE_BATCH_SIZE = int(os.getenv("SCRAPE_BATCH_SIZE", "200"))
+SCRAPE_FLUSH_SECONDS = float(os.getenv("SCRAPE_FLUSH_SECONDS", "5"))
+# How often the scrape's progress message is edited and a progress record is logged.
+SCRAPE_PROGRESS_SECONDS = float(os.getenv("SCRAPE_PROGRESS_SECONDS", "5"))
+# Most messages read from DEFAULT_CHANNEL_ID on startup to catch up on posts made while offline.
+CATCHUP_MAX_MESSAGES = int(os.getenv("CATCHUP_MAX_MESSAGES", "1000"))
+
+# ---------------------------
+# CHAT TRIGGERS
+# ---------------------------
+TRIGGERS_FILE = str(pathlib.Path(os.getenv("TRIGGERS_FILE", BASE_DIR / "triggers.json")).resolve())
+# Trigger replies per channel: a burst of up to FUN_CHANNEL_BURST, then one per FUN_CHANNEL_REFILL_SECONDS.
+FUN_CHANNEL_BURST = int(os.getenv("FUN_CHANNEL_BURST", "3"))
+FUN_CHANNEL_REFILL_SECONDS = float(os.getenv("FUN_CHANNEL_REFILL_SECONDS", "20"))
+
+# ---------------------------
+# MEDIA MIRROR
+# ---------------------------
+# Content-addressed store for downloaded attachments (blobs live at MEDIA_DIR/ab/abcdef...).
+MEDIA_DIR = str(pathlib.Path(os.getenv("MEDIA_DIR", BASE_DIR / "media")).resolve())
+# Concurrent attachment downloads, and attempts per download before giving up for this run.
+MEDIA_MIRROR_WORKERS = int(os.getenv("MEDIA_MIRROR_WORKERS", "4"))
+MEDIA_MIRROR_RETRIES = int(os.getenv("MEDIA_MIRROR_RETRIES", "3"))
+# Processes computing perceptual hashes, and the largest hash distance (of 64 bits) that
+# still counts as the same image.
+PHASH_WORKERS = int(os.getenv("PHASH_WORKERS", "2"))
+PHASH_MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+
+# ---------------------------
+# GALLERY
+# ---------------------------
+# Thumbnails and rendered /gallery sheets are cached under MEDIA_DIR.
+GALLERY_MAX_DAYS = int(os.getenv("GALLERY_MAX_DAYS", "100"))
+GALLERY_THUMB_SIZE = int(os.getenv("GALLERY_THUMB_SIZE", "128"))
+GALLERY_WORKERS = int(os.getenv("GALLERY_WORKERS", "2"))
+# Rendered sheets kept on disk; the least recently used are deleted beyond this.
+GALLERY_CACHE_SIZE = int(os.getenv("GALLERY_CACHE_SIZE", "50"))
+
+# ---------------------------
+# CDN LINK REFRESH
+# ---------------------------
+# Stored attachment links expiring within this many seconds are re-signed.
+LINK_REFRESH_MARGIN_SECONDS = int(os.getenv("LINK_REFRESH_MARGIN_SECONDS", "3600"))
+# Channels whose history is re-read at the same time, and the pause between two history
+# requests in one channel (on top of discord.py's own rate-limit handling).
+LINK_REFRESH_CONCURRENCY = int(os.getenv("LINK_REFRESH_CONCURRENCY", "2"))
+LINK_REFRESH_DELAY_SECONDS = float(os.getenv("LINK_REFRESH_DELAY_SECONDS", "1"))
+# How long a re-fetched message's links are reused by on-demand refreshes.
+LINK_CACHE_SECONDS = int(os.getenv("LINK_CACHE_SECONDS", "300"))
@@ -0,0 +1,89 @@
+# contact_sheet.py
+#
+# Thumbnail and contact-sheet rendering for /gallery. Like image_hash.py this is kept free
+# of bot imports, but the spawned process-pool workers still re-import bot.py as
+# __mp_main__ (see the note in image_hash.py).
+
+import os
+import tempfile
+
+from PIL import Image, ImageDraw, ImageFont, ImageOps, UnidentifiedImageError
+
+LABEL_HEIGHT = 16
+PADDING = 4
+BACKGROUND = (32, 34, 37)
+EMPTY_CELL = (54, 57, 63)
+MISSING_CELL = (90, 40, 40)
+TEXT = (220, 221, 222)
+
+
+def _save_atomically(image, path, **params):
+    # A cached path never holds a partial file, even if the worker dies mid-write.
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".partial-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, "JPEG", **params)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def make_thumbnail(source, dest, size):
+    """
+    Write a square JPEG thumbnail of an image file, cropped to fill `size` pixels.
+
+    Returns:
+        bool: False if the source is not a decodable image.
+    """
+    try:
+        with Image.open(source) as image:
+            image.draft("RGB", (size * 2, size * 2))  # lets JPEG decode at reduced size
+            thumb = ImageOps.fit(ImageOps.exif_transpose(image).convert("RGB"), (size, size),
+                                 Image.Resampling.LANCZOS)
+    except (UnidentifiedImageError, OSError, ValueError):
+        return False
+    _save_atomically(thumb, dest, quality=85)
+    return True
+
+
+def render_contact_sheet(cells, dest, thumb_size, columns=10):
+    """
+    Render a grid of labelled thumbnails into a JPEG.
+
+    Args:
+        cells (list of tuple): (day, archived, thumbnail path or None) in display order.
+            Archived days without a thumbnail get a plain cell, days not archived a red one.
+        dest (str): Output path.
+        thumb_size (int): Edge length of each thumbnail in pixels.
+        columns (int): Cells per row.
+    """
+    columns = max(1, min(columns, len(cells)))
+    rows = -(-len(cells) // columns)
+    cell_width = thumb_size + PADDING
+    cell_height = thumb_size + LABEL_HEIGHT + PADDING
+    sheet = Image.new("RGB", (columns * cell_width + PADDING, rows * cell_height + PADDING), BACKGROUND)
+    draw = ImageDraw.Draw(sheet)
+    font = ImageFont.load_default()
+
+    for index, (day, archived, thumb_path) in enumerate(cells):
+        x = PADDING + (index % columns) * cell_width
+        y = PADDING + (index // columns) * cell_height
+        pasted = False
+        if thumb_path is not None:
+            try:
+                with Image.open(thumb_path) as thumb:
+                    sheet.paste(thumb, (x, y))
+                pasted = True
+            except (UnidentifiedImageError, OSError):
+                pass
+        if not pasted:
+            fill = EMPTY_CELL if archived else MISSING_CELL
+            draw.rectangle((x, y, x + thumb_size - 1, y + thumb_size - 1), fill=fill)
+            if not archived:
+                draw.line((x, y, x + thumb_size - 1, y + thumb_size - 1), fill=TEXT)
+                draw.line((x, y + thumb_size - 1, x + thumb_size - 1, y), fill=TEXT)
+        draw.text((x + 2, y + thumb_size + 2), f"Day {day}", fill=TEXT, font=font)
+
+    _save_atomically(sheet, dest, quality=85, optimize=True)
@@ -0,0 +1,115 @@
+# conversations.py
+#
+# Prompt/reply flows ("reply with a day number", "are you sure? (yes/no)", "upload your
+# export file") wait here instead of on bot.wait_for. bot.wait_for runs the check of every
+# pending waiter against every incoming message; this manager looks the reply up by
+# (user, channel) in a dict, so routing cost does not grow with the number of open prompts.
+
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationBusy(Exception):
+    """
+    Raised when a user who is already being prompted is asked something else.
+    """
+
+
+class _Conversation:
+    __slots__ = ("user_id", "channel_id", "accept", "future")
+
+    def __init__(self, user_id, channel_id, accept, future):
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.accept = accept
+        self.future = future
+
+
+class ConversationManager:
+    """
+    Routes replies to the prompt waiting for them, one active prompt per user.
+    """
+
+    def __init__(self):
+        self._by_key = {}  # (user_id, channel_id) -> _Conversation
+        self._by_user = {}  # user_id -> _Conversation
+        self.started = 0
+        self.answered = 0
+        self.timed_out = 0
+        self.rejected_busy = 0
+
+    def is_pending(self, user_id):
+        """
+        Whether the user currently has an open prompt anywhere.
+        """
+        return user_id in self._by_user
+
+    async def ask(self, user_id, channel_id, timeout, accept=None):
+        """
+        Wait for the user's next message in a channel.
+
+        Args:
+            user_id (int): Who must reply.
+            channel_id (int): Where the reply must be posted (a DM channel works too).
+            timeout (float): Seconds to wait.
+            accept (callable or None): Optional filter; messages it rejects are ignored and
+                the prompt keeps waiting, like a bot.wait_for check.
+
+        Returns:
+            discord.Message: The reply.
+
+        Raises:
+            ConversationBusy: If the user already has an open prompt.
+            asyncio.TimeoutError: If no accepted reply arrives in time.
+        """
+        if user_id in self._by_user:
+            self.rejected_busy += 1
+            raise ConversationBusy(f"User {user_id} already has an open prompt.")
+
+        conversation = _Conversation(user_id, channel_id, accept, asyncio.get_running_loop().create_future())
+        self._by_key[(user_id, channel_id)] = conversation
+        self._by_user[user_id] = conversation
+        self.started += 1
+        try:
+            reply = await asyncio.wait_for(conversation.future, timeout=timeout)
+            self.answered += 1
+            return reply
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            logger.debug(f"Prompt for user {user_id} in channel {channel_id} timed out.")
+            raise
+        finally:
+            self._by_key.pop((user_id, channel_id), None)
+            self._by_user.pop(user_id, None)
+
+    def dispatch(self, message):
+        """
+        Hand a new message to the prompt waiting for it, if any.
+
+        Returns:
+            bool: Whether the message answered a prompt.
+        """
+        conversation = self._by_key.get((message.author.id, message.channel.id))
+        if conversation is None or conversation.future.done():
+            return False
+        if conversation.accept is not None and not conversation.accept(message):
+            return False
+        conversation.future.set_result(message)
+        return True
+
+    def stats(self):
+        """
+        Counters for /debug_info.
+        """
+        return {
+            "pending": len(self._by_key),
+            "started": self.started,
+            "answered": self.answered,
+            "timed_out": self.timed_out,
+            "rejected_busy": self.rejected_busy,
+        }
+
+
+conversations = ConversationManager()
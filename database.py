@@ -1,246 +1,1053 @@
 # database.py
+#
+# Plain, synchronous SQL helpers. Every function takes an open sqlite3 connection and
+# leaves transaction handling (commit/rollback) to the caller; repository.py owns the
+# connections and runs these helpers off the event loop. The schema lives in migrations.py.
 
-import sqlite3
+import json
+import re
 from datetime import datetime
 
 import pytz
 
-from config import TIMEZONE
+from cdn_urls import media_metadata, url_expiry
+from config import MAX_MEDIA_PER_DAY, TIMEZONE
 
-DB_FILE = "daily_johans.db"
+# Queries that run on every interaction or on a timer. find_table_scans() checks that each
+# one is answered from an index rather than a full scan of daily_johans.
+HOT_QUERIES = {
+    "day_for_message": ("SELECT day FROM daily_johans WHERE message_id = ?", (0,)),
+    "message_for_day": ("SELECT message_id FROM daily_johans WHERE day = ?", (0,)),
+    "delete_by_message": ("DELETE FROM daily_johans WHERE message_id = ?", (0,)),
+    "message_in_channel": ("SELECT day FROM daily_johans WHERE channel_id = ? AND message_id = ?", (0, 0)),
+    "latest_day": ("SELECT MAX(day) FROM daily_johans", ()),
+    "latest_message_in_channel": ("SELECT MAX(message_id) FROM daily_johans WHERE channel_id = ?", (0,)),
+    "day_range": ("SELECT day FROM daily_johans WHERE day BETWEEN ? AND ?", (0, 0)),
+    "media_for_day": ("SELECT url FROM daily_johan_media WHERE day = ? ORDER BY position", (0,)),
+    "media_kind_days": (
+        "SELECT day FROM daily_johan_media WHERE content_type >= ? AND content_type < ? AND day BETWEEN ? AND ?",
+        ("video/", "video0", 0, 0)
+    ),
+    "last_archive_timestamp": (
+        "SELECT timestamp FROM daily_johans WHERE timestamp IS NOT NULL ORDER BY day DESC LIMIT 1", ()
+    ),
+}
 
+# A bare "SCAN <table>" (without "USING ... INDEX") means SQLite walks every row.
+_TABLE_SCAN_RE = re.compile(r"^SCAN (?:TABLE )?(\w+)\b(?! USING)")
 
-def init_db():
+
+def find_table_scans(conn, queries=None):
     """
-    Initialize the database by creating the daily_johans table if it doesn't exist.
+    Run EXPLAIN QUERY PLAN over the hot queries and report any that scan a whole table.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        queries (dict or None): name -> (sql, params); defaults to HOT_QUERIES.
+
+    Returns:
+        list of tuple: (query name, plan detail) for every full table scan found.
     """
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS daily_johans (
-                day INTEGER PRIMARY KEY,
-                message_id TEXT,
-                channel_id TEXT,
-                timestamp TEXT,
-                media_url1 TEXT,
-                media_url2 TEXT,
-                media_url3 TEXT,
-                user_id TEXT,
-                user_mention TEXT,
-                confirmed BOOLEAN
-            )
-        """)
-        conn.commit()
+    scans = []
+    for name, (sql, params) in (queries or HOT_QUERIES).items():
+        for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params):
+            detail = row[-1]
+            match = _TABLE_SCAN_RE.match(detail)
+            if match and not match.group(1).startswith("sqlite_"):
+                scans.append((name, detail))
+    return scans
+
+
+def _archive_timestamp():
+    # Determine the timezone for timestamp
+    try:
+        bot_timezone = pytz.timezone(TIMEZONE)
+    except pytz.UnknownTimeZoneError:
+        # Fallback to UTC if an invalid timezone is provided
+        bot_timezone = pytz.utc
+
+    # Get the current time in the configured timezone
+    return datetime.now(bot_timezone).isoformat()
+
+
+# Column order of the entries _media_json() produces (see cdn_urls.media_metadata()).
+_MEDIA_COLUMNS = "url, url_expires_at, attachment_id, filename, content_type, size, width, height"
+_MEDIA_VALUES = ", ".join(f"json_extract({{0}}, '$[{i}]')" for i in range(8))
+
+
+def _media_json(media_urls, attachments=()):
+    # One metadata list per URL for json_each. Attachments are matched to their URL so any
+    # archive path that has the message stores the full metadata.
+    by_url = {attachment.url: attachment for attachment in attachments}
+    return json.dumps([media_metadata(url, by_url.get(url)) for url in media_urls])
+
+
+def _append_media(conn, day_number, media_urls, message_id, max_media=MAX_MEDIA_PER_DAY, attachments=()):
+    """
+    Append media URLs after a day's existing media in one set-based INSERT.
+
+    Positions continue from the day's current highest position, and rows beyond the
+    per-day limit are dropped by the WHERE clause rather than by Python slot-finding.
+
+    Returns:
+        int: The number of media rows inserted.
+    """
+    cursor = conn.execute(f"""
+        INSERT INTO daily_johan_media (day, position, message_id, {_MEDIA_COLUMNS})
+        SELECT ?, existing.last_position + new.key + 1, ?, {_MEDIA_VALUES.format("new.value")}
+        FROM json_each(?) AS new,
+             (SELECT COALESCE(MAX(position), 0) AS last_position, COUNT(*) AS media_count
+              FROM daily_johan_media WHERE day = ?) AS existing
+        WHERE existing.media_count + new.key < ?
+    """, (day_number, message_id, _media_json(media_urls, attachments), day_number, max_media))
+    return cursor.rowcount
+
+
+# Per-day outcomes returned by archive_daily_johans_batch().
+ARCHIVED = "archived"
+ALREADY_ARCHIVED = "already_archived"
+CONFLICT = "conflict"
+MEDIA_FULL = "media_full"
+NOT_WRITTEN = "not_written"
+
+# How archive_daily_johans_batch() treats days that are already archived.
+ON_EXISTING_SKIP = "skip"  # leave them untouched
+ON_EXISTING_APPEND = "append"  # point them at the new message and append media
+ON_EXISTING_REJECT = "reject"  # append only if archived from the same message, else abort the batch
+
+
+def archive_daily_johans_batch(conn, entries, confirmed=True, on_existing=ON_EXISTING_SKIP):
+    """
+    Archive many days in the caller's transaction.
+
+    Existing message IDs and media counts for every day in the batch are read with two
+    queries up front, outcomes are decided in memory, and day rows are written with one
+    executemany UPSERT. Because the check and the write share a transaction on the single
+    writer connection, nothing can archive a day in between.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        entries (list of tuple): (day_number, discord.Message, list of media URLs) per day.
+            Repeating a day appends to it, as if archived by consecutive calls; the day is
+            ARCHIVED if any of its entries was written.
+        confirmed (bool): Whether the archiving is confirmed.
+        on_existing (str): ON_EXISTING_SKIP, ON_EXISTING_APPEND or ON_EXISTING_REJECT.
+
+    Returns:
+        dict: day -> ARCHIVED, ALREADY_ARCHIVED, CONFLICT, MEDIA_FULL or NOT_WRITTEN, in
+        batch order. MEDIA_FULL means the entry's media didn't all fit in the day's free
+        slots, so none of them were written. With ON_EXISTING_REJECT the batch is
+        all-or-nothing: any CONFLICT or MEDIA_FULL means nothing was written and every other
+        day is NOT_WRITTEN.
+    """
+    entries = [(int(day), message, list(media_urls)) for day, message, media_urls in entries]
+    days_json = json.dumps(sorted({day for day, _, _ in entries}))
+    existing = dict(conn.execute(
+        "SELECT day, message_id FROM daily_johans WHERE day IN (SELECT value FROM json_each(?))",
+        (days_json,)
+    ))
+    media_counts = dict(conn.execute("""
+        SELECT day, COUNT(*) FROM daily_johan_media
+        WHERE day IN (SELECT value FROM json_each(?))
+        GROUP BY day
+    """, (days_json,)))
 
+    outcomes = {}
+    failures = {}
+    writes = []
+    written_days = set()
 
-def archive_daily_johan_db(day_number, message, media_urls, confirmed=True):
+    def decide(day, outcome):
+        # A day repeated in the batch is ARCHIVED if any of its entries was written.
+        if outcome in (CONFLICT, MEDIA_FULL):
+            failures[day] = outcome
+        if outcomes.get(day) != ARCHIVED:
+            outcomes[day] = outcome
+
+    for day, message, media_urls in entries:
+        if day in existing and day not in written_days:
+            if on_existing == ON_EXISTING_SKIP:
+                decide(day, ALREADY_ARCHIVED)
+                continue
+            if on_existing == ON_EXISTING_REJECT and existing[day] != message.id:
+                decide(day, CONFLICT)
+                continue
+        # An entry is written whole or not at all; _append_media would otherwise drop the overflow.
+        if media_counts.get(day, 0) + len(media_urls) > MAX_MEDIA_PER_DAY:
+            decide(day, MEDIA_FULL)
+            continue
+        decide(day, ARCHIVED)
+        writes.append((day, message, media_urls))
+        written_days.add(day)
+        existing[day] = message.id
+        media_counts[day] = media_counts.get(day, 0) + len(media_urls)
+
+    if on_existing == ON_EXISTING_REJECT and failures:
+        return {day: failures.get(day, NOT_WRITTEN) for day in outcomes}
+    if not writes:
+        return outcomes
+
+    timestamp = _archive_timestamp()
+    # Upsert (not REPLACE) so a day's existing media rows are kept and appended to.
+    conn.executemany("""
+        INSERT INTO daily_johans (day, message_id, channel_id, timestamp, user_id, user_mention, confirmed)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (day) DO UPDATE SET
+            message_id = excluded.message_id,
+            channel_id = excluded.channel_id,
+            timestamp = excluded.timestamp,
+            user_id = excluded.user_id,
+            user_mention = excluded.user_mention,
+            confirmed = excluded.confirmed
+    """, [
+        (day, message.id, message.channel.id, timestamp, message.author.id, message.author.mention, confirmed)
+        for day, message, _ in writes
+    ])
+    for day, message, media_urls in writes:
+        if media_urls:
+            _append_media(conn, day, media_urls, message.id, attachments=getattr(message, "attachments", ()))
+    return outcomes
+
+
+def archive_daily_johan_db(conn, day_number, message, media_urls, confirmed=True):
     """
     Archive a Daily Johan entry.
 
     Args:
+        conn (sqlite3.Connection): Open database connection.
         day_number (int): The day number to archive.
         message (discord.Message): The Discord message object.
-        media_urls (list of str): List of media URLs to archive (max 3).
+        media_urls (list of str): List of media URLs to archive (max MAX_MEDIA_PER_DAY).
         confirmed (bool): Whether the archiving is confirmed.
 
     Raises:
-        ValueError: If attempting to add more than 3 media URLs to a day.
+        ValueError: If the day doesn't have room for all of the media.
     """
-    media_urls = media_urls[:3]  # Cap at 3 media URLs
+    outcomes = archive_daily_johans_batch(conn, [(day_number, message, media_urls)], confirmed,
+                                          on_existing=ON_EXISTING_APPEND)
+    if outcomes[day_number] == MEDIA_FULL:
+        raise ValueError(f"Day {day_number} doesn't have room for {len(media_urls)} more media attachment(s).")
 
-    # Determine the timezone for timestamp
-    try:
-        bot_timezone = pytz.timezone(TIMEZONE)
-    except pytz.UnknownTimeZoneError:
-        # Fallback to UTC if an invalid timezone is provided
-        bot_timezone = pytz.utc
 
-    # Get the current time in the configured timezone
-    timestamp = datetime.now(bot_timezone).isoformat()
-
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        # Check if the day already exists
-        cursor.execute("SELECT media_url1, media_url2, media_url3 FROM daily_johans WHERE day = ?", (day_number,))
-        result = cursor.fetchone()
-
-        if result:
-            # Day exists, append new media URLs if space available
-            existing_media = list(result)
-            available_slots = [i for i, url in enumerate(existing_media) if url is None]
-
-            if not available_slots and len(media_urls) > 0:
-                raise ValueError(f"Day {day_number} already has the maximum number of media attachments.")
-
-            # Assign new media URLs to available slots
-            for media_url in media_urls:
-                if not available_slots:
-                    break
-                slot = available_slots.pop(0)
-                existing_media[slot] = media_url
-
-            # Update the record with new media URLs and other details
-            cursor.execute("""
-                UPDATE daily_johans 
-                SET message_id = ?, channel_id = ?, timestamp = ?, media_url1 = ?, media_url2 = ?, media_url3 = ?, 
-                    user_id = ?, user_mention = ?, confirmed = ?
-                WHERE day = ?
-            """, (
-                str(message.id),
-                str(message.channel.id),
-                timestamp,
-                existing_media[0],
-                existing_media[1],
-                existing_media[2],
-                str(message.author.id),
-                message.author.mention,
-                confirmed,
-                day_number
-            ))
-        else:
-            # Insert a new record with the provided media URLs and details
-            cursor.execute("""
-                INSERT INTO daily_johans 
-                (day, message_id, channel_id, timestamp, media_url1, media_url2, media_url3, user_id, user_mention, confirmed)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                day_number,
-                str(message.id),
-                str(message.channel.id),
-                timestamp,
-                media_urls[0] if len(media_urls) > 0 else None,
-                media_urls[1] if len(media_urls) > 1 else None,
-                media_urls[2] if len(media_urls) > 2 else None,
-                str(message.author.id),
-                message.author.mention,
-                confirmed
-            ))
-        conn.commit()
-
-
-def get_existing_day_for_message(message_id):
+def get_existing_day_for_message(conn, message_id):
     """
     Retrieve the day number associated with a given message ID.
 
     Args:
-        message_id (str): The Discord message ID.
+        conn (sqlite3.Connection): Open database connection.
+        message_id (int or str): The Discord message ID.
 
     Returns:
         tuple or None: The day number if found, else None.
     """
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT day FROM daily_johans WHERE message_id = ?", (str(message_id),))
-        return cursor.fetchone()
+    cursor = conn.execute("SELECT day FROM daily_johans WHERE message_id = ?", (int(message_id),))
+    return cursor.fetchone()
+
+
+def get_days_for_message(conn, message_id):
+    """
+    Retrieve every day number archived from a given message ID.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        message_id (int or str): The Discord message ID.
+
+    Returns:
+        list of int: The archived day numbers, in ascending order.
+    """
+    cursor = conn.execute("SELECT day FROM daily_johans WHERE message_id = ? ORDER BY day", (int(message_id),))
+    return [row[0] for row in cursor.fetchall()]
 
 
-def get_existing_message_for_day(day_number):
+def get_existing_message_for_day(conn, day_number):
     """
     Retrieve the message ID associated with a given day number.
 
     Args:
+        conn (sqlite3.Connection): Open database connection.
         day_number (int): The day number.
 
     Returns:
-        tuple or None: The message ID if found, else None.
+        tuple or None: The message ID (int) if found, else None.
+    """
+    cursor = conn.execute("SELECT message_id FROM daily_johans WHERE day = ?", (day_number,))
+    return cursor.fetchone()
+
+
+def get_entry_for_day(conn, day_number):
+    """
+    Retrieve the (day, message_id) pair archived for a day number.
+
+    Returns:
+        tuple or None: (day, message_id) if found, else None.
+    """
+    cursor = conn.execute("SELECT day, message_id FROM daily_johans WHERE day = ?", (day_number,))
+    return cursor.fetchone()
+
+
+def get_entry_for_message(conn, message_id):
+    """
+    Retrieve the first (day, message_id) pair archived from a message ID.
+
+    Returns:
+        tuple or None: (day, message_id) if found, else None.
+    """
+    cursor = conn.execute("SELECT day, message_id FROM daily_johans WHERE message_id = ?", (int(message_id),))
+    return cursor.fetchone()
+
+
+def get_media_for_day(conn, day_number):
+    """
+    Retrieve the media URLs archived for a day number.
+
+    Returns:
+        list of str: Media URLs in position order (empty if the day has none).
+    """
+    cursor = conn.execute(
+        "SELECT url FROM daily_johan_media WHERE day = ? ORDER BY position",
+        (day_number,)
+    )
+    return [row[0] for row in cursor.fetchall()]
+
+
+def get_media_for_days(conn, start, end):
+    """
+    Retrieve the media URLs for every day in an inclusive range with a single query.
+
+    Returns:
+        dict: day -> list of media URLs in position order.
+    """
+    media = {}
+    cursor = conn.execute("""
+        SELECT day, url FROM daily_johan_media
+        WHERE day BETWEEN ? AND ?
+        ORDER BY day, position
+    """, (start, end))
+    for day, url in cursor:
+        media.setdefault(day, []).append(url)
+    return media
+
+
+def get_latest_message_id(conn, channel_id):
+    """
+    Retrieve the newest archived message ID in a channel.
+
+    Returns:
+        int or None: The highest message ID archived from the channel, or None.
+    """
+    cursor = conn.execute("SELECT MAX(message_id) FROM daily_johans WHERE channel_id = ?", (int(channel_id),))
+    return cursor.fetchone()[0]
+
+
+def get_media_blobs_for_day(conn, day_number):
+    """
+    Retrieve a day's media with its mirrored blob, if any.
+
+    Returns:
+        list of tuple: (position, url, blob_sha256 or None, content_type or None) in position order.
+    """
+    cursor = conn.execute("""
+        SELECT m.position, m.url, m.blob_sha256, b.content_type
+        FROM daily_johan_media AS m
+        LEFT JOIN media_blobs AS b ON b.sha256 = m.blob_sha256
+        WHERE m.day = ?
+        ORDER BY m.position
+    """, (day_number,))
+    return cursor.fetchall()
+
+
+def get_gallery_blobs(conn, start, end):
+    """
+    Retrieve the first mirrored image of every day in an inclusive range.
+
+    Returns:
+        dict: day -> blob sha256, for days with at least one mirrored image.
+    """
+    blobs = {}
+    cursor = conn.execute("""
+        SELECT m.day, m.blob_sha256
+        FROM daily_johan_media AS m
+        JOIN media_blobs AS b ON b.sha256 = m.blob_sha256
+        WHERE m.day BETWEEN ? AND ? AND b.content_type LIKE 'image/%'
+        ORDER BY m.day, m.position
+    """, (start, end))
+    for day, sha256 in cursor:
+        blobs.setdefault(day, sha256)
+    return blobs
+
+
+def get_unmirrored_media(conn, after=(0, 0), limit=100, max_failures=3, days=None):
+    """
+    Retrieve media rows that have no local blob yet, in (day, position) order.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        after (tuple): Only rows after this (day, position) key, for paging.
+        limit (int): Maximum number of rows to return.
+        max_failures (int): Skip rows whose download already failed this many times.
+        days (list of int or None): Restrict to these days.
+
+    Returns:
+        list of tuple: (day, position, url) entries.
+    """
+    sql = """
+        SELECT day, position, url FROM daily_johan_media
+        WHERE blob_sha256 IS NULL AND mirror_failures < ? AND (day, position) > (?, ?)
+    """
+    params = [max_failures, after[0], after[1]]
+    if days is not None:
+        sql += " AND day IN (SELECT value FROM json_each(?))"
+        params.append(json.dumps([int(day) for day in days]))
+    sql += " ORDER BY day, position LIMIT ?"
+    params.append(limit)
+    return conn.execute(sql, params).fetchall()
+
+
+def get_stale_media(conn, expires_before, after=(0, 0, 0), limit=100, unmirrored_only=True):
+    """
+    Retrieve media rows whose signed URL expires before a given time, soonest first.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        expires_before (int): Unix seconds; rows expiring at or after this are fresh.
+        after (tuple): Only rows after this (url_expires_at, day, position) key, for paging.
+        limit (int): Maximum number of rows to return.
+        unmirrored_only (bool): Skip rows that already have a local blob.
+
+    Returns:
+        list of tuple: (url_expires_at, day, position, channel_id, message_id, url) entries.
+    """
+    sql = """
+        SELECT m.url_expires_at, m.day, m.position, j.channel_id, COALESCE(m.message_id, j.message_id), m.url
+        FROM daily_johan_media AS m
+        JOIN daily_johans AS j ON j.day = m.day
+        WHERE m.url_expires_at < ? AND (m.url_expires_at, m.day, m.position) > (?, ?, ?)
+    """
+    if unmirrored_only:
+        sql += " AND m.blob_sha256 IS NULL"
+    sql += " ORDER BY m.url_expires_at, m.day, m.position LIMIT ?"
+    return conn.execute(sql, (expires_before, *after, limit)).fetchall()
+
+
+def get_next_media_expiry(conn, unmirrored_only=True):
+    """
+    Return the earliest stored URL expiry (Unix seconds), or None if no URL expires.
+    """
+    sql = "SELECT MIN(url_expires_at) FROM daily_johan_media WHERE url_expires_at IS NOT NULL"
+    if unmirrored_only:
+        sql += " AND blob_sha256 IS NULL"
+    return conn.execute(sql).fetchone()[0]
+
+
+def get_media_links_for_day(conn, day_number):
+    """
+    Retrieve a day's media URLs with what is needed to re-sign them.
+
+    Returns:
+        list of tuple: (position, url, url_expires_at, channel_id, message_id) in position order;
+        channel_id and message_id are None if the source message is unknown.
+    """
+    cursor = conn.execute("""
+        SELECT m.position, m.url, m.url_expires_at, j.channel_id, COALESCE(m.message_id, j.message_id)
+        FROM daily_johan_media AS m
+        LEFT JOIN daily_johans AS j ON j.day = m.day
+        WHERE m.day = ?
+        ORDER BY m.position
+    """, (day_number,))
+    return cursor.fetchall()
+
+
+# Top-level MIME types that media can be filtered by; anything else counts as "other".
+MEDIA_KINDS = ("image", "video", "audio")
+
+
+def _media_kind_bounds(kind):
+    # "video/" <= content_type < "video0" ('0' follows '/') selects video/* as an index range.
+    return f"{kind}/", f"{kind}0"
+
+
+def get_days_with_media_kind(conn, kind, start, end):
+    """
+    Retrieve the days in an inclusive range that have media of one kind.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        kind (str): One of MEDIA_KINDS.
+        start (int): First day.
+        end (int): Last day.
+
+    Returns:
+        list of tuple: (day, media count, known total size in bytes) in day order.
+    """
+    low, high = _media_kind_bounds(kind)
+    cursor = conn.execute("""
+        SELECT day, COUNT(*), COALESCE(SUM(size), 0) FROM daily_johan_media
+        WHERE content_type >= ? AND content_type < ? AND day BETWEEN ? AND ?
+        GROUP BY day
+        ORDER BY day
+    """, (low, high, start, end))
+    return cursor.fetchall()
+
+
+def get_media_stats(conn, now):
+    """
+    Summarize archived media by kind and the state of the local mirror.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        now (int): Current Unix time, for counting expired links.
+
+    Returns:
+        dict: "kinds" maps each kind ("image", "video", "audio", "other", "unknown") to
+        (media count, days, known total bytes, media without a known size); "mirrored" and
+        "unmirrored" are media counts; "blobs" and "blob_bytes" describe the deduplicated
+        store; "expired_unmirrored" counts media with neither a working link nor a copy.
+    """
+    kind_case = " ".join(
+        f"WHEN content_type >= '{low}' AND content_type < '{high}' THEN '{kind}'"
+        for kind, (low, high) in ((kind, _media_kind_bounds(kind)) for kind in MEDIA_KINDS)
+    )
+    kinds = {}
+    mirrored = unmirrored = expired_unmirrored = 0
+    cursor = conn.execute(f"""
+        SELECT CASE WHEN content_type IS NULL THEN 'unknown' {kind_case} ELSE 'other' END AS kind,
+               COUNT(*), COUNT(DISTINCT day), COALESCE(SUM(size), 0), SUM(size IS NULL),
+               SUM(blob_sha256 IS NOT NULL),
+               COALESCE(SUM(blob_sha256 IS NULL AND url_expires_at < ?), 0)
+        FROM daily_johan_media
+        GROUP BY kind
+    """, (now,))
+    for kind, count, days, total_size, unknown_size, kind_mirrored, kind_expired in cursor:
+        kinds[kind] = (count, days, total_size, unknown_size)
+        mirrored += kind_mirrored
+        unmirrored += count - kind_mirrored
+        expired_unmirrored += kind_expired
+    blobs, blob_bytes = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM media_blobs").fetchone()
+    return {
+        "kinds": kinds,
+        "mirrored": mirrored,
+        "unmirrored": unmirrored,
+        "expired_unmirrored": expired_unmirrored,
+        "blobs": blobs,
+        "blob_bytes": blob_bytes,
+    }
+
+
+def get_unhashed_blobs(conn, limit=100):
+    """
+    Retrieve mirrored blobs that have no perceptual hash entry yet.
+
+    Returns:
+        list of str: Blob SHA-256 hashes.
+    """
+    cursor = conn.execute("""
+        SELECT b.sha256 FROM media_blobs AS b
+        LEFT JOIN media_phashes AS p ON p.sha256 = b.sha256
+        WHERE p.sha256 IS NULL
+        LIMIT ?
+    """, (limit,))
+    return [row[0] for row in cursor]
+
+
+def get_phashes(conn):
+    """
+    Retrieve every stored perceptual hash.
+
+    Returns:
+        list of tuple: (sha256, signed 64-bit phash) per hashed image blob.
+    """
+    return conn.execute("SELECT sha256, phash FROM media_phashes WHERE phash IS NOT NULL").fetchall()
+
+
+def get_days_for_blobs(conn, sha256s):
+    """
+    Retrieve the days whose media reference each blob.
+
+    Returns:
+        dict: sha256 -> sorted list of days.
+    """
+    days = {}
+    cursor = conn.execute("""
+        SELECT DISTINCT blob_sha256, day FROM daily_johan_media
+        WHERE blob_sha256 IN (SELECT value FROM json_each(?))
+        ORDER BY blob_sha256, day
+    """, (json.dumps(list(sha256s)),))
+    for sha256, day in cursor:
+        days.setdefault(sha256, []).append(day)
+    return days
+
+
+def get_shared_blobs(conn):
+    """
+    Find blobs (byte-identical media) referenced by more than one day.
+
+    Returns:
+        dict: sha256 -> sorted list of days.
+    """
+    days = {}
+    cursor = conn.execute("""
+        SELECT blob_sha256, day FROM daily_johan_media
+        WHERE blob_sha256 IN (
+            SELECT blob_sha256 FROM daily_johan_media
+            WHERE blob_sha256 IS NOT NULL
+            GROUP BY blob_sha256
+            HAVING COUNT(DISTINCT day) > 1
+        )
+        GROUP BY blob_sha256, day
+        ORDER BY blob_sha256, day
+    """)
+    for sha256, day in cursor:
+        days.setdefault(sha256, []).append(day)
+    return days
+
+
+def get_latest_day(conn):
+    """
+    Retrieve the highest archived day number.
+
+    Returns:
+        int: The highest archived day, or 0 if the archive is empty.
+    """
+    result = conn.execute("SELECT MAX(day) FROM daily_johans").fetchone()
+    return result[0] if result and result[0] else 0
+
+
+def get_all_days(conn):
+    """
+    Retrieve every archived day number, in ascending order.
+
+    Returns:
+        list of int: All archived day numbers.
+    """
+    return [row[0] for row in conn.execute("SELECT day FROM daily_johans ORDER BY day")]
+
+
+def get_archived_days(conn, start, end):
+    """
+    Retrieve the set of archived day numbers within an inclusive range.
+
+    Returns:
+        set of int: Archived day numbers between start and end.
+    """
+    cursor = conn.execute("SELECT day FROM daily_johans WHERE day BETWEEN ? AND ?", (start, end))
+    return {row[0] for row in cursor.fetchall()}
+
+
+def get_last_archive_timestamp(conn):
+    """
+    Retrieve the timestamp of the most recently numbered archived day.
+
+    Returns:
+        str or None: ISO timestamp string, or None if nothing has been archived.
     """
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("SELECT message_id FROM daily_johans WHERE day = ?", (day_number,))
-        return cursor.fetchone()
+    row = conn.execute("""
+        SELECT timestamp
+        FROM daily_johans
+        WHERE timestamp IS NOT NULL
+        ORDER BY day DESC
+        LIMIT 1
+    """).fetchone()
+    return row[0] if row else None
 
 
-def delete_daily_johan_by_message_id(message_id):
+def delete_daily_johan_by_message_id(conn, message_id):
     """
     Delete a Daily Johan entry based on the message ID.
 
     Args:
-        message_id (str): The Discord message ID to delete.
+        conn (sqlite3.Connection): Open database connection.
+        message_id (int or str): The Discord message ID to delete.
+
+    Returns:
+        list of int: The day numbers that were deleted.
+    """
+    cursor = conn.execute("DELETE FROM daily_johans WHERE message_id = ? RETURNING day", (int(message_id),))
+    return [row[0] for row in cursor.fetchall()]
+
+
+def delete_daily_johan_by_day(conn, day_number):
+    """
+    Delete the Daily Johan entry for a day number.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        day_number (int): The day number to delete.
+
+    Returns:
+        bool: Whether a row was deleted.
+    """
+    return conn.execute("DELETE FROM daily_johans WHERE day = ?", (day_number,)).rowcount > 0
+
+
+def search_daily_johans(conn, start, end):
+    """
+    Search for every Daily Johan in an inclusive day range with one joined query.
+
+    Returns:
+        dict: day -> (message_id, channel_id, list of media URLs).
     """
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM daily_johans WHERE message_id = ?", (str(message_id),))
-        conn.commit()
+    results = {}
+    cursor = conn.execute("""
+        SELECT j.day, j.message_id, j.channel_id, m.url
+        FROM daily_johans AS j
+        LEFT JOIN daily_johan_media AS m ON m.day = j.day
+        WHERE j.day BETWEEN ? AND ?
+        ORDER BY j.day, m.position
+    """, (start, end))
+    for day, message_id, channel_id, url in cursor:
+        entry = results.setdefault(day, (message_id, channel_id, []))
+        if url is not None:
+            entry[2].append(url)
+    return results
 
 
-def search_daily_johan(day_number):
+def search_daily_johan(conn, day_number):
     """
     Search for a Daily Johan by day number.
 
     Args:
+        conn (sqlite3.Connection): Open database connection.
         day_number (int): The day number to search for.
 
     Returns:
-        list of tuples: Each tuple contains message_id, channel_id, media_url1, media_url2, media_url3.
+        list of tuples: Each tuple contains message_id, channel_id and a list of media URLs.
+    """
+    return list(search_daily_johans(conn, day_number, day_number).values())
+
+
+def iter_daily_johans(conn, chunk_size=1000):
+    """
+    Stream every Daily Johan record, in day order, without materializing the table.
+
+    Rows come from one day/media join fetched chunk_size rows at a time; each record is a
+    column-name dictionary carrying its media URLs under "media" and the matching mirrored
+    blob hashes (or None) under "media_sha256".
+
+    Yields:
+        dict: One record per archived day.
+    """
+    cursor = conn.execute("""
+        SELECT j.*, m.url, m.blob_sha256
+        FROM daily_johans AS j
+        LEFT JOIN daily_johan_media AS m ON m.day = j.day
+        ORDER BY j.day, m.position
+    """)
+    columns = [desc[0] for desc in cursor.description][:-2]
+    record = None
+    while True:
+        rows = cursor.fetchmany(chunk_size)
+        if not rows:
+            break
+        for row in rows:
+            day = row[0]
+            if record is None or record["day"] != day:
+                if record is not None:
+                    yield record
+                record = dict(zip(columns, row[:-2]))
+                record["media"] = []
+                record["media_sha256"] = []
+            if row[-2] is not None:
+                record["media"].append(row[-2])
+                record["media_sha256"].append(row[-1])
+    if record is not None:
+        yield record
+
+
+def export_daily_johans(conn):
+    """
+    Fetch every Daily Johan record as a list of column-name dictionaries.
+
+    Each record carries its media URLs under "media", in position order. Prefer
+    iter_daily_johans() for large archives.
+
+    Returns:
+        list of dict: One dictionary per archived day.
     """
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT message_id, channel_id, media_url1, media_url2, media_url3
-            FROM daily_johans 
-            WHERE day = ?
-        """, (day_number,))
-        return cursor.fetchall()
+    return list(iter_daily_johans(conn))
 
 
-def insert_bulk_daily_johans(data):
+def _record_media(record):
+    # Current exports carry a "media" list; older ones used fixed media_url1..3 keys.
+    if isinstance(record.get("media"), list):
+        return [url for url in record["media"] if isinstance(url, str) and url]
+    return [record.get(f"media_url{i}") for i in (1, 2, 3) if record.get(f"media_url{i}")]
+
+
+_REQUIRED_IMPORT_FIELDS = ("day", "message_id", "channel_id", "timestamp", "user_id", "user_mention")
+
+
+def _staging_row(record):
+    """
+    Validate one import record and convert it to a staging-table row.
+
+    Raises:
+        ValueError: With a short reason if the record can't be imported.
     """
-    Insert multiple Daily Johan entries into the database.
+    if not isinstance(record, dict):
+        raise ValueError("record is not an object")
+    missing = [field for field in _REQUIRED_IMPORT_FIELDS if not record.get(field)]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    try:
+        day = int(record["day"])
+        message_id = int(record["message_id"])
+        channel_id = int(record["channel_id"])
+        user_id = int(record["user_id"])
+    except (TypeError, ValueError):
+        raise ValueError("day and IDs must be integers")
+    if day < 1:
+        raise ValueError("day must be positive")
+    return (
+        day,
+        message_id,
+        channel_id,
+        str(record["timestamp"]),
+        user_id,
+        str(record["user_mention"]),
+        bool(record.get("confirmed", True)),
+        _media_json(_record_media(record)[:MAX_MEDIA_PER_DAY]),
+    )
+
+
+def insert_bulk_daily_johans(conn, data):
+    """
+    Import Daily Johan entries in one set-based pass.
+
+    Valid records are loaded into a temporary staging table with executemany; days that
+    are already archived are dropped from staging in one statement, and the rest are
+    inserted (with their media) by two INSERT ... SELECT statements. Invalid records are
+    reported instead of aborting the whole import.
 
     Args:
+        conn (sqlite3.Connection): Open database connection.
         data (list of dict): List of dictionaries containing Daily Johan data.
 
-    Raises:
-        ValueError: If the data format is incorrect.
-    """
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        for record in data:
-            day = record.get("day")
-            message_id = record.get("message_id")
-            channel_id = record.get("channel_id")
-            timestamp = record.get("timestamp")
-            media_url1 = record.get("media_url1")
-            media_url2 = record.get("media_url2")
-            media_url3 = record.get("media_url3")
-            user_id = record.get("user_id")
-            user_mention = record.get("user_mention")
-            confirmed = record.get("confirmed", True)
-
-            if not day or not message_id or not channel_id or not timestamp or not user_id or not user_mention:
-                raise ValueError("Missing required fields in data.")
-
-            # Check if the day already exists
-            cursor.execute("SELECT * FROM daily_johans WHERE day = ?", (day,))
-            if cursor.fetchone():
-                # Optionally, skip or update existing records
-                # Here, we'll skip existing records
-                continue
+    Returns:
+        dict: "inserted" and "skipped" (lists of day numbers, ascending) and "invalid"
+        (list of (record index, reason) tuples). Records that repeat a day earlier in the
+        same import are reported as skipped.
+    """
+    report = {"inserted": [], "skipped": [], "invalid": []}
+    staged = {}
+    for index, record in enumerate(data):
+        try:
+            row = _staging_row(record)
+        except ValueError as e:
+            report["invalid"].append((index, str(e)))
+            continue
+        if row[0] in staged:
+            report["skipped"].append(row[0])
+            continue
+        staged[row[0]] = row
+
+    conn.execute("DROP TABLE IF EXISTS temp.import_staging")
+    conn.execute("""
+        CREATE TEMP TABLE import_staging (
+            day INTEGER PRIMARY KEY,
+            message_id INTEGER,
+            channel_id INTEGER,
+            timestamp TEXT,
+            user_id INTEGER,
+            user_mention TEXT,
+            confirmed BOOLEAN,
+            media TEXT
+        )
+    """)
+    try:
+        conn.executemany("INSERT INTO import_staging VALUES (?, ?, ?, ?, ?, ?, ?, ?)", staged.values())
+
+        # Existing days win; drop them from staging so media isn't attached to them either.
+        cursor = conn.execute("""
+            DELETE FROM import_staging
+            WHERE day IN (SELECT day FROM daily_johans)
+            RETURNING day
+        """)
+        report["skipped"].extend(row[0] for row in cursor.fetchall())
+
+        cursor = conn.execute("""
+            INSERT INTO daily_johans (day, message_id, channel_id, timestamp, user_id, user_mention, confirmed)
+            SELECT day, message_id, channel_id, timestamp, user_id, user_mention, confirmed
+            FROM import_staging WHERE true
+            ON CONFLICT (day) DO NOTHING
+            RETURNING day
+        """)
+        report["inserted"] = sorted(row[0] for row in cursor.fetchall())
+
+        conn.execute(f"""
+            INSERT INTO daily_johan_media (day, position, message_id, {_MEDIA_COLUMNS})
+            SELECT s.day, m.key + 1, s.message_id, {_MEDIA_VALUES.format("m.value")}
+            FROM import_staging AS s, json_each(s.media) AS m
+        """)
+    finally:
+        conn.execute("DROP TABLE IF EXISTS temp.import_staging")
+
+    report["skipped"].sort()
+    return report
+
+
+def get_scrape_checkpoints(conn, channel_ids):
+    """
+    Retrieve the last scanned message per channel for /scrape_backup.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        channel_ids (list of int): Channels to look up.
+
+    Returns:
+        dict: channel_id -> (last_message_id, messages_scanned) for channels with a checkpoint.
+    """
+    cursor = conn.execute("""
+        SELECT channel_id, last_message_id, messages_scanned FROM scrape_checkpoints
+        WHERE channel_id IN (SELECT value FROM json_each(?))
+    """, (json.dumps([int(cid) for cid in channel_ids]),))
+    return {channel_id: (last_message_id, scanned) for channel_id, last_message_id, scanned in cursor}
+
+
+def save_scrape_checkpoint(conn, channel_id, last_message_id, messages_scanned):
+    """
+    Record scrape progress for a channel. A checkpoint only ever moves forward.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        channel_id (int): The scanned channel.
+        last_message_id (int): The newest message fully processed.
+        messages_scanned (int): Messages processed since the previous checkpoint.
+    """
+    conn.execute("""
+        INSERT INTO scrape_checkpoints (channel_id, last_message_id, messages_scanned, updated_at)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (channel_id) DO UPDATE SET
+            last_message_id = MAX(last_message_id, excluded.last_message_id),
+            messages_scanned = messages_scanned + excluded.messages_scanned,
+            updated_at = excluded.updated_at
+    """, (int(channel_id), int(last_message_id), messages_scanned, _archive_timestamp()))
+
+
+def clear_scrape_checkpoints(conn, channel_ids):
+    """
+    Forget the checkpoints of the given channels so the next scrape starts from the beginning.
+    """
+    conn.execute("DELETE FROM scrape_checkpoints WHERE channel_id IN (SELECT value FROM json_each(?))",
+                 (json.dumps([int(cid) for cid in channel_ids]),))
+
+
+def enqueue_review_messages(conn, messages):
+    """
+    Queue backup messages whose day number couldn't be inferred. Already queued messages
+    are left as they are.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        messages (list of tuple): (message_id, channel_id, content, media_count) entries.
+
+    Returns:
+        int: Number of messages newly queued.
+    """
+    before = conn.total_changes
+    timestamp = _archive_timestamp()
+    conn.executemany("""
+        INSERT OR IGNORE INTO review_queue (message_id, channel_id, content, media_count, queued_at)
+        VALUES (?, ?, ?, ?, ?)
+    """, [(int(mid), int(cid), content, media_count, timestamp) for mid, cid, content, media_count in messages])
+    return conn.total_changes - before
+
+
+def get_review_queue(conn, after_message_id=0, limit=5):
+    """
+    Retrieve queued review messages oldest first, one page at a time.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        after_message_id (int): Only return messages newer than this one.
+        limit (int): Maximum number of messages to return.
+
+    Returns:
+        list of tuple: (message_id, channel_id, content, media_count) entries.
+    """
+    cursor = conn.execute("""
+        SELECT message_id, channel_id, content, media_count FROM review_queue
+        WHERE message_id > ? ORDER BY message_id LIMIT ?
+    """, (int(after_message_id), limit))
+    return cursor.fetchall()
+
+
+def count_review_queue(conn):
+    """
+    Return the number of messages waiting in the review queue.
+    """
+    return conn.execute("SELECT COUNT(*) FROM review_queue").fetchone()[0]
+
+
+def remove_review_messages(conn, message_ids):
+    """
+    Drop resolved or discarded messages from the review queue.
+
+    Returns:
+        int: Number of messages removed.
+    """
+    cursor = conn.execute("DELETE FROM review_queue WHERE message_id IN (SELECT value FROM json_each(?))",
+                          (json.dumps([int(mid) for mid in message_ids]),))
+    return cursor.rowcount
+
+
+def record_media_blobs(conn, blobs, failures=()):
+    """
+    Store the results of a mirror run.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        blobs (list of tuple): (day, position, sha256, size, content_type) per mirrored media row.
+        failures (list of tuple): (day, position) per media row whose download failed.
+    """
+    timestamp = _archive_timestamp()
+    conn.executemany("""
+        INSERT OR IGNORE INTO media_blobs (sha256, size, content_type, created_at) VALUES (?, ?, ?, ?)
+    """, [(sha256, size, content_type, timestamp) for _, _, sha256, size, content_type in blobs])
+    # The downloaded file also fills in the type and size of rows archived without metadata.
+    conn.executemany("""
+        UPDATE daily_johan_media
+        SET blob_sha256 = ?, content_type = COALESCE(content_type, ?), size = COALESCE(size, ?)
+        WHERE day = ? AND position = ?
+    """, [(sha256, content_type, size, day, position) for day, position, sha256, size, content_type in blobs])
+    conn.executemany("""
+        UPDATE daily_johan_media SET mirror_failures = mirror_failures + 1 WHERE day = ? AND position = ?
+    """, list(failures))
+
+
+def update_media_urls(conn, urls, unresolvable=()):
+    """
+    Replace expired media URLs with freshly signed ones.
+
+    A new URL also clears the row's mirror failures, since they were most likely caused
+    by the expired link.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        urls (list of tuple): (day, position, url) per refreshed media row.
+        unresolvable (list of tuple): (day, position) per row whose message or attachment
+            is gone; their expiry is cleared so refreshes stop selecting them.
+    """
+    conn.executemany("""
+        UPDATE daily_johan_media SET url = ?, url_expires_at = ?, mirror_failures = 0
+        WHERE day = ? AND position = ?
+    """, [(url, url_expiry(url), day, position) for day, position, url in urls])
+    conn.executemany("UPDATE daily_johan_media SET url_expires_at = NULL WHERE day = ? AND position = ?",
+                     list(unresolvable))
+
+
+def save_phashes(conn, phashes):
+    """
+    Store perceptual hashes of mirrored blobs.
+
+    Args:
+        conn (sqlite3.Connection): Open database connection.
+        phashes (list of tuple): (sha256, signed 64-bit phash or None) per blob.
+    """
+    conn.executemany("INSERT OR REPLACE INTO media_phashes (sha256, phash) VALUES (?, ?)", phashes)
+
 
-            cursor.execute("""
-                INSERT INTO daily_johans 
-                (day, message_id, channel_id, timestamp, media_url1, media_url2, media_url3, user_id, user_mention, confirmed)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                day,
-                message_id,
-                channel_id,
-                timestamp,
-                media_url1,
-                media_url2,
-                media_url3,
-                user_id,
-                user_mention,
-                confirmed
-            ))
-        conn.commit()
-
-
-def clear_daily_johans_table():
+def clear_daily_johans_table(conn):
     """
     Clears all records from the daily_johans table.
     """
-    with sqlite3.connect(DB_FILE) as conn:
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM daily_johans")
-        conn.commit()
+    conn.execute("DELETE FROM daily_johans")
@@ -0,0 +1,234 @@
+# day_index.py
+
+import re
+
+# Days above this are kept in a small set instead of the bitmap, so a stray huge number
+# (e.g. a phone number typed as a day) can't allocate gigabytes.
+MAX_BITMAP_DAY = 10_000_000
+
+# Tokenizes the bitmap into runs of full bytes, runs of empty bytes and single mixed bytes,
+# so gap-finding does Python work per gap boundary rather than per day.
+_BYTE_RUN_RE = re.compile(rb"(\xff+)|(\x00+)|(.)", re.DOTALL)
+
+
+def format_day_ranges(ranges, limit=None):
+    """
+    Render (start, end) day ranges compactly, e.g. "12–15, 201".
+
+    Args:
+        ranges (list of tuple): Inclusive (start, end) pairs in ascending order.
+        limit (int or None): Maximum number of ranges to render before summarizing the rest.
+
+    Returns:
+        str: The formatted ranges.
+    """
+    shown = ranges if limit is None else ranges[:limit]
+    text = ", ".join(str(lo) if lo == hi else f"{lo}–{hi}" for lo, hi in shown)
+    if len(ranges) > len(shown):
+        text += f", … and {len(ranges) - len(shown)} more"
+    return text
+
+
+class ArchivedDayIndex:
+    """
+    Process-wide index of archived day numbers.
+
+    Days are bits in a bytearray, so membership is O(1) and counting a range costs about
+    range/64 word operations with no database I/O. It is loaded once at startup and kept
+    current by the repository's write paths (archive, delete, import, clear).
+    """
+
+    def __init__(self, days=()):
+        self._bits = bytearray()
+        self._overflow = set()
+        self._count = 0
+        self._max_day = 0
+        self.load(days)
+
+    # ---------------------------
+    # MUTATION
+    # ---------------------------
+    def load(self, days):
+        """
+        Replace the index contents with the given day numbers.
+        """
+        self.clear()
+        for day in days:
+            self.add(day)
+
+    def clear(self):
+        self._bits = bytearray()
+        self._overflow = set()
+        self._count = 0
+        self._max_day = 0
+
+    def add(self, day):
+        """
+        Mark a day as archived. Negative days are never indexed.
+        """
+        if day < 0 or day in self:
+            return
+        if day > MAX_BITMAP_DAY:
+            self._overflow.add(day)
+        else:
+            byte, bit = divmod(day, 8)
+            if byte >= len(self._bits):
+                # Grow geometrically so a long run of new days doesn't resize on every add.
+                self._bits.extend(bytes(max(byte + 1 - len(self._bits), len(self._bits))))
+            self._bits[byte] |= 1 << bit
+        self._count += 1
+        self._max_day = max(self._max_day, day)
+
+    def update(self, days):
+        for day in days:
+            self.add(day)
+
+    def discard(self, day):
+        """
+        Mark a day as no longer archived.
+        """
+        if day not in self:
+            return
+        if day > MAX_BITMAP_DAY:
+            self._overflow.discard(day)
+        else:
+            byte, bit = divmod(day, 8)
+            self._bits[byte] &= ~(1 << bit) & 0xFF
+        self._count -= 1
+        if day == self._max_day:
+            self._max_day = self._find_max_day()
+
+    def _find_max_day(self):
+        if self._overflow:
+            return max(self._overflow)
+        i = min(self._max_day // 8, len(self._bits) - 1)
+        while i >= 0 and not self._bits[i]:
+            i -= 1
+        return i * 8 + self._bits[i].bit_length() - 1 if i >= 0 else 0
+
+    # ---------------------------
+    # QUERIES
+    # ---------------------------
+    def __contains__(self, day):
+        if day < 0:
+            return False
+        if day > MAX_BITMAP_DAY:
+            return day in self._overflow
+        byte, bit = divmod(day, 8)
+        return byte < len(self._bits) and bool(self._bits[byte] >> bit & 1)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def max_day(self):
+        """
+        The highest archived day, or 0 if nothing is archived.
+        """
+        return self._max_day
+
+    def _range_bits(self, start, end):
+        # The bits for start..end (clamped to the bitmap) as one int, bit 0 = start.
+        start = max(start, 0)
+        end = min(end, MAX_BITMAP_DAY, len(self._bits) * 8 - 1)
+        if end < start:
+            return 0
+        chunk = int.from_bytes(self._bits[start // 8:end // 8 + 1], "little")
+        chunk >>= start % 8
+        return chunk & ((1 << (end - start + 1)) - 1)
+
+    def count_in_range(self, start, end):
+        """
+        Count archived days between start and end, inclusive.
+        """
+        if end < start:
+            return 0
+        count = self._range_bits(start, end).bit_count()
+        if self._overflow:
+            count += sum(1 for day in self._overflow if start <= day <= end)
+        return count
+
+    def missing_count(self, start, end):
+        """
+        Count days between start and end, inclusive, that are not archived.
+        """
+        if end < start:
+            return 0
+        return (end - start + 1) - self.count_in_range(start, end)
+
+    def missing_ranges(self, start, end):
+        """
+        Compute the days between start and end, inclusive, that are not archived, as
+        run-length (first, last) ranges in ascending order.
+
+        Full and empty stretches of the bitmap are skipped by a compiled regex, so the cost
+        grows with the number of gaps rather than the length of the archive.
+        """
+        if end < start:
+            return []
+        ranges = []
+        gap_start = None
+
+        def close_gap(last_missing):
+            lo, hi = max(gap_start, start), min(last_missing, end)
+            if lo <= hi:
+                ranges.append((lo, hi))
+
+        bitmap_end = min(end, MAX_BITMAP_DAY)
+        first_byte = max(start, 0) // 8
+        last_byte = bitmap_end // 8
+        if start <= bitmap_end:
+            for match in _BYTE_RUN_RE.finditer(self._bits, first_byte, min(last_byte + 1, len(self._bits))):
+                base = match.start() * 8
+                if match.group(1):
+                    if gap_start is not None:
+                        close_gap(base - 1)
+                        gap_start = None
+                elif match.group(2):
+                    if gap_start is None:
+                        gap_start = base
+                else:
+                    byte = match.group(3)[0]
+                    for bit in range(8):
+                        if byte >> bit & 1:
+                            if gap_start is not None:
+                                close_gap(base + bit - 1)
+                                gap_start = None
+                        elif gap_start is None:
+                            gap_start = base + bit
+            # Days past the end of the bitmap are all missing.
+            if gap_start is None and len(self._bits) * 8 <= bitmap_end:
+                gap_start = max(len(self._bits) * 8, start)
+            if gap_start is not None:
+                close_gap(bitmap_end)
+                gap_start = None
+
+        if end > MAX_BITMAP_DAY:
+            # Above the bitmap only the sparse overflow days are present.
+            cursor = max(start, MAX_BITMAP_DAY + 1)
+            for day in sorted(day for day in self._overflow if cursor <= day <= end):
+                if day > cursor:
+                    ranges.append((cursor, day - 1))
+                cursor = day + 1
+            if cursor <= end:
+                ranges.append((cursor, end))
+        return ranges
+
+    def days_in_range(self, start, end):
+        """
+        List archived days between start and end, inclusive, in ascending order.
+        """
+        if end < start:
+            return []
+        days = []
+        first_byte = max(start, 0) // 8
+        last_byte = min(end, MAX_BITMAP_DAY) // 8
+        for i, byte in enumerate(self._bits[first_byte:last_byte + 1], start=first_byte):
+            if not byte:
+                continue
+            for bit in range(8):
+                day = i * 8 + bit
+                if byte >> bit & 1 and start <= day <= end:
+                    days.append(day)
+        days.extend(sorted(day for day in self._overflow if start <= day <= end))
+        return days
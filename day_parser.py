@@ -0,0 +1,87 @@
+# day_parser.py
+#
+# The one place day numbers are read out of message text. Live auto-archiving, the backup
+# scrape, manual archiving and the context menus all go through parse_days(), so a
+# caption is interpreted the same way no matter which path sees it.
+
+import re
+from collections import namedtuple
+
+# Every run of digits. Also serves as the pre-filter: most channel messages contain no
+# digits at all, and for those parse_days() returns after this single C-level scan.
+_NUMBER_RE = re.compile(r"\d+")
+
+# A number explicitly labelled as the day: "Day 12", "day #12", "#12", "Johan 12",
+# "Daily Johan 12", or a caption that is nothing but the number.
+_EXPLICIT_DAY_RE = re.compile(
+    r"(?:\bday\s*#?\s*|#\s*|\b(?:daily\s+)?johan\s+|^\s*(?=\d+\s*$))(\d+)",
+    re.IGNORECASE
+)
+
+
+class ParsedDays(namedtuple("ParsedDays", ("explicit_day", "numbers"))):
+    """
+    Day numbers found in a message.
+
+    Attributes:
+        explicit_day (int or None): The first number written as a day label, if any.
+        numbers (tuple of int): Every number in the text, in order; the candidates.
+    """
+    __slots__ = ()
+
+    @property
+    def is_series(self):
+        """
+        Whether the text names more than one day, e.g. a catch-up post "Day 12 13 14".
+        """
+        return len(self.numbers) >= 2
+
+    def series_days(self, media_count):
+        """
+        The days to archive one attachment each, or None if this isn't a series post.
+
+        A post is a series when it has at least two numbers and at least two attachments;
+        numbers beyond the attachment count are ignored.
+        """
+        if self.is_series and media_count >= 2:
+            return list(self.numbers[:media_count])
+        return None
+
+    @property
+    def single_day(self):
+        """
+        The day of an unambiguous single-day caption: exactly one number, labelled as a day.
+        """
+        if self.explicit_day is not None and len(self.numbers) == 1:
+            return self.explicit_day
+        return None
+
+
+NO_DAYS = ParsedDays(None, ())
+
+
+def parse_days(text):
+    """
+    Parse the day numbers out of a message's content.
+
+    Args:
+        text (str): The message content.
+
+    Returns:
+        ParsedDays: The explicit day (if any) and all candidate numbers.
+    """
+    numbers = _NUMBER_RE.findall(text)
+    if not numbers:
+        return NO_DAYS
+    match = _EXPLICIT_DAY_RE.search(text)
+    return ParsedDays(int(match.group(1)) if match else None, tuple(map(int, numbers)))
+
+
+def parse_day_list(text):
+    """
+    Parse a user-typed list of day numbers ("12, 13 14").
+
+    Returns:
+        list of int: The numbers in the order given.
+    """
+    return [int(number) for number in _NUMBER_RE.findall(text)]
@@ -16,6 +16,7 @@ DIALOGUES = {
         "no_media_found": "UwU no media found on that message... Could you try again, pookie?",
         "day_taken_resolve_dupes": "Day {day} already has a different Daily Johan... please resolve duplicates manually sir.",
         "day_already_archived": "Oops! Day {day} already has a Daily Johan archived. No new archive needed.",
+        "day_media_full": "Oh noes! Day {day} doesn't have room for {media_count} more media attachment(s), so I didn't archive it (｡•́︿•̀｡)",
         "successful_media_archive": "Yay! Archived message {message_id} for days: {day_list}. You did it!✨",
         "not_enough_slots": "Oh noes, day {day} only has {slots} slots left, but you tried to add {media_count}! Can you fix that, pwease?",
         "mismatch_days_attachments": "UwU, the number of days and attachments don't match! Can you try again?",
@@ -29,11 +30,15 @@ DIALOGUES = {
         "deletion_success": "Goodbye! Archived Daiwy Johan fow day {day} has been deweted 。。。ミヽ(。＞＜)ノ",
         "deletion_error": "Uh oh! An ewwow occuwwed: {error}",
         "daily_reminder": "<@{user}> Dear pookie bear, you haven't done the Daily Johan for day {day} yet! UwU",
-        "gap_alert": "Hmmm... thewe seems to be a gap in Daiwy Johans. The wast one was day {latest_day}. >w<",
+        "gap_alert": "Hmmm... thewe seems to be a gap in Daiwy Johans. The wast one was day {latest_day}. >w< Missing ({missed}): {ranges}",
+        "no_missing_days": "Yay!! No missing Daiwy Johans between day {start} and day {end}! ✨UwU✨",
         "verification_prompt": "(✿>ꇴ<) Day {provided} doesn’t seem wike the next expected day... Is this intewntionaw, pookie? Pwease confiwm! (yes/no) ꒰⑅ᵕ༚ᵕ꒱˖♡",
         "verification_denied": "Awighties~ (*´꒳`*) Wets twy again, nyan~ Couwd you confiwm if dis is a Daiwy Johan and pwovide the cowwect day numbew, pwease? (っ´ω`c)♡",
         "verification_accepted": "Undewstood!!! \(｡>‿‿<｡) Pwocweeding with awchiving fow day {provided}. ✨UwU✨",
-        "ask_if_daily_johan": "<@{user}> Hewwooo~ Is this a Daiwy Johan?! ✩°｡⋆⸜(ू｡•ω•｡) Pwease wepwy with the *boops youw nyose* day number(s), nya~! If nyot, wepwy ‘no’. (=^-ω-^=)"
+        "ask_if_daily_johan": "<@{user}> Hewwooo~ Is this a Daiwy Johan?! ✩°｡⋆⸜(ू｡•ω•｡) Pwease wepwy with the *boops youw nyose* day number(s), nya~! If nyot, wepwy ‘no’. (=^-ω-^=)",
+        "prompt_already_pending": "<@{user}> Hehe~ you stiww have a question fwom me waiting! Pwease answew that one fiwst, nya~ (๑˃ᴗ˂)ﻭ",
+        "catchup_archived": "I was asweep fow a bit (｡-ω-)zzz but I caught up and awchived day(s) {days}, nya~!",
+        "possible_duplicate": "Hmmm?! (⊙_⊙) Day {day} wooks just wike day(s) {other_days}... is it a dupwicate, nya?"
     },
     "vangogh": {
         "no_number_found": "<@{user}> Alas, the day number eludes me. Could you enlighten me with its value, dear friend?",
@@ -50,6 +55,7 @@ DIALOGUES = {
         "no_media_found": "There appears to be no media attached. Could you confirm, my friend?",
         "day_taken_resolve_dupes": "Day {day} already contains another record. Please resolve this conflict manually.",
         "day_already_archived": "Alas, day {day} already contains a Daily Johan record.",
+        "day_media_full": "Alas, day {day} has no room left for {media_count} more piece(s) of media; it remains unarchived.",
         "successful_media_archive": "Success! I have archived message {message_id} for days: {day_list}.",
         "not_enough_slots": "Alas, day {day} only has {slots} slots, yet you attempted to add {media_count}. Could you adjust it?",
         "mismatch_days_attachments": "The number of days and attachments seem misaligned. Kindly review your input.",
@@ -63,11 +69,15 @@ DIALOGUES = {
         "deletion_success": "The archived Daily Johan for day {day} has been removed. Farewell.",
         "deletion_error": "An error occurred: {error}. My sincerest apologies.",
         "daily_reminder": "<@{user}> My dear friend, you have yet to complete the Daily Johan for day {day}.",
-        "gap_alert": "I sense a gap in the records of the Daily Johans. The last documented day was {latest_day}.",
+        "gap_alert": "I sense a gap in the records of the Daily Johans. The last documented day was {latest_day}. Missing ({missed}): {ranges}",
+        "no_missing_days": "The records are whole, dear friend. No Daily Johan is missing between day {start} and day {end}.",
         "verification_prompt": "This day {provided} doesn't align with our records. Is this intentional, dear friend? Please confirm. (yes/no)",
         "verification_denied": "Very well, could you confirm if this is a Daily Johan and provide the correct day number?",
         "verification_accepted": "Understood! Proceeding with archiving for day {provided}. 🌻",
-        "ask_if_daily_johan": "<@{user}> Might this post be a Daily Johan? If so, kindly reply with the day number(s). If not, reply 'no'."
+        "ask_if_daily_johan": "<@{user}> Might this post be a Daily Johan? If so, kindly reply with the day number(s). If not, reply 'no'.",
+        "prompt_already_pending": "<@{user}> Patience, dear friend. A question of mine still awaits your answer; let us finish that one first.",
+        "catchup_archived": "While I was away from the easel, day(s) {days} were painted; they are now safely in our records.",
+        "possible_duplicate": "The canvas of day {day} bears a striking likeness to day(s) {other_days}. Might it be the same painting?"
     },
     "gentleman": {
         "no_number_found": "Good day, sir. I couldn't find the day number on your post. Might you provide it, please?",
@@ -84,6 +94,7 @@ DIALOGUES = {
         "no_media_found": "It seems there is no media attached to that message. Could you verify, sir?",
         "day_taken_resolve_dupes": "Day {day} already contains another record. Manual resolution is required, sir.",
         "day_already_archived": "Good day, sir. Day {day} already has an archived Daily Johan.",
+        "day_media_full": "My apologies, sir: day {day} has no room for {media_count} more media attachment(s), so it was not archived.",
         "successful_media_archive": "Marvelous! I've archived message {message_id} for days: {day_list}.",
         "not_enough_slots": "Sir, day {day} has only {slots} slots remaining, yet {media_count} were provided. Could you adjust accordingly?",
         "mismatch_days_attachments": "It appears there's a mismatch between days and attachments. Kindly ensure alignment.",
@@ -97,11 +108,15 @@ DIALOGUES = {
         "deletion_success": "Archived Daily Johan for day {day} has been successfully deleted, sir.",
         "deletion_error": "An error occurred, sir: {error}. Please accept my apologies.",
         "daily_reminder": "<@{user}> Good sir, it appears you have yet to archive the Daily Johan for day {day}.",
-        "gap_alert": "There appears to be a gap in the Daily Johan archives. The last recorded day was {latest_day}.",
+        "gap_alert": "There appears to be a gap in the Daily Johan archives. The last recorded day was {latest_day}. Missing ({missed}): {ranges}",
+        "no_missing_days": "Splendid, sir. No Daily Johans are missing between day {start} and day {end}.",
         "verification_prompt": "Day {provided} does not match our expected sequence. Is this intentional, sir? Please confirm. (yes/no)",
         "verification_denied": "Very well, could you confirm if this is a Daily Johan and provide the correct day number?",
         "verification_accepted": "Understood! Proceeding with archiving for day {provided}. 🎩",
         "ask_if_daily_johan": "Good sir, is this post a Daily Johan? If so, please reply with the day number(s). If not, reply 'no'.",
+        "prompt_already_pending": "<@{user}> Pardon me, sir, but you have a question of mine still awaiting your answer. Kindly address that first.",
+        "catchup_archived": "Pardon my absence, good sir. I have since archived day(s) {days} that were posted while I was away.",
+        "possible_duplicate": "If I may, sir: the image for day {day} appears identical to that of day(s) {other_days}. A duplicate, perhaps?",
     }
 }
 
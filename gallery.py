@@ -0,0 +1,175 @@
+# gallery.py
+#
+# Contact sheets for /gallery. Each day in a range is shown by a thumbnail of its first
+# mirrored image. Thumbnails are generated once per blob in a process pool and kept under
+# MEDIA_DIR/thumbs. A rendered sheet is cached under a digest of everything it shows, so a
+# repeated request is a file lookup and any change to the range renders a new sheet.
+
+import asyncio
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import GALLERY_CACHE_SIZE, GALLERY_THUMB_SIZE, GALLERY_WORKERS, MEDIA_DIR
+from contact_sheet import make_thumbnail, render_contact_sheet
+from media_mirror import blob_path
+from repository import repo
+
+logger = logging.getLogger(__name__)
+
+COLUMNS = 10
+
+
+class GalleryRenderer:
+    """
+    Renders and caches contact sheets for ranges of days.
+
+    Thumbnail and sheet rendering run in a process pool. Concurrent requests for the same
+    sheet share one render, and rendered sheets beyond `cache_size` are deleted least
+    recently used first.
+    """
+
+    def __init__(self, workers=GALLERY_WORKERS, thumb_size=GALLERY_THUMB_SIZE,
+                 cache_size=GALLERY_CACHE_SIZE, media_dir=MEDIA_DIR):
+        self.workers = max(1, workers)
+        self.thumb_size = thumb_size
+        self.cache_size = max(1, cache_size)
+        self.media_dir = media_dir
+        self._pool = None
+        self._in_flight = {}
+        self._not_images = set()  # blobs whose thumbnail failed; not retried until restart
+        self.renders = 0
+        self.cache_hits = 0
+        self.thumbnails = 0
+        self.render_seconds = 0.0
+
+    async def start(self):
+        self._pool = self._new_pool()
+
+    async def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _new_pool(self):
+        # spawn, not fork: the bot process has database and executor threads.
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def thumbnail_path(self, sha256):
+        return os.path.join(self.media_dir, "thumbs", str(self.thumb_size), sha256[:2], f"{sha256}.jpg")
+
+    def sheet_path(self, start, end, digest):
+        return os.path.join(self.media_dir, "galleries", f"{start}-{end}-{digest[:16]}.jpg")
+
+    async def render(self, start, end):
+        """
+        Return a contact sheet for an inclusive range of days, rendering it if needed.
+
+        Returns:
+            tuple: (path to the JPEG, number of archived days, number of days with an image).
+
+        Raises:
+            RuntimeError: If the renderer has not been started.
+        """
+        if self._pool is None:
+            raise RuntimeError("Gallery renderer is not running.")
+        blobs = await repo.get_gallery_blobs(start, end)
+        cells = [(day, day in repo.days, blobs.get(day)) for day in range(start, end + 1)]
+        archived = sum(1 for _, is_archived, _ in cells if is_archived)
+
+        # The digest covers everything drawn, so it changes whenever the range does.
+        digest = hashlib.sha256(json.dumps([self.thumb_size, COLUMNS, cells]).encode()).hexdigest()
+        path = self.sheet_path(start, end, digest)
+        if os.path.exists(path):
+            self.cache_hits += 1
+            os.utime(path)  # keeps recently used sheets out of the LRU prune
+            return path, archived, len(blobs)
+
+        future = self._in_flight.get(path)
+        if future is None:
+            future = asyncio.ensure_future(self._render(cells, path))
+            self._in_flight[path] = future
+            future.add_done_callback(lambda _: self._in_flight.pop(path, None))
+        await asyncio.shield(future)
+        return path, archived, len(blobs)
+
+    async def _render(self, cells, path):
+        started = time.perf_counter()
+        thumbnails = await self._ensure_thumbnails({sha256 for _, _, sha256 in cells if sha256})
+        sheet_cells = [(day, is_archived, thumbnails.get(sha256)) for day, is_archived, sha256 in cells]
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self._pool, render_contact_sheet, sheet_cells, path,
+                                       self.thumb_size, COLUMNS)
+        except BrokenProcessPool:
+            self._restart_pool()
+            raise
+        self.renders += 1
+        self.render_seconds += time.perf_counter() - started
+        await asyncio.to_thread(self._prune_cache)
+
+    async def _ensure_thumbnails(self, sha256s):
+        """
+        Generate missing thumbnails for the given blobs.
+
+        Returns:
+            dict: sha256 -> thumbnail path, for blobs that have one.
+        """
+        paths = {sha256: self.thumbnail_path(sha256) for sha256 in sha256s if sha256 not in self._not_images}
+        missing = [sha256 for sha256, path in paths.items() if not os.path.exists(path)]
+        if missing:
+            loop = asyncio.get_running_loop()
+            results = await asyncio.gather(
+                *(loop.run_in_executor(self._pool, make_thumbnail, blob_path(sha256, self.media_dir),
+                                       paths[sha256], self.thumb_size) for sha256 in missing),
+                return_exceptions=True
+            )
+            if any(isinstance(result, BrokenProcessPool) for result in results):
+                self._restart_pool()
+            for sha256, result in zip(missing, results):
+                if isinstance(result, BaseException):
+                    logger.warning(f"Could not make a thumbnail of blob {sha256}: {result}")
+                    del paths[sha256]
+                elif not result:
+                    self._not_images.add(sha256)
+                    del paths[sha256]
+                else:
+                    self.thumbnails += 1
+        return paths
+
+    def _restart_pool(self):
+        # A worker died (e.g. killed decoding a huge image); later renders need a fresh pool.
+        logger.error("Gallery worker died; restarting the process pool.")
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+
+    def _prune_cache(self):
+        # Blocks; runs in a thread.
+        directory = os.path.join(self.media_dir, "galleries")
+        try:
+            entries = [entry for entry in os.scandir(directory) if entry.name.endswith(".jpg")]
+        except FileNotFoundError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in entries[self.cache_size:]:
+            try:
+                os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        return {
+            "renders": self.renders,
+            "cache_hits": self.cache_hits,
+            "thumbnails": self.thumbnails,
+            "avg_render_ms": round(self.render_seconds * 1000 / self.renders) if self.renders else 0,
+        }
+
+
+gallery = GalleryRenderer()
@@ -0,0 +1,117 @@
+# image_hash.py
+#
+# Perceptual hashing and nearest-neighbour lookup for near-duplicate detection. Kept free
+# of bot imports, though that doesn't keep process-pool workers light: spawned workers
+# re-import bot.py as __mp_main__, with discord.py and every module it imports. They stay
+# idle only because bot.py starts nothing outside its __main__ guard.
+
+from PIL import Image, UnidentifiedImageError
+
+HASH_SIZE = 8  # 8x8 comparisons -> a 64-bit hash
+_SIGN_BIT = 1 << 63
+
+
+def dhash_file(path):
+    """
+    Compute the 64-bit difference hash (dHash) of an image file.
+
+    The image is reduced to a (HASH_SIZE + 1) x HASH_SIZE grayscale thumbnail and each bit
+    records whether a pixel is brighter than its right-hand neighbour, so re-encodes,
+    resizes and small edits change only a few bits. Runs in a worker process.
+
+    Returns:
+        int or None: The hash as an unsigned 64-bit integer, or None if the file is not a
+        decodable image.
+    """
+    try:
+        with Image.open(path) as image:
+            image.draft("L", (HASH_SIZE * 8, HASH_SIZE * 8))  # lets JPEG decode at reduced size
+            pixels = list(image.convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.Resampling.LANCZOS).getdata())
+    except (UnidentifiedImageError, OSError, ValueError):
+        return None
+    value = 0
+    for row in range(HASH_SIZE):
+        offset = row * (HASH_SIZE + 1)
+        for col in range(HASH_SIZE):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+
+def to_signed(value):
+    """
+    Map an unsigned 64-bit hash onto SQLite's signed INTEGER range.
+    """
+    return value - (1 << 64) if value & _SIGN_BIT else value
+
+
+def to_unsigned(value):
+    return value + (1 << 64) if value < 0 else value
+
+
+def hamming(a, b):
+    return (a ^ b).bit_count()
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes with Hamming distance.
+
+    Each node keeps its children by distance, so a radius-r lookup only descends into
+    children whose distance lies within r of the query's distance to the node. For small
+    radii that visits a tiny fraction of the tree. Each hash carries a set of keys (blob
+    hashes) that share it.
+    """
+    __slots__ = ("_root", "_size")
+
+    def __init__(self):
+        self._root = None  # [hash, keys, {distance: child}]
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def add(self, value, key):
+        if self._root is None:
+            self._root = [value, {key}, {}]
+            self._size = 1
+            return
+        node = self._root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].add(key)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, {key}, {}]
+                self._size += 1
+                return
+            node = child
+
+    def search(self, value, radius):
+        """
+        Return (distance, hash, keys) for every stored hash within `radius` of `value`.
+        """
+        if self._root is None:
+            return []
+        found = []
+        stack = [self._root]
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.append((distance, node[0], node[1]))
+            for child_distance, child in node[2].items():
+                if distance - radius <= child_distance <= distance + radius:
+                    stack.append(child)
+        return found
+
+    def items(self):
+        """
+        Yield (hash, keys) for every stored hash.
+        """
+        stack = [self._root] if self._root is not None else []
+        while stack:
+            node = stack.pop()
+            yield node[0], node[1]
+            stack.extend(node[2].values())
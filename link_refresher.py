@@ -0,0 +1,256 @@
+# link_refresher.py
+#
+# Keeps stored attachment links usable. Discord signs CDN URLs with an expiry, so a link
+# saved at archive time stops working about a day later. Media rows record that expiry;
+# a scheduled job re-reads the source messages of links about to expire and rewrites the
+# URLs, and searches re-sign stale links on demand.
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+
+import discord
+
+from cdn_urls import attachment_key
+from config import (LINK_CACHE_SECONDS, LINK_REFRESH_CONCURRENCY, LINK_REFRESH_DELAY_SECONDS,
+                    LINK_REFRESH_MARGIN_SECONDS)
+from media_mirror import mirror
+from repository import repo
+from scheduler import scheduler
+
+logger = logging.getLogger(__name__)
+
+REFRESH_JOB = "link-refresh"
+PAGE_SIZE = 100
+# Messages per history request; Discord's maximum.
+HISTORY_BATCH = 100
+# Bounds on how soon / how late the next scheduled refresh runs.
+MIN_INTERVAL = timedelta(minutes=15)
+MAX_INTERVAL = timedelta(days=1)
+
+
+class LinkRefresher:
+    """
+    Re-signs expiring CDN links by re-reading their source messages.
+
+    Stale rows are grouped by channel, and each channel's messages are read in ascending
+    ID order with history(after=...) so one request covers up to 100 consecutive messages
+    instead of one fetch_message call per link. Channels are processed `concurrency` at a
+    time since Discord rate-limits history per channel. Each page of rewritten URLs is
+    stored in one transaction.
+
+    The scheduled job only handles rows without a local copy in the media mirror. Those
+    are the rows whose link is still needed, and a fresh link lets the mirror retry them.
+    """
+
+    def __init__(self, concurrency=LINK_REFRESH_CONCURRENCY, delay=LINK_REFRESH_DELAY_SECONDS,
+                 margin=LINK_REFRESH_MARGIN_SECONDS, cache_seconds=LINK_CACHE_SECONDS):
+        self.concurrency = max(1, concurrency)
+        self.delay = delay
+        self.margin = margin
+        self.cache_seconds = cache_seconds
+        self.bot = None
+        self._semaphore = None
+        self._cache = {}  # message_id -> (expires at (monotonic), {attachment key: url} or None)
+        self.refreshed = 0
+        self.unresolvable = 0
+        self.history_requests = 0
+        self.cache_hits = 0
+
+    def start(self, bot):
+        self.bot = bot
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        scheduler.schedule(REFRESH_JOB, datetime.now(timezone.utc), self._refresh_due)
+
+    def stop(self):
+        scheduler.cancel(REFRESH_JOB)
+        self.bot = None
+
+    # ---------------------------
+    # SCHEDULED REFRESH
+    # ---------------------------
+    async def _refresh_due(self):
+        try:
+            await self.bot.wait_until_ready()
+            await self.refresh_stale()
+        except Exception as e:
+            logger.error(f"Scheduled link refresh failed: {e}")
+        finally:
+            if self.bot is not None:
+                await self._schedule_next()
+
+    async def _schedule_next(self):
+        now = datetime.now(timezone.utc)
+        when = now + MAX_INTERVAL
+        next_expiry = await repo.get_next_media_expiry()
+        if next_expiry is not None:
+            due = datetime.fromtimestamp(next_expiry - self.margin, timezone.utc)
+            when = min(max(due, now + MIN_INTERVAL), when)
+        scheduler.schedule(REFRESH_JOB, when, self._refresh_due)
+        logger.debug(f"Next link refresh at {when}.")
+
+    async def refresh_stale(self, unmirrored_only=True):
+        """
+        Re-sign every stored link that expires within the refresh margin.
+
+        Returns:
+            tuple: (refreshed, unresolvable) row counts.
+        """
+        cutoff = int(time.time()) + self.margin
+        after = (0, 0, 0)
+        refreshed = unresolvable = 0
+        while self.bot is not None:
+            rows = await repo.get_stale_media(cutoff, after, PAGE_SIZE, unmirrored_only)
+            if not rows:
+                break
+            after = rows[-1][:3]
+            urls, gone = await self._refresh_rows([row[1:] for row in rows])
+            refreshed += len(urls)
+            unresolvable += len(gone)
+            if urls and mirror.is_running:
+                await mirror.mirror_days(sorted({day for day, _, _ in urls}))
+        if refreshed or unresolvable:
+            logger.info(f"Link refresh re-signed {refreshed} link(s); {unresolvable} could not be resolved.")
+        return refreshed, unresolvable
+
+    # ---------------------------
+    # ON DEMAND
+    # ---------------------------
+    async def fresh_urls(self, day):
+        """
+        Return a day's media URLs, re-signing any that are stale.
+
+        Falls back to the stored URLs if Discord can't be reached.
+
+        Returns:
+            dict: position -> url.
+        """
+        rows = await repo.get_media_links_for_day(day)
+        cutoff = time.time() + self.margin
+        stale = [(day, position, channel_id, message_id, url)
+                 for position, url, expires_at, channel_id, message_id in rows
+                 if expires_at is not None and expires_at < cutoff and channel_id is not None]
+        refreshed = {}
+        if stale and self.bot is not None:
+            try:
+                urls, _ = await self._refresh_rows(stale)
+                refreshed = {position: url for _, position, url in urls}
+            except Exception as e:
+                logger.warning(f"On-demand link refresh for day {day} failed: {e}")
+        return {position: refreshed.get(position, url) for position, url, _, _, _ in rows}
+
+    # ---------------------------
+    # FETCHING
+    # ---------------------------
+    async def _refresh_rows(self, rows):
+        """
+        Re-sign (day, position, channel_id, message_id, url) rows and store the results.
+
+        Returns:
+            tuple: ([(day, position, new url)], [(day, position)] that are gone).
+        """
+        by_channel = {}
+        for day, position, channel_id, message_id, url in rows:
+            by_channel.setdefault(channel_id, {}).setdefault(message_id, []).append((day, position, url))
+        results = await asyncio.gather(*(self._refresh_channel(channel_id, messages)
+                                         for channel_id, messages in by_channel.items()))
+        urls = [entry for channel_urls, _ in results for entry in channel_urls]
+        gone = [entry for _, channel_gone in results for entry in channel_gone]
+        if urls or gone:
+            await repo.update_media_urls(urls, gone)
+        self.refreshed += len(urls)
+        self.unresolvable += len(gone)
+        return urls, gone
+
+    async def _refresh_channel(self, channel_id, messages):
+        urls, gone = [], []
+        async with self._semaphore:
+            channel = self.bot.get_channel(channel_id)
+            try:
+                if channel is None:
+                    channel = await self.bot.fetch_channel(channel_id)
+                attachments_by_message = await self._fetch_attachments(channel, sorted(messages))
+            except (discord.NotFound, discord.Forbidden) as e:
+                # Deleted or unreadable channel: nothing to re-sign from.
+                logger.warning(f"Cannot refresh links from channel {channel_id}: {e}")
+                attachments_by_message = dict.fromkeys(messages)
+            except discord.HTTPException as e:
+                logger.warning(f"Link refresh in channel {channel_id} failed, will retry: {e}")
+                return urls, gone
+
+        for message_id, rows in messages.items():
+            if message_id not in attachments_by_message:
+                continue  # not reached this time; retried on the next run
+            attachments = attachments_by_message[message_id]
+            for day, position, url in rows:
+                new_url = attachments.get(attachment_key(url)) if attachments is not None else None
+                if new_url is not None:
+                    urls.append((day, position, new_url))
+                else:
+                    gone.append((day, position))
+        return urls, gone
+
+    async def _fetch_attachments(self, channel, message_ids):
+        """
+        Read the current attachment URLs of messages, oldest first, in batched requests.
+
+        Returns:
+            dict: message_id -> {attachment key: url}, or None for deleted messages.
+            Messages not reached because a request failed are left out.
+        """
+        results = {}
+        now = time.monotonic()
+        remaining = []
+        for message_id in message_ids:
+            cached = self._cache.get(message_id)
+            if cached is not None and cached[0] > now:
+                self.cache_hits += 1
+                results[message_id] = cached[1]
+            else:
+                remaining.append(message_id)
+
+        while remaining:
+            try:
+                batch = [message async for message in channel.history(
+                    limit=HISTORY_BATCH, after=discord.Object(id=remaining[0] - 1), oldest_first=True)]
+            except (discord.NotFound, discord.Forbidden):
+                raise
+            except discord.HTTPException as e:
+                logger.warning(f"Could not read history of channel {channel.id}: {e}")
+                break
+            self.history_requests += 1
+            found = {message.id: message for message in batch}
+            # A short batch reached the end of the channel, so anything not in it is gone.
+            last_id = batch[-1].id if len(batch) == HISTORY_BATCH else None
+            still_remaining = []
+            for message_id in remaining:
+                if last_id is None or message_id <= last_id:
+                    results[message_id] = self._remember(message_id, found.get(message_id))
+                else:
+                    still_remaining.append(message_id)
+            remaining = still_remaining
+            if remaining:
+                await asyncio.sleep(self.delay)
+        return results
+
+    def _remember(self, message_id, message):
+        attachments = None
+        if message is not None:
+            attachments = {attachment_key(attachment.url): attachment.url for attachment in message.attachments}
+        now = time.monotonic()
+        if len(self._cache) > 1000:
+            self._cache = {key: value for key, value in self._cache.items() if value[0] > now}
+        self._cache[message_id] = (now + self.cache_seconds, attachments)
+        return attachments
+
+    def stats(self):
+        return {
+            "refreshed": self.refreshed,
+            "unresolvable": self.unresolvable,
+            "history_requests": self.history_requests,
+            "cache_hits": self.cache_hits,
+        }
+
+
+link_refresher = LinkRefresher()
@@ -0,0 +1,310 @@
+# media_mirror.py
+#
+# Local, content-addressed copies of archived attachments. Discord CDN URLs are signed and
+# expire, so every archived attachment is downloaded once into MEDIA_DIR under the SHA-256
+# of its bytes, and daily_johan_media rows point at the blob. Identical files are stored
+# once however many days reference them.
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+
+import aiohttp
+
+from config import MAX_MEDIA_PER_DAY, MEDIA_DIR, MEDIA_MIRROR_WORKERS, MEDIA_MIRROR_RETRIES
+from repository import repo
+
+logger = logging.getLogger(__name__)
+
+# Media rows whose download failed this many times are left alone by the backfill.
+MAX_MIRROR_FAILURES = 3
+PAGE_SIZE = 100
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Downloads are streamed to disk in chunks of this many bytes.
+_CHUNK_SIZE = 256 * 1024
+# No overall limit, so large files aren't cut off; a stalled connection still times out.
+_TIMEOUT = aiohttp.ClientTimeout(total=None, connect=30, sock_read=60)
+
+
+class PermanentDownloadError(Exception):
+    """
+    The CDN answered in a way retrying won't fix (e.g. 403/404 for an expired URL).
+    """
+
+
+# ---------------------------
+# BLOB STORE
+# ---------------------------
+def blob_path(sha256, media_dir=MEDIA_DIR):
+    """
+    Return where the blob with this hash lives on disk.
+    """
+    return os.path.join(media_dir, sha256[:2], sha256)
+
+
+def store_blob(tmp_path, sha256, media_dir=MEDIA_DIR):
+    """
+    Move a fully written temp file into the store under its SHA-256.
+
+    The temp file must be on the same filesystem as the store (e.g. in media_dir), so the
+    rename is atomic and a blob path never holds a partial file. If an identical blob is
+    already stored the temp file is removed instead. Blocks; run it in a worker thread.
+
+    Returns:
+        bool: True if a new blob was written, False if it was already stored.
+    """
+    path = blob_path(sha256, media_dir)
+    try:
+        if os.path.exists(path):
+            os.unlink(tmp_path)
+            return False
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    return True
+
+
+def _remove_partials(media_dir):
+    # Blocks; runs in a thread. Temp files of downloads cut off by a crash or shutdown.
+    try:
+        entries = [entry for entry in os.scandir(media_dir) if entry.name.startswith(".partial-")]
+    except FileNotFoundError:
+        return
+    for entry in entries:
+        try:
+            os.unlink(entry.path)
+        except FileNotFoundError:
+            pass
+
+
+def _open_partial(media_dir):
+    # Blocks; runs in a thread.
+    os.makedirs(media_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=media_dir, prefix=".partial-")
+    return os.fdopen(fd, "wb"), tmp_path
+
+
+# ---------------------------
+# MIRROR
+# ---------------------------
+class MediaMirror:
+    """
+    Downloads archived attachments into the blob store.
+
+    Newly archived days are mirrored as soon as the repository reports them, and a backfill
+    at start() works through everything archived before the mirror existed. Downloads run
+    at most `workers` at a time over one aiohttp session, retry transient failures with
+    exponential backoff, and are deduplicated by URL within a run and by hash on disk.
+    Response bodies are streamed to a temp file and hashed as they arrive, so a download
+    never has to fit in memory.
+    """
+
+    def __init__(self, workers=MEDIA_MIRROR_WORKERS, retries=MEDIA_MIRROR_RETRIES, media_dir=MEDIA_DIR):
+        self.workers = max(1, workers)
+        self.retries = max(1, retries)
+        self.media_dir = media_dir
+        self._session = None
+        self._semaphore = None
+        self._in_flight = {}
+        self._tasks = set()
+        self._blob_listeners = []
+        self.downloaded = 0
+        self.bytes_written = 0
+        self.already_stored = 0
+        self.deduplicated = 0
+        self.failed = 0
+
+    @property
+    def is_running(self):
+        return self._session is not None
+
+    async def start(self):
+        await asyncio.to_thread(_remove_partials, self.media_dir)
+        self._session = aiohttp.ClientSession(timeout=_TIMEOUT)
+        self._semaphore = asyncio.Semaphore(self.workers)
+        repo.add_archive_listener(self._on_days_archived)
+        self._spawn(self.backfill(), "media-mirror-backfill")
+        logger.info(f"Media mirror started ({self.workers} worker(s), store at {self.media_dir}).")
+
+    async def stop(self):
+        repo.remove_archive_listener(self._on_days_archived)
+        # Downloads are tasks of their own; one started while others wind down is cancelled too.
+        while self._tasks:
+            for task in list(self._tasks):
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def add_blob_listener(self, callback):
+        """
+        Register a coroutine function called as callback(blobs) with the (day, position,
+        sha256) of media rows after they are mirrored.
+        """
+        self._blob_listeners.append(callback)
+
+    def remove_blob_listener(self, callback):
+        if callback in self._blob_listeners:
+            self._blob_listeners.remove(callback)
+
+    def _spawn(self, coro, name):
+        # Tracked so stop() cancels and awaits it.
+        task = asyncio.create_task(coro, name=name)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return task
+
+    async def _on_days_archived(self, days):
+        if self.is_running and days:
+            self._spawn(self.mirror_days(days), "media-mirror")
+
+    async def mirror_days(self, days):
+        """
+        Mirror the not yet mirrored media of the given days.
+        """
+        rows = await repo.get_unmirrored_media(limit=len(days) * MAX_MEDIA_PER_DAY,
+                                               max_failures=MAX_MIRROR_FAILURES, days=days)
+        await self.mirror_rows(rows)
+
+    async def backfill(self):
+        """
+        Mirror every media row without a blob, one page at a time.
+
+        Returns:
+            int: Number of media rows processed.
+        """
+        after = (0, 0)
+        processed = 0
+        while True:
+            rows = await repo.get_unmirrored_media(after, PAGE_SIZE, MAX_MIRROR_FAILURES)
+            if not rows:
+                break
+            await self.mirror_rows(rows)
+            processed += len(rows)
+            after = rows[-1][:2]
+        if processed:
+            logger.info(f"Media mirror backfill processed {processed} media row(s).")
+        return processed
+
+    async def mirror_rows(self, rows):
+        """
+        Download (day, position, url) rows concurrently and record the results in one write.
+        """
+        if not rows:
+            return
+        results = await asyncio.gather(*(self._fetch(url) for _, _, url in rows), return_exceptions=True)
+        blobs, failures = [], []
+        for (day, position, url), result in zip(rows, results):
+            if isinstance(result, BaseException):
+                failures.append((day, position))
+                logger.warning(f"Could not mirror media {position} of day {day}: {result}")
+            else:
+                sha256, size, content_type = result
+                blobs.append((day, position, sha256, size, content_type))
+        self.failed += len(failures)
+        await repo.record_media_blobs(blobs, failures)
+        if blobs:
+            mirrored = [(day, position, sha256) for day, position, sha256, _, _ in blobs]
+            for callback in list(self._blob_listeners):
+                try:
+                    await callback(mirrored)
+                except Exception as e:
+                    logger.error(f"Blob listener {callback!r} failed: {e}")
+
+    async def _fetch(self, url):
+        # Concurrent requests for the same URL share one download.
+        future = self._in_flight.get(url)
+        if future is not None:
+            self.deduplicated += 1
+            return await asyncio.shield(future)
+        future = self._spawn(self._download_and_store(url), "media-mirror-download")
+        self._in_flight[url] = future
+        future.add_done_callback(lambda _: self._in_flight.pop(url, None))
+        return await asyncio.shield(future)
+
+    async def _download_and_store(self, url):
+        async with self._semaphore:
+            tmp_path, sha256, size, content_type = await self._download(url)
+        if await asyncio.to_thread(store_blob, tmp_path, sha256, self.media_dir):
+            self.downloaded += 1
+            self.bytes_written += size
+        else:
+            self.already_stored += 1
+        return sha256, size, content_type
+
+    async def _download(self, url):
+        """
+        GET a URL into a temp file, retrying timeouts, connection errors, 429 and 5xx with backoff.
+
+        Returns:
+            tuple: (temp file path, sha256, size, content type).
+
+        Raises:
+            PermanentDownloadError: On any other error status.
+            aiohttp.ClientError or asyncio.TimeoutError: If every attempt failed.
+        """
+        delay = 1.0
+        for attempt in range(1, self.retries + 1):
+            try:
+                async with self._session.get(url) as response:
+                    if response.status == 200:
+                        return (*await self._receive(response), response.content_type)
+                    if response.status not in _RETRY_STATUSES:
+                        raise PermanentDownloadError(f"HTTP {response.status}")
+                    retry_after = response.headers.get("Retry-After")
+                    error = aiohttp.ClientResponseError(response.request_info, response.history,
+                                                        status=response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                retry_after, error = None, e
+            if attempt == self.retries:
+                raise error
+            try:
+                wait = float(retry_after) if retry_after else delay
+            except ValueError:
+                wait = delay
+            await asyncio.sleep(wait)
+            delay *= 2
+
+    async def _receive(self, response):
+        """
+        Stream a response body into a temp file in the store, hashing it on the way.
+
+        The temp file is removed if the transfer fails.
+
+        Returns:
+            tuple: (temp file path, sha256, size).
+        """
+        f, tmp_path = await asyncio.to_thread(_open_partial, self.media_dir)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with f:
+                async for chunk in response.content.iter_chunked(_CHUNK_SIZE):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return tmp_path, digest.hexdigest(), size
+
+    def stats(self):
+        return {
+            "downloaded": self.downloaded,
+            "bytes_written": self.bytes_written,
+            "already_stored": self.already_stored,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+            "in_flight": len(self._in_flight),
+        }
+
+
+mirror = MediaMirror()
@@ -0,0 +1,152 @@
+# message_router.py
+#
+# The bot's only on_message entry point. Each message is classified once (author, channel,
+# DM, attachments, digits), offered to any open prompt, and then handed only to handlers
+# whose filters match, instead of every cog listener inspecting every message itself.
+
+import asyncio
+import logging
+import re
+import time
+
+from conversations import conversations
+
+logger = logging.getLogger(__name__)
+
+_DIGIT_RE = re.compile(r"\d")
+
+
+class MessageInfo:
+    """
+    What the router knows about a message, computed once and shared by every handler.
+    """
+    __slots__ = ("author_id", "channel_id", "guild_id", "is_dm", "is_bot", "has_attachments", "has_digits")
+
+    def __init__(self, message):
+        self.author_id = message.author.id
+        self.channel_id = message.channel.id
+        self.guild_id = message.guild.id if message.guild else None
+        self.is_dm = message.guild is None
+        self.is_bot = message.author.bot
+        self.has_attachments = bool(message.attachments)
+        self.has_digits = _DIGIT_RE.search(message.content) is not None
+
+
+class _Handler:
+    __slots__ = ("name", "callback", "authors", "channels", "dm", "attachments", "digits", "bots",
+                 "calls", "errors", "total_seconds", "max_seconds")
+
+    def __init__(self, name, callback, authors, channels, dm, attachments, digits, bots):
+        self.name = name
+        self.callback = callback
+        self.authors = frozenset(authors) if authors is not None else None
+        self.channels = frozenset(channels) if channels is not None else None
+        self.dm = dm
+        self.attachments = attachments
+        self.digits = digits
+        self.bots = bots
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def wants(self, info):
+        if info.is_bot and not self.bots:
+            return False
+        if self.authors is not None and info.author_id not in self.authors:
+            return False
+        if self.channels is not None and info.channel_id not in self.channels:
+            return False
+        if self.dm is not None and info.is_dm != self.dm:
+            return False
+        if self.attachments and not info.has_attachments:
+            return False
+        if self.digits and not info.has_digits:
+            return False
+        return True
+
+
+class MessageRouter:
+    """
+    Dispatches each incoming message to the handlers that registered interest in it.
+
+    Matching handlers run as separate tasks, as discord.py listeners do, so a handler that
+    waits on a prompt never holds up the others. Per-handler call counts and timings are
+    kept for /debug_info.
+    """
+
+    def __init__(self):
+        self._handlers = {}
+        self._tasks = set()
+        self.routed = 0
+        self.prompt_replies = 0
+
+    def register(self, name, callback, *, authors=None, channels=None, dm=None,
+                 attachments=False, digits=False, bots=False):
+        """
+        Register (or replace) a message handler.
+
+        Args:
+            name (str): Handler name, used for unregistering and in stats.
+            callback (callable): Coroutine function taking (message, info).
+            authors (iterable of int or None): Only messages from these user IDs.
+            channels (iterable of int or None): Only messages in these channel IDs.
+            dm (bool or None): True for DMs only, False for server channels only.
+            attachments (bool): Only messages with attachments.
+            digits (bool): Only messages whose content contains a digit.
+            bots (bool): Also receive messages from other bots.
+        """
+        self._handlers[name] = _Handler(name, callback, authors, channels, dm, attachments, digits, bots)
+
+    def unregister(self, name):
+        self._handlers.pop(name, None)
+
+    async def route(self, message, own_user_id=None):
+        """
+        Classify a message once and dispatch it.
+
+        A message that answers an open prompt is consumed by it and not dispatched further.
+        """
+        if message.author.id == own_user_id:
+            return
+        self.routed += 1
+        if conversations.dispatch(message):
+            self.prompt_replies += 1
+            return
+
+        info = MessageInfo(message)
+        for handler in list(self._handlers.values()):
+            if handler.wants(info):
+                task = asyncio.create_task(self._run(handler, message, info), name=f"router:{handler.name}")
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, handler, message, info):
+        started = time.perf_counter()
+        try:
+            await handler.callback(message, info)
+        except Exception as e:
+            handler.errors += 1
+            logger.exception(f"Message handler '{handler.name}' failed on message {message.id}: {e}")
+        finally:
+            elapsed = time.perf_counter() - started
+            handler.calls += 1
+            handler.total_seconds += elapsed
+            handler.max_seconds = max(handler.max_seconds, elapsed)
+
+    def stats(self):
+        """
+        Per-handler counters: calls, errors, and average/max run time in milliseconds.
+        """
+        return {
+            handler.name: {
+                "calls": handler.calls,
+                "errors": handler.errors,
+                "avg_ms": round(handler.total_seconds * 1000 / handler.calls, 2) if handler.calls else 0.0,
+                "max_ms": round(handler.max_seconds * 1000, 2),
+            }
+            for handler in self._handlers.values()
+        }
+
+
+router = MessageRouter()
@@ -0,0 +1,306 @@
+# migrations.py
+#
+# Versioned schema migrations and per-connection tuning. Migrations are applied in order,
+# each in its own transaction, and recorded in the schema_version table so startup only
+# runs what a given database file hasn't seen yet.
+
+import logging
+import mimetypes
+from datetime import datetime, timezone
+from urllib.parse import parse_qs, unquote, urlsplit
+
+from config import DB_CACHE_SIZE_KB, DB_MMAP_SIZE, DB_BUSY_TIMEOUT_MS
+
+logger = logging.getLogger(__name__)
+
+
+def apply_pragmas(conn, readonly=False):
+    """
+    Apply performance pragmas to a freshly opened connection.
+
+    WAL journaling lets readers run concurrently with the single writer, and
+    synchronous=NORMAL is durable across application crashes in WAL mode while avoiding
+    an fsync on every commit. journal_mode is persistent in the file; the rest are
+    per-connection.
+
+    Args:
+        conn (sqlite3.Connection): The connection to configure.
+        readonly (bool): Whether to reject writes on this connection.
+    """
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute(f"PRAGMA busy_timeout = {int(DB_BUSY_TIMEOUT_MS)}")
+    conn.execute(f"PRAGMA cache_size = {-int(DB_CACHE_SIZE_KB)}")
+    conn.execute(f"PRAGMA mmap_size = {int(DB_MMAP_SIZE)}")
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = ON")
+    if readonly:
+        conn.execute("PRAGMA query_only = ON")
+
+
+# ---------------------------
+# MIGRATIONS
+# ---------------------------
+def _migration_001_daily_johans(conn):
+    # Uses IF NOT EXISTS so databases created before versioning are adopted as-is.
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS daily_johans (
+            day INTEGER PRIMARY KEY,
+            message_id TEXT,
+            channel_id TEXT,
+            timestamp TEXT,
+            media_url1 TEXT,
+            media_url2 TEXT,
+            media_url3 TEXT,
+            user_id TEXT,
+            user_mention TEXT,
+            confirmed BOOLEAN
+        )
+    """)
+
+
+def _migration_002_integer_ids_and_indexes(conn):
+    # Discord snowflakes fit in a signed 64-bit integer. Storing them as INTEGER makes the
+    # indexes half the size of the TEXT versions and comparisons numeric.
+    conn.execute("""
+        CREATE TABLE daily_johans_new (
+            day INTEGER PRIMARY KEY,
+            message_id INTEGER,
+            channel_id INTEGER,
+            timestamp TEXT,
+            media_url1 TEXT,
+            media_url2 TEXT,
+            media_url3 TEXT,
+            user_id INTEGER,
+            user_mention TEXT,
+            confirmed BOOLEAN
+        )
+    """)
+    conn.execute("""
+        INSERT INTO daily_johans_new
+        SELECT day, CAST(message_id AS INTEGER), CAST(channel_id AS INTEGER), timestamp,
+               media_url1, media_url2, media_url3, CAST(user_id AS INTEGER), user_mention, confirmed
+        FROM daily_johans
+    """)
+    conn.execute("DROP TABLE daily_johans")
+    conn.execute("ALTER TABLE daily_johans_new RENAME TO daily_johans")
+    conn.execute("CREATE INDEX idx_daily_johans_message_id ON daily_johans (message_id)")
+    conn.execute("CREATE INDEX idx_daily_johans_channel_message ON daily_johans (channel_id, message_id)")
+    # Covers the "timestamp of the latest archived day" lookup without touching the table.
+    conn.execute("""
+        CREATE INDEX idx_daily_johans_timestamped_day ON daily_johans (day, timestamp)
+        WHERE timestamp IS NOT NULL
+    """)
+
+
+def _migration_003_media_table(conn):
+    # One row per attachment instead of three fixed columns. Media rows cascade with their
+    # day, so daily_johans must only ever be changed with UPDATE/UPSERT from here on
+    # (never DROP/REPLACE) while foreign keys are enabled.
+    conn.execute("""
+        CREATE TABLE daily_johan_media (
+            day INTEGER NOT NULL REFERENCES daily_johans (day) ON DELETE CASCADE,
+            position INTEGER NOT NULL,
+            url TEXT NOT NULL,
+            message_id INTEGER,
+            PRIMARY KEY (day, position)
+        ) WITHOUT ROWID
+    """)
+    conn.execute("""
+        INSERT INTO daily_johan_media (day, position, url, message_id)
+        SELECT day, 1, media_url1, message_id FROM daily_johans WHERE media_url1 IS NOT NULL
+        UNION ALL
+        SELECT day, 2, media_url2, message_id FROM daily_johans WHERE media_url2 IS NOT NULL
+        UNION ALL
+        SELECT day, 3, media_url3, message_id FROM daily_johans WHERE media_url3 IS NOT NULL
+    """)
+    conn.execute("CREATE INDEX idx_daily_johan_media_message_id ON daily_johan_media (message_id)")
+    for column in ("media_url1", "media_url2", "media_url3"):
+        conn.execute(f"ALTER TABLE daily_johans DROP COLUMN {column}")
+
+
+def _migration_004_scrape_checkpoints(conn):
+    # Where /scrape_backup stopped in each channel, so re-runs resume with after=.
+    conn.execute("""
+        CREATE TABLE scrape_checkpoints (
+            channel_id INTEGER PRIMARY KEY,
+            last_message_id INTEGER NOT NULL,
+            messages_scanned INTEGER NOT NULL DEFAULT 0,
+            updated_at TEXT NOT NULL
+        )
+    """)
+
+
+def _migration_005_review_queue(conn):
+    # Backup messages whose day couldn't be inferred, kept until /review_backup resolves them.
+    # Keyed by message ID, so re-scanning a channel never queues a message twice.
+    conn.execute("""
+        CREATE TABLE review_queue (
+            message_id INTEGER PRIMARY KEY,
+            channel_id INTEGER NOT NULL,
+            content TEXT NOT NULL,
+            media_count INTEGER NOT NULL,
+            queued_at TEXT NOT NULL
+        )
+    """)
+
+
+def _migration_006_media_blobs(conn):
+    # Local copies of attachments, keyed by the SHA-256 of their bytes so identical files
+    # are stored once. Media rows point at their blob once mirrored; mirror_failures stops
+    # the mirror from retrying dead URLs forever.
+    conn.execute("""
+        CREATE TABLE media_blobs (
+            sha256 TEXT PRIMARY KEY,
+            size INTEGER NOT NULL,
+            content_type TEXT,
+            created_at TEXT NOT NULL
+        ) WITHOUT ROWID
+    """)
+    conn.execute("ALTER TABLE daily_johan_media ADD COLUMN blob_sha256 TEXT REFERENCES media_blobs (sha256)")
+    conn.execute("ALTER TABLE daily_johan_media ADD COLUMN mirror_failures INTEGER NOT NULL DEFAULT 0")
+    conn.execute("""
+        CREATE INDEX idx_daily_johan_media_unmirrored ON daily_johan_media (day, position)
+        WHERE blob_sha256 IS NULL
+    """)
+
+
+def _migration_007_media_phashes(conn):
+    # Perceptual hashes of mirrored blobs for near-duplicate detection. phash is the 64-bit
+    # dHash stored as a signed integer, or NULL for blobs that aren't decodable images.
+    conn.execute("""
+        CREATE TABLE media_phashes (
+            sha256 TEXT PRIMARY KEY REFERENCES media_blobs (sha256),
+            phash INTEGER
+        ) WITHOUT ROWID
+    """)
+    conn.execute("CREATE INDEX idx_media_phashes_phash ON media_phashes (phash) WHERE phash IS NOT NULL")
+    conn.execute("""
+        CREATE INDEX idx_daily_johan_media_blob ON daily_johan_media (blob_sha256)
+        WHERE blob_sha256 IS NOT NULL
+    """)
+
+
+def _migration_008_media_url_expiry(conn):
+    # Expiry of each signed CDN URL (Unix seconds, from its `ex` parameter) so stale links
+    # can be found and refreshed by an index range scan. NULL for unsigned URLs.
+    # A frozen copy of the parsing, so later changes to cdn_urls can't change this migration.
+    def url_expiry(url):
+        try:
+            values = parse_qs(urlsplit(url).query).get("ex")
+            return int(values[0], 16) if values else None
+        except (ValueError, TypeError):
+            return None
+
+    conn.execute("ALTER TABLE daily_johan_media ADD COLUMN url_expires_at INTEGER")
+    expiries = ((url_expiry(url), day, position)
+                for day, position, url in conn.execute("SELECT day, position, url FROM daily_johan_media").fetchall())
+    conn.executemany("UPDATE daily_johan_media SET url_expires_at = ? WHERE day = ? AND position = ?",
+                     [row for row in expiries if row[0] is not None])
+    conn.execute("""
+        CREATE INDEX idx_daily_johan_media_expiry ON daily_johan_media (url_expires_at)
+        WHERE url_expires_at IS NOT NULL
+    """)
+
+
+def _migration_009_media_metadata(conn):
+    # Attachment metadata, so storage and media-type questions are answered by queries
+    # instead of refetching messages. Older rows get the ID and filename from their URL, a
+    # content type guessed from the filename, and type and size from any mirrored blob.
+    # Frozen like url_expiry in migration 008. Paths look like
+    # /attachments/<channel>/<attachment>/<filename>.
+    def attachment_fields(url):
+        parts = urlsplit(url).path.strip("/").split("/")
+        if len(parts) != 4 or parts[0] != "attachments" or not parts[2].isdigit():
+            return None, None, None
+        filename = unquote(parts[3])
+        return int(parts[2]), filename, mimetypes.guess_type(filename)[0]
+
+    for column in ("attachment_id INTEGER", "filename TEXT", "content_type TEXT",
+                   "size INTEGER", "width INTEGER", "height INTEGER"):
+        conn.execute(f"ALTER TABLE daily_johan_media ADD COLUMN {column}")
+    updates = []
+    for day, position, url in conn.execute("SELECT day, position, url FROM daily_johan_media").fetchall():
+        attachment_id, filename, content_type = attachment_fields(url)
+        updates.append((attachment_id, filename, content_type, day, position))
+    conn.executemany("""
+        UPDATE daily_johan_media SET attachment_id = ?, filename = ?, content_type = ?
+        WHERE day = ? AND position = ?
+    """, updates)
+    conn.execute("""
+        UPDATE daily_johan_media
+        SET content_type = COALESCE(daily_johan_media.content_type, b.content_type), size = b.size
+        FROM media_blobs AS b
+        WHERE b.sha256 = daily_johan_media.blob_sha256
+    """)
+    conn.execute("CREATE INDEX idx_daily_johan_media_type ON daily_johan_media (content_type, day)")
+    conn.execute("""
+        CREATE INDEX idx_daily_johan_media_attachment ON daily_johan_media (attachment_id)
+        WHERE attachment_id IS NOT NULL
+    """)
+
+
+MIGRATIONS = [
+    (1, "create daily_johans table", _migration_001_daily_johans),
+    (2, "store Discord IDs as INTEGER and index message/timestamp lookups", _migration_002_integer_ids_and_indexes),
+    (3, "move media URLs into the daily_johan_media table", _migration_003_media_table),
+    (4, "add scrape_checkpoints for resumable backups", _migration_004_scrape_checkpoints),
+    (5, "add review_queue for backup messages needing a day number", _migration_005_review_queue),
+    (6, "add media_blobs for the local media mirror", _migration_006_media_blobs),
+    (7, "add media_phashes for near-duplicate detection", _migration_007_media_phashes),
+    (8, "track when stored CDN URLs expire", _migration_008_media_url_expiry),
+    (9, "store attachment metadata for media rows", _migration_009_media_metadata),
+]
+
+
+def get_schema_version(conn):
+    """
+    Return the highest applied migration version, or 0 for an unversioned database.
+    """
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL
+        )
+    """)
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def apply_migrations(conn, migrations=MIGRATIONS):
+    """
+    Apply every migration newer than the database's current schema version.
+
+    Each migration and its schema_version row commit together, so a failure leaves the
+    database at the last fully applied version.
+
+    Args:
+        conn (sqlite3.Connection): The writer connection.
+        migrations (list of tuple): (version, description, function) entries in order.
+
+    Returns:
+        int: The schema version after migrating.
+    """
+    current = get_schema_version(conn)
+    conn.commit()
+
+    for version, description, migrate in migrations:
+        if version <= current:
+            continue
+        logger.info(f"Applying migration {version}: {description}")
+        try:
+            conn.execute("BEGIN")
+            migrate(conn)
+            conn.execute(
+                "INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.now(timezone.utc).isoformat())
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            logger.error(f"Migration {version} failed; database left at version {current}.")
+            raise
+        current = version
+
+    return current
@@ -0,0 +1,221 @@
+# phash_index.py
+#
+# Near-duplicate detection for archived media. Every mirrored blob gets a perceptual hash,
+# computed in a process pool and stored in media_phashes. An in-memory BK-tree over those
+# hashes answers "does this image already exist under another day?" as each attachment is
+# mirrored, and /find_duplicates sweeps the whole archive with the same tree.
+
+import asyncio
+import logging
+import multiprocessing
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from config import PHASH_WORKERS, PHASH_MAX_DISTANCE
+from image_hash import BKTree, dhash_file, to_signed, to_unsigned
+from media_mirror import blob_path, mirror
+from repository import repo
+
+logger = logging.getLogger(__name__)
+
+PAGE_SIZE = 100
+
+# days: the days holding one image; other_days: days holding a (near-)identical one.
+NearDuplicate = namedtuple("NearDuplicate", ("days", "other_days", "distance"))
+
+
+class PerceptualIndex:
+    """
+    Perceptual hashes of every mirrored image plus a BK-tree for radius lookups.
+
+    Hashes are computed by a process pool so decoding images never blocks the event loop
+    or holds the GIL. Duplicate listeners are awaited with a list of NearDuplicate each
+    time newly mirrored media match media of another day.
+    """
+
+    def __init__(self, workers=PHASH_WORKERS, max_distance=PHASH_MAX_DISTANCE):
+        self.workers = max(1, workers)
+        self.max_distance = max_distance
+        self.tree = BKTree()
+        self._hashes = {}  # blob sha256 -> unsigned phash
+        self._pool = None
+        self._tasks = set()
+        self._duplicate_listeners = []
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+    async def start(self):
+        self._pool = self._new_pool()
+        for sha256, phash in await repo.get_phashes():
+            self._insert(sha256, to_unsigned(phash))
+        mirror.add_blob_listener(self._on_blobs_mirrored)
+        task = asyncio.create_task(self.backfill(), name="phash-backfill")
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        logger.info(f"Perceptual index loaded with {len(self._hashes)} image(s).")
+
+    async def stop(self):
+        mirror.remove_blob_listener(self._on_blobs_mirrored)
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _new_pool(self):
+        # spawn, not fork: the bot process has database and executor threads.
+        return ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def add_duplicate_listener(self, callback):
+        self._duplicate_listeners.append(callback)
+
+    def remove_duplicate_listener(self, callback):
+        if callback in self._duplicate_listeners:
+            self._duplicate_listeners.remove(callback)
+
+    def _insert(self, sha256, phash):
+        if sha256 not in self._hashes:
+            self._hashes[sha256] = phash
+            self.tree.add(phash, sha256)
+
+    async def hash_blobs(self, sha256s):
+        """
+        Compute, store and index the perceptual hashes of blobs not hashed yet.
+
+        Returns:
+            dict: sha256 -> unsigned phash for the blobs that are images.
+        """
+        missing = [sha256 for sha256 in dict.fromkeys(sha256s) if sha256 not in self._hashes]
+        if not missing or self._pool is None:
+            return {}
+        loop = asyncio.get_running_loop()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(self._pool, dhash_file, blob_path(sha256, mirror.media_dir)) for sha256 in missing),
+            return_exceptions=True
+        )
+        if any(isinstance(result, BrokenProcessPool) for result in results) and self._pool is not None:
+            # A worker died (e.g. killed decoding a huge image); later batches need a fresh pool.
+            logger.error("Perceptual hash worker died; restarting the process pool.")
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = self._new_pool()
+        rows = []
+        hashed = {}
+        for sha256, result in zip(missing, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"Could not hash blob {sha256}: {result}")
+                continue
+            rows.append((sha256, to_signed(result) if result is not None else None))
+            if result is not None:
+                hashed[sha256] = result
+                self._insert(sha256, result)
+        await repo.save_phashes(rows)
+        return hashed
+
+    async def backfill(self):
+        """
+        Hash every mirrored blob that has no media_phashes entry yet.
+        """
+        processed = 0
+        attempted = set()
+        while self._pool is not None:
+            # Blobs whose hashing failed stay unhashed; don't loop on them.
+            sha256s = [sha256 for sha256 in await repo.get_unhashed_blobs(PAGE_SIZE) if sha256 not in attempted]
+            if not sha256s:
+                break
+            attempted.update(sha256s)
+            await self.hash_blobs(sha256s)
+            processed += len(sha256s)
+        if processed:
+            logger.info(f"Perceptual index backfill hashed {processed} blob(s).")
+
+    def neighbours(self, phash):
+        """
+        Return {sha256: distance} for indexed images within max_distance of a hash.
+        """
+        started = time.perf_counter()
+        found = {}
+        for distance, _, keys in self.tree.search(phash, self.max_distance):
+            for sha256 in keys:
+                found[sha256] = distance
+        self.lookups += 1
+        self.lookup_seconds += time.perf_counter() - started
+        return found
+
+    async def _on_blobs_mirrored(self, blobs):
+        await self.hash_blobs(sha256 for _, _, sha256 in blobs)
+        duplicates = []
+        for day, _, sha256 in blobs:
+            phash = self._hashes.get(sha256)
+            if phash is None:
+                continue
+            matches = self.neighbours(phash)
+            days_by_blob = await repo.get_days_for_blobs(list(matches))
+            other_days = sorted({other for blob, days in days_by_blob.items() for other in days} - {day})
+            if other_days:
+                distance = min(matches[blob] for blob, days in days_by_blob.items() if set(days) - {day})
+                duplicates.append(NearDuplicate([day], other_days, distance))
+        if not duplicates:
+            return
+        for callback in list(self._duplicate_listeners):
+            try:
+                await callback(duplicates)
+            except Exception as e:
+                logger.error(f"Duplicate listener {callback!r} failed: {e}")
+
+    async def find_duplicates(self):
+        """
+        Sweep the whole archive for media shared by, or nearly identical across, days.
+
+        Returns:
+            list of NearDuplicate: One entry per group of days, closest matches first.
+        """
+        shared = await repo.get_shared_blobs()
+        # The tree is only touched on the event loop; the sweep works on a copy of it.
+        snapshot = [(phash, tuple(keys)) for phash, keys in self.tree.items()]
+        pairs = await asyncio.to_thread(self._near_pairs, snapshot, self.max_distance)
+        days_by_blob = await repo.get_days_for_blobs({sha256 for pair in pairs for sha256 in pair[:2]})
+
+        # Keyed by the sorted days of a group, so the same days are reported once whether
+        # they share a blob or hold near-identical ones.
+        found = {}
+        for days in shared.values():
+            found[tuple(sorted(days))] = 0
+        for sha_a, sha_b, distance in pairs:
+            key = tuple(sorted(set(days_by_blob.get(sha_a, ())) | set(days_by_blob.get(sha_b, ()))))
+            if len(key) < 2:
+                continue
+            found[key] = min(distance, found.get(key, distance))
+        return sorted((NearDuplicate([days[0]], list(days[1:]), distance) for days, distance in found.items()),
+                      key=lambda dup: (dup.distance, dup.days, dup.other_days))
+
+    @staticmethod
+    def _near_pairs(snapshot, max_distance):
+        # Blocks; runs in a thread on a private tree built from (phash, keys) pairs.
+        # Each unordered pair of distinct hashes is reported once.
+        tree = BKTree()
+        for phash, keys in snapshot:
+            for sha256 in keys:
+                tree.add(phash, sha256)
+        pairs = []
+        for phash, keys in snapshot:
+            for distance, other_phash, other_keys in tree.search(phash, max_distance):
+                if other_phash <= phash:
+                    continue
+                pairs.extend((sha_a, sha_b, distance) for sha_a in keys for sha_b in other_keys)
+            if len(keys) > 1:
+                ordered = sorted(keys)
+                pairs.extend((sha_a, sha_b, 0) for i, sha_a in enumerate(ordered) for sha_b in ordered[i + 1:])
+        return pairs
+
+    def stats(self):
+        return {
+            "images": len(self._hashes),
+            "lookups": self.lookups,
+            "avg_lookup_us": round(self.lookup_seconds * 1e6 / self.lookups, 1) if self.lookups else 0.0,
+        }
+
+
+phash_index = PerceptualIndex()
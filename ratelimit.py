@@ -0,0 +1,80 @@
+# ratelimit.py
+#
+# Token buckets for outbound Discord traffic the bot starts on its own (meme replies and
+# the like), so a burst of incoming messages can't become a burst of API calls and 429s.
+
+import time
+
+
+class TokenBucket:
+    """
+    Classic token bucket: holds up to `capacity` tokens and refills at `rate` per second.
+    """
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def ready(self, now=None):
+        """
+        Whether a token is available, without taking it.
+        """
+        self._refill(time.monotonic() if now is None else now)
+        return self.tokens >= 1
+
+    def try_acquire(self, now=None):
+        """
+        Take a token if one is available. Returns whether it was taken.
+        """
+        if not self.ready(now):
+            return False
+        self.tokens -= 1
+        return True
+
+
+class KeyedRateLimiter:
+    """
+    One token bucket per key (a channel, a (channel, trigger) pair, ...), created on first
+    use. Buckets that have refilled completely carry no state and are pruned once the map
+    grows past max_keys, so memory stays bounded however many channels the bot sees.
+    """
+
+    def __init__(self, rate, capacity, max_keys=10_000):
+        self.rate = rate
+        self.capacity = capacity
+        self.max_keys = max_keys
+        self._buckets = {}
+        self.limited = 0
+
+    def _bucket(self, key, now):
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_keys:
+                self._prune(now)
+            bucket = self._buckets[key] = TokenBucket(self.rate, self.capacity, now)
+        return bucket
+
+    def _prune(self, now):
+        for key in [key for key, bucket in self._buckets.items() if bucket.ready(now)
+                    and bucket.tokens >= bucket.capacity]:
+            del self._buckets[key]
+
+    def ready(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        bucket = self._buckets.get(key)
+        return bucket is None or bucket.ready(now)
+
+    def try_acquire(self, key, now=None):
+        now = time.monotonic() if now is None else now
+        if self._bucket(key, now).try_acquire(now):
+            return True
+        self.limited += 1
+        return False
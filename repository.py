@@ -0,0 +1,323 @@
+# repository.py
+#
+# Async data-access layer. Cogs and context menus go through the module-level `repo`
+# instead of opening sqlite3 connections inside their handlers, so no query ever runs on
+# the event loop.
+
+import asyncio
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import archive_io
+import database
+from config import DB_FILE, DB_READER_POOL_SIZE
+from day_index import ArchivedDayIndex
+from migrations import apply_migrations, apply_pragmas
+
+logger = logging.getLogger(__name__)
+
+
+class Repository:
+    """
+    Awaitable wrapper around the helpers in database.py.
+
+    Writes are serialized on a single dedicated thread that owns one long-lived writer
+    connection. Reads run on a small thread pool where every thread keeps its own
+    long-lived reader connection, so a slow write (e.g. a backup scrape) never queues
+    behind or in front of status/search lookups on the event loop.
+
+    `days` is an in-memory index of archived day numbers, loaded at open() and updated
+    by every write method below after its transaction commits. Code that only needs
+    "is day N archived", the highest day or range counts should use it instead of a query.
+
+    Archive listeners are awaited with the list of newly archived days after each write
+    that archives something, so schedulers and caches can react without polling.
+    """
+
+    def __init__(self, db_file, reader_pool_size=DB_READER_POOL_SIZE):
+        self.db_file = db_file
+        self.reader_pool_size = max(1, reader_pool_size)
+        self._writer_executor = None
+        self._reader_executor = None
+        self._writer_conn = None
+        self._reader_local = threading.local()
+        self._reader_conns = []
+        self._reader_conns_lock = threading.Lock()
+        self.days = ArchivedDayIndex()
+        self._archive_listeners = []
+
+    # ---------------------------
+    # LIFECYCLE
+    # ---------------------------
+    @property
+    def is_open(self):
+        return self._writer_executor is not None
+
+    async def open(self):
+        """
+        Start the writer/reader executors and bring the schema up to date.
+        """
+        if self.is_open:
+            return
+        self._warn_about_stray_database()
+        self._writer_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-writer")
+        self._reader_executor = ThreadPoolExecutor(max_workers=self.reader_pool_size,
+                                                   thread_name_prefix="db-reader")
+        loop = asyncio.get_running_loop()
+        version = await loop.run_in_executor(self._writer_executor,
+                                             lambda: apply_migrations(self._writer_connection()))
+        for name, detail in await self._read(database.find_table_scans):
+            logger.warning(f"Hot query '{name}' does a full table scan: {detail}")
+        self.days.load(await self._read(database.get_all_days))
+        logger.info(f"Repository opened on {self.db_file} (schema v{version}, "
+                    f"{self.reader_pool_size} reader connection(s), {len(self.days)} archived day(s)).")
+
+    async def close(self):
+        """
+        Drain pending work, then close every pooled connection.
+        """
+        if not self.is_open:
+            return
+        writer_executor, reader_executor = self._writer_executor, self._reader_executor
+        self._writer_executor = self._reader_executor = None
+
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, partial(reader_executor.shutdown, wait=True))
+        await loop.run_in_executor(None, partial(writer_executor.shutdown, wait=True))
+
+        with self._reader_conns_lock:
+            for conn in self._reader_conns:
+                conn.close()
+            self._reader_conns.clear()
+        if self._writer_conn is not None:
+            self._writer_conn.close()
+            self._writer_conn = None
+        logger.info("Repository closed.")
+
+    def _warn_about_stray_database(self):
+        # Older builds opened a relative "daily_johans.db", which lands wherever the bot was
+        # started from. Point it out rather than silently ignoring those rows.
+        legacy_path = os.path.abspath("daily_johans.db")
+        if os.path.exists(legacy_path) and legacy_path != os.path.abspath(self.db_file):
+            logger.warning(f"Found a database at {legacy_path}, but the bot uses {self.db_file}. "
+                           f"Merge it with /import_db or set DB_FILE if that is the live archive.")
+
+    # ---------------------------
+    # LISTENERS
+    # ---------------------------
+    def add_archive_listener(self, callback):
+        """
+        Register a coroutine function called as callback(days) after days are archived.
+        """
+        self._archive_listeners.append(callback)
+
+    def remove_archive_listener(self, callback):
+        if callback in self._archive_listeners:
+            self._archive_listeners.remove(callback)
+
+    async def _notify_archived(self, days):
+        if not days:
+            return
+        for callback in list(self._archive_listeners):
+            try:
+                await callback(days)
+            except Exception as e:
+                # The write already committed; a broken listener must not fail it.
+                logger.error(f"Archive listener {callback!r} failed: {e}")
+
+    # ---------------------------
+    # CONNECTIONS (executor threads only)
+    # ---------------------------
+    def _connect(self, readonly=False):
+        conn = sqlite3.connect(self.db_file, check_same_thread=False)
+        apply_pragmas(conn, readonly=readonly)
+        return conn
+
+    def _writer_connection(self):
+        if self._writer_conn is None:
+            self._writer_conn = self._connect()
+        return self._writer_conn
+
+    def _reader_connection(self):
+        conn = getattr(self._reader_local, "conn", None)
+        if conn is None:
+            conn = self._connect(readonly=True)
+            self._reader_local.conn = conn
+            with self._reader_conns_lock:
+                self._reader_conns.append(conn)
+        return conn
+
+    def _run_write(self, func, args, kwargs):
+        conn = self._writer_connection()
+        # The connection context manager commits on success and rolls back on error.
+        with conn:
+            return func(conn, *args, **kwargs)
+
+    def _run_read(self, func, args, kwargs):
+        return func(self._reader_connection(), *args, **kwargs)
+
+    async def _write(self, func, *args, **kwargs):
+        if not self.is_open:
+            raise RuntimeError("Repository is not open.")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._writer_executor, self._run_write, func, args, kwargs)
+
+    async def _read(self, func, *args, **kwargs):
+        if not self.is_open:
+            raise RuntimeError("Repository is not open.")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._reader_executor, self._run_read, func, args, kwargs)
+
+    # ---------------------------
+    # WRITES
+    # ---------------------------
+    async def archive_daily_johan_db(self, day_number, message, media_urls, confirmed=True):
+        await self._write(database.archive_daily_johan_db, day_number, message, media_urls, confirmed)
+        self.days.add(day_number)
+        await self._notify_archived([day_number])
+
+    async def archive_daily_johans_batch(self, entries, confirmed=True, on_existing=database.ON_EXISTING_SKIP):
+        outcomes = await self._write(database.archive_daily_johans_batch, entries, confirmed, on_existing)
+        archived = [day for day, outcome in outcomes.items() if outcome == database.ARCHIVED]
+        self.days.update(archived)
+        await self._notify_archived(archived)
+        return outcomes
+
+    async def delete_daily_johan_by_message_id(self, message_id):
+        deleted_days = await self._write(database.delete_daily_johan_by_message_id, message_id)
+        for day in deleted_days:
+            self.days.discard(day)
+        return deleted_days
+
+    async def delete_daily_johan_by_day(self, day_number):
+        deleted = await self._write(database.delete_daily_johan_by_day, day_number)
+        self.days.discard(day_number)
+        return deleted
+
+    async def insert_bulk_daily_johans(self, data):
+        report = await self._write(database.insert_bulk_daily_johans, data)
+        self.days.update(report["inserted"])
+        await self._notify_archived(report["inserted"])
+        return report
+
+    async def save_scrape_checkpoint(self, channel_id, last_message_id, messages_scanned):
+        await self._write(database.save_scrape_checkpoint, channel_id, last_message_id, messages_scanned)
+
+    async def clear_scrape_checkpoints(self, channel_ids):
+        await self._write(database.clear_scrape_checkpoints, channel_ids)
+
+    async def enqueue_review_messages(self, messages):
+        return await self._write(database.enqueue_review_messages, messages)
+
+    async def remove_review_messages(self, message_ids):
+        return await self._write(database.remove_review_messages, message_ids)
+
+    async def record_media_blobs(self, blobs, failures=()):
+        await self._write(database.record_media_blobs, blobs, failures)
+
+    async def update_media_urls(self, urls, unresolvable=()):
+        await self._write(database.update_media_urls, urls, unresolvable)
+
+    async def save_phashes(self, phashes):
+        await self._write(database.save_phashes, phashes)
+
+    async def clear_daily_johans_table(self):
+        await self._write(database.clear_daily_johans_table)
+        self.days.clear()
+
+    # ---------------------------
+    # READS
+    # ---------------------------
+    async def get_existing_day_for_message(self, message_id):
+        return await self._read(database.get_existing_day_for_message, message_id)
+
+    async def get_days_for_message(self, message_id):
+        return await self._read(database.get_days_for_message, message_id)
+
+    async def get_existing_message_for_day(self, day_number):
+        return await self._read(database.get_existing_message_for_day, day_number)
+
+    async def get_entry_for_day(self, day_number):
+        return await self._read(database.get_entry_for_day, day_number)
+
+    async def get_entry_for_message(self, message_id):
+        return await self._read(database.get_entry_for_message, message_id)
+
+    async def get_media_for_day(self, day_number):
+        return await self._read(database.get_media_for_day, day_number)
+
+    async def get_media_for_days(self, start, end):
+        return await self._read(database.get_media_for_days, start, end)
+
+    async def get_latest_message_id(self, channel_id):
+        return await self._read(database.get_latest_message_id, channel_id)
+
+    async def get_media_blobs_for_day(self, day_number):
+        return await self._read(database.get_media_blobs_for_day, day_number)
+
+    async def get_gallery_blobs(self, start, end):
+        return await self._read(database.get_gallery_blobs, start, end)
+
+    async def get_unmirrored_media(self, after=(0, 0), limit=100, max_failures=3, days=None):
+        return await self._read(database.get_unmirrored_media, after, limit, max_failures, days)
+
+    async def get_stale_media(self, expires_before, after=(0, 0, 0), limit=100, unmirrored_only=True):
+        return await self._read(database.get_stale_media, expires_before, after, limit, unmirrored_only)
+
+    async def get_next_media_expiry(self, unmirrored_only=True):
+        return await self._read(database.get_next_media_expiry, unmirrored_only)
+
+    async def get_media_links_for_day(self, day_number):
+        return await self._read(database.get_media_links_for_day, day_number)
+
+    async def get_days_with_media_kind(self, kind, start, end):
+        return await self._read(database.get_days_with_media_kind, kind, start, end)
+
+    async def get_media_stats(self):
+        return await self._read(database.get_media_stats, int(time.time()))
+
+    async def get_unhashed_blobs(self, limit=100):
+        return await self._read(database.get_unhashed_blobs, limit)
+
+    async def get_phashes(self):
+        return await self._read(database.get_phashes)
+
+    async def get_days_for_blobs(self, sha256s):
+        return await self._read(database.get_days_for_blobs, sha256s)
+
+    async def get_shared_blobs(self):
+        return await self._read(database.get_shared_blobs)
+
+    async def get_last_archive_timestamp(self):
+        return await self._read(database.get_last_archive_timestamp)
+
+    async def search_daily_johan(self, day_number):
+        return await self._read(database.search_daily_johan, day_number)
+
+    async def search_daily_johans(self, start, end):
+        return await self._read(database.search_daily_johans, start, end)
+
+    async def get_scrape_checkpoints(self, channel_ids):
+        return await self._read(database.get_scrape_checkpoints, channel_ids)
+
+    async def get_review_queue(self, after_message_id=0, limit=5):
+        return await self._read(database.get_review_queue, after_message_id, limit)
+
+    async def count_review_queue(self):
+        return await self._read(database.count_review_queue)
+
+    async def export_daily_johans(self):
+        return await self._read(database.export_daily_johans)
+
+    async def write_export(self, fmt="json", part_size=None):
+        if part_size is None:
+            return await self._read(archive_io.write_export, fmt)
+        return await self._read(archive_io.write_export, fmt, part_size)
+
+
+repo = Repository(DB_FILE)
@@ -0,0 +1,137 @@
+# scheduler.py
+#
+# One timer for every scheduled job in the bot. Jobs sit in a heap ordered by due time and
+# a single task sleeps until the earliest one, so nothing polls: an idle bot makes no
+# queries and wakes only when a job is actually due (to the second).
+
+import asyncio
+import heapq
+import itertools
+import logging
+from datetime import datetime, timezone
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    Heap-backed one-shot job scheduler.
+
+    Jobs are keyed by name; scheduling a name that is already pending replaces it, which
+    is how callers reschedule (e.g. a reminder pushed back by a new archive). Recurring
+    jobs schedule their next run from inside their callback. Replaced and cancelled jobs
+    stay in the heap and are dropped when they reach the top.
+    """
+
+    def __init__(self):
+        self._heap = []  # (due, sequence, name)
+        self._jobs = {}  # name -> (due, sequence, callback)
+        self._sequence = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task = None
+        self._running = set()
+
+    # ---------------------------
+    # LIFECYCLE
+    # ---------------------------
+    def start(self):
+        """
+        Start the timer task on the running event loop. Jobs may be scheduled before this.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run(), name="scheduler")
+
+    async def stop(self):
+        """
+        Stop the timer and cancel any job callbacks still running. Pending jobs are kept.
+        """
+        tasks = [task for task in (self._task, *self._running) if task is not None]
+        self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    # ---------------------------
+    # JOBS
+    # ---------------------------
+    def schedule(self, name, when, callback):
+        """
+        Run callback once at `when`, replacing any pending job with the same name.
+
+        Args:
+            name (str): Job name.
+            when (datetime): Timezone-aware due time; a time in the past runs immediately.
+            callback (callable): Coroutine function taking no arguments.
+        """
+        sequence = next(self._sequence)
+        self._jobs[name] = (when, sequence, callback)
+        heapq.heappush(self._heap, (when, sequence, name))
+        self._wakeup.set()
+        logger.debug(f"Scheduled job '{name}' for {when}.")
+
+    def cancel(self, name):
+        """
+        Cancel a pending job. Returns whether one was pending.
+        """
+        if self._jobs.pop(name, None) is None:
+            return False
+        self._wakeup.set()
+        return True
+
+    def next_run(self, name):
+        """
+        The due time of a pending job, or None.
+        """
+        job = self._jobs.get(name)
+        return job[0] if job else None
+
+    def pending(self):
+        """
+        Pending jobs as (name, due time), soonest first.
+        """
+        return sorted(((name, job[0]) for name, job in self._jobs.items()), key=lambda item: item[1])
+
+    def _pop_stale(self):
+        # Drop heap entries whose job was replaced or cancelled.
+        while self._heap:
+            when, sequence, name = self._heap[0]
+            job = self._jobs.get(name)
+            if job is not None and job[1] == sequence:
+                return
+            heapq.heappop(self._heap)
+
+    async def _run(self):
+        while True:
+            self._pop_stale()
+            self._wakeup.clear()
+            if not self._heap:
+                await self._wakeup.wait()
+                continue
+
+            when, _, name = self._heap[0]
+            delay = (when - datetime.now(timezone.utc)).total_seconds()
+            if delay > 0:
+                try:
+                    # Wake early if a job is added, replaced or cancelled.
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                    continue
+                except asyncio.TimeoutError:
+                    continue  # Re-check the head; it may have changed right at the deadline.
+
+            heapq.heappop(self._heap)
+            _, _, callback = self._jobs.pop(name)
+            task = asyncio.create_task(self._run_job(name, callback), name=f"scheduler:{name}")
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_job(self, name, callback):
+        logger.debug(f"Running scheduled job '{name}'.")
+        try:
+            await callback()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Scheduled job '{name}' failed: {e}")
+
+
+scheduler = Scheduler()
@@ -0,0 +1,207 @@
+# scrape_progress.py
+#
+# Progress and throughput telemetry for /scrape_backup. Counters are kept per channel and
+# rendered into one ephemeral status message on a fixed interval, and the same numbers are
+# logged as JSON records so concurrency and batch sizes can be tuned from the logs.
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime, timezone
+
+import discord
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_LENGTH = 2000
+
+
+def _format_duration(seconds):
+    if seconds is None:
+        return "?"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours}h{minutes:02d}m"
+    if minutes:
+        return f"{minutes}m{seconds:02d}s"
+    return f"{seconds}s"
+
+
+class ChannelProgress:
+    """
+    Counters for one channel's scan.
+
+    History is read oldest-first, so the timestamp of the latest scanned message (from its
+    snowflake) against the span being scanned gives the fraction done and an ETA.
+    """
+    __slots__ = ("channel_id", "scanned", "matched", "queued", "api_wait_seconds",
+                 "started", "finished", "range_start", "range_end", "position")
+
+    def __init__(self, channel, checkpoint=None):
+        self.channel_id = channel.id
+        self.scanned = 0
+        self.matched = 0
+        self.queued = 0
+        self.api_wait_seconds = 0.0
+        self.started = None
+        self.finished = None
+        # The scan covers everything after the checkpoint (or since the channel was
+        # created) up to the moment it starts.
+        self.range_start = discord.utils.snowflake_time(checkpoint[0] if checkpoint else channel.id)
+        self.range_end = None
+        self.position = None
+
+    def start(self):
+        self.started = time.perf_counter()
+        self.range_end = datetime.now(timezone.utc)
+
+    def finish(self):
+        self.finished = time.perf_counter()
+
+    def advance(self, message_id):
+        self.scanned += 1
+        self.position = discord.utils.snowflake_time(message_id)
+
+    @property
+    def elapsed(self):
+        if self.started is None:
+            return 0.0
+        return (self.finished or time.perf_counter()) - self.started
+
+    @property
+    def fraction(self):
+        if self.finished is not None:
+            return 1.0
+        if self.position is None or self.range_end is None:
+            return 0.0
+        total = (self.range_end - self.range_start).total_seconds()
+        if total <= 0:
+            return 1.0
+        return min(max((self.position - self.range_start).total_seconds() / total, 0.0), 1.0)
+
+    @property
+    def messages_per_second(self):
+        return self.scanned / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def eta_seconds(self):
+        if self.finished is not None:
+            return 0.0
+        fraction = self.fraction
+        if fraction <= 0:
+            return None
+        return self.elapsed * (1 - fraction) / fraction
+
+    def status(self):
+        if self.finished is not None:
+            return "done"
+        if self.started is None:
+            return "waiting"
+        return "scanning"
+
+    def record(self):
+        eta = self.eta_seconds
+        return {
+            "channel_id": self.channel_id,
+            "status": self.status(),
+            "scanned": self.scanned,
+            "matched": self.matched,
+            "queued_for_review": self.queued,
+            "messages_per_second": round(self.messages_per_second, 1),
+            "api_wait_seconds": round(self.api_wait_seconds, 2),
+            "percent": round(self.fraction * 100, 1),
+            "eta_seconds": round(eta) if eta is not None else None,
+        }
+
+
+class ScrapeProgress:
+    """
+    Aggregates per-channel progress for a backup run and publishes it.
+
+    While running, every `interval` seconds the current numbers are rendered and passed
+    to `edit` (a coroutine function taking the message content) and logged as a JSON
+    record. A failing edit (e.g. the interaction token expired after 15 minutes) stops
+    further edits but not the logging.
+    """
+
+    def __init__(self, writer, edit, interval=5.0):
+        self.writer = writer
+        self.edit = edit
+        self.interval = interval
+        self.channels = []
+        self.started = time.perf_counter()
+        self._task = None
+        self._edits_enabled = True
+
+    def add_channel(self, channel, checkpoint=None):
+        progress = ChannelProgress(channel, checkpoint)
+        self.channels.append(progress)
+        return progress
+
+    async def __aenter__(self):
+        self.started = time.perf_counter()
+        self._task = asyncio.create_task(self._publish_periodically(), name="scrape-progress")
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _publish_periodically(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.publish()
+
+    async def publish(self, final=False):
+        """
+        Log the current record and, if edits still work, update the status message.
+        """
+        logger.info(f"scrape_progress {json.dumps(self.record(final))}")
+        if not self._edits_enabled:
+            return
+        try:
+            await self.edit(self.render(final))
+        except discord.HTTPException as e:
+            self._edits_enabled = False
+            logger.warning(f"Stopped editing the backup progress message: {e}")
+
+    def record(self, final=False):
+        elapsed = time.perf_counter() - self.started
+        scanned = sum(channel.scanned for channel in self.channels)
+        writer_stats = self.writer.stats()
+        return {
+            "final": final,
+            "elapsed_seconds": round(elapsed, 1),
+            "scanned": scanned,
+            "matched": sum(channel.matched for channel in self.channels),
+            "archived": writer_stats["archived"],
+            "queued_for_review": sum(channel.queued for channel in self.channels),
+            "messages_per_second": round(scanned / elapsed, 1) if elapsed else 0.0,
+            "api_wait_seconds": round(sum(channel.api_wait_seconds for channel in self.channels), 2),
+            "db_seconds": writer_stats["db_seconds"],
+            "flushes": writer_stats["flushes"],
+            "channels": [channel.record() for channel in self.channels],
+        }
+
+    def render(self, final=False):
+        record = self.record(final)
+        title = "Backup finished" if final else "Backup in progress"
+        lines = [
+            f"**{title}** ({_format_duration(record['elapsed_seconds'])})",
+            f"Scanned {record['scanned']} · matched {record['matched']} · archived {record['archived']} · "
+            f"queued for review {record['queued_for_review']}",
+            f"{record['messages_per_second']} msg/s · waiting on Discord "
+            f"{_format_duration(record['api_wait_seconds'])} · database {record['db_seconds']}s",
+        ]
+        for channel in self.channels:
+            line = f"- <#{channel.channel_id}>: {channel.status()}, {channel.scanned} scanned"
+            if channel.status() == "scanning":
+                line += (f", {channel.fraction * 100:.0f}%, {channel.messages_per_second:.1f} msg/s, "
+                         f"ETA {_format_duration(channel.eta_seconds)}")
+            lines.append(line)
+        return "\n".join(lines)[:MAX_MESSAGE_LENGTH]
@@ -0,0 +1,89 @@
+# triggers.py
+#
+# Chat trigger matching for FunCog. Triggers live in a JSON data file (TRIGGERS_FILE) and
+# are compiled into a single regex, so a message is scanned once no matter how many
+# triggers are configured.
+
+import json
+import logging
+import re
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_COOLDOWN_SECONDS = 30
+
+Trigger = namedtuple("Trigger", ("name", "pattern", "ignore_case", "response", "cooldown_seconds"))
+
+
+class TriggerEngine:
+    """
+    Matches every configured trigger against a message in one regex pass.
+
+    Each trigger becomes an optional lookahead with a named group, so at any position
+    every trigger is tried and none consumes text another trigger could match; overlapping
+    triggers (e.g. "johan" and "johan bot") all fire. A leading lookahead over all patterns
+    lets the scan skip positions where nothing matches. Trigger patterns must not define
+    named groups of their own.
+    """
+
+    def __init__(self, triggers):
+        self.triggers = list(triggers)
+        branches = []
+        for trigger in self.triggers:
+            try:
+                re.compile(trigger.pattern)
+            except re.error as e:
+                raise ValueError(f"Trigger '{trigger.name}' has an invalid pattern: {e}")
+            flags = "(?i:" if trigger.ignore_case else "(?:"
+            branches.append(f"{flags}{trigger.pattern})")
+        self._regex = None
+        if branches:
+            any_branch = "(?=" + "|".join(branches) + ")"
+            lookaheads = "".join(f"(?:(?=(?P<t{index}>{branch}))|)" for index, branch in enumerate(branches))
+            self._regex = re.compile(any_branch + lookaheads)
+
+    def __len__(self):
+        return len(self.triggers)
+
+    def match(self, text):
+        """
+        Return the triggers found in text, in configuration order, each at most once.
+        """
+        if self._regex is None:
+            return []
+        found = set()
+        for match in self._regex.finditer(text):
+            found.update(name for name, value in match.groupdict().items() if value is not None)
+            if len(found) == len(self.triggers):
+                break
+        return [trigger for index, trigger in enumerate(self.triggers) if f"t{index}" in found]
+
+
+def load_triggers(path):
+    """
+    Load and compile the triggers from a JSON file of the form
+    {"triggers": [{"name", "pattern", "response", "ignore_case", "cooldown_seconds"}, ...]}.
+
+    Raises:
+        ValueError: If the file is missing, malformed or has an invalid pattern.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        raise ValueError(f"Could not read triggers from {path}: {e}")
+
+    triggers = []
+    for index, entry in enumerate(data.get("triggers", [])):
+        try:
+            triggers.append(Trigger(
+                name=str(entry["name"]),
+                pattern=str(entry["pattern"]),
+                ignore_case=bool(entry.get("ignore_case", True)),
+                response=str(entry["response"]),
+                cooldown_seconds=float(entry.get("cooldown_seconds", DEFAULT_COOLDOWN_SECONDS)),
+            ))
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"Trigger #{index} in {path} is invalid: {e}")
+    return TriggerEngine(triggers)